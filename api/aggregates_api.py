@@ -0,0 +1,50 @@
+import flask
+from flask import jsonify, make_response, request
+from database import aggregates
+from database import db_session
+
+blueprint = flask.Blueprint(
+    'aggregates_api',
+    __name__,
+    template_folder='templates',
+    url_prefix='/api/stats'
+)
+
+
+def person_to_dict(user):
+    return {'id': user.id, 'surname': user.surname, 'name': user.name}
+
+
+@blueprint.route('/largest_teams', methods=['GET'])
+def get_largest_teams():
+    size, jobs = aggregates.largest_teams(db_session.create_session())
+    return jsonify({
+        'size': size,
+        'jobs': [
+            {
+                'id': job.id,
+                'job': job.job,
+                'team_leader': person_to_dict(job.leader) if job.leader else None,
+            }
+            for job in jobs
+        ]
+    })
+
+
+@blueprint.route('/user_hours', methods=['GET'])
+def get_user_hours():
+    min_hours = request.args.get('min_hours', 0, type=int)
+    department_id = request.args.get('department_id', None, type=int)
+    rows = aggregates.users_with_hours(db_session.create_session(), min_hours, department_id)
+    return jsonify({'users': [dict(person_to_dict(user), hours=hours) for user, hours in rows]})
+
+
+@blueprint.route('/department_hours', methods=['GET'])
+@blueprint.route('/department_hours/<int:department_id>', methods=['GET'])
+def get_department_hours(department_id=None):
+    rows = aggregates.departments_hours(db_session.create_session(), department_id)
+    if department_id is not None and not rows:
+        return make_response(jsonify({'error': f'Department with id {department_id} not found'}), 404)
+    return jsonify({'departments': [
+        {'id': department.id, 'title': department.title, 'hours': hours} for department, hours in rows
+    ]})
@@ -0,0 +1,334 @@
+"""Async versions of the /api/v2/jobs and /api/v2/users resources.
+
+Handlers take the request arguments (query string merged with the decoded
+JSON body, as reqparse does) and path arguments and return (status, payload). They are served by asgi.py and mirror JobsResource,
+JobsListResource, UsersResource and UsersListResource: same arguments
+(the reqparse parsers are reused), same responses and error messages.
+
+GET handlers also take the client's conditional.Preconditions and return
+(status, payload, headers) with the same ETag/Last-Modified as the Flask
+resources; a current copy gets (304, None, headers) before serialization.
+Write handlers return the X-DB-Generation header and cookie in the same
+way after a commit while read replicas are enabled.
+"""
+import asyncio
+import datetime
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import selectinload
+from werkzeug.http import dump_cookie
+
+from database import archive
+from database import categories
+from database import db_session
+from database import db_session_async
+from database import filters
+from database import pagination
+from models.jobs import Jobs
+from models.jobs_archive import ArchivedJob
+from models.users import User
+from . import conditional
+from . import list_query
+from . import serializers
+from .job_parsers import job_parser, job_put_parser
+from .jobs_resource import parse_datetime_from_iso
+from .serializers import job_to_dict, listed_job_to_dict, user_to_dict
+from .user_parsers import user_parser, user_put_parser
+
+# Categories are loaded eagerly: job_to_dict reads them and async sessions cannot lazy load
+_JOB_BY_ID = select(Jobs).options(selectinload(Jobs.categories)).where(Jobs.id == bindparam('id'))
+_ARCHIVED_JOB_BY_ID = select(ArchivedJob).options(selectinload(ArchivedJob.categories)).where(
+    ArchivedJob.id == bindparam('id'))
+_USER_BY_EMAIL = select(User.id).where(User.email == bindparam('email')).limit(1)
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def abort(status, message):
+    raise HttpError(status, message)
+
+
+def _written(session, status, payload):
+    """Adds the write generation of a committed session, as db_session does for Flask responses."""
+    generation = session.info.get('write_generation')
+    if generation is None:
+        return status, payload
+    cookie = dump_cookie(db_session.GENERATION_COOKIE, str(generation), httponly=True, samesite='Lax')
+    return status, payload, [(db_session.GENERATION_HEADER, str(generation)), ('Set-Cookie', cookie)]
+
+
+def parse_args(parser, data):
+    """Applies a flask_restful RequestParser definition to a JSON body."""
+    args, errors = {}, {}
+    for argument in parser.args:
+        value = data.get(argument.name)
+        if value is None:
+            if argument.required:
+                errors[argument.name] = argument.help or f"Missing required parameter {argument.name}"
+            args[argument.name] = argument.default
+            continue
+        values = value if argument.action == 'append' and isinstance(value, list) else [value]
+        try:
+            converted = [argument.type(item) for item in values]
+        except (TypeError, ValueError) as e:
+            errors[argument.name] = argument.help or str(e)
+            continue
+        args[argument.name] = converted if argument.action == 'append' else converted[0]
+    if errors:
+        abort(400, errors)
+    return args
+
+
+async def _job_or_404(session, job_id):
+    job = (await session.scalars(_JOB_BY_ID, {'id': job_id})).first()
+    if not job:
+        abort(404, f"Job {job_id} not found")
+    return job
+
+
+async def _user_or_404(session, user_id):
+    user = await session.get(User, user_id)
+    if not user:
+        abort(404, f"User {user_id} not found")
+    return user
+
+
+async def _categories(session, category_ids):
+    missing = await session.run_sync(categories.missing, category_ids)
+    if missing:
+        abort(400, f"Category with id {missing[0]} not found.")
+    return await session.run_sync(categories.load, category_ids)
+
+
+def _parse_date(args, name):
+    parsed = parse_datetime_from_iso(args[name])
+    if args[name] and not parsed:
+        abort(400, f"Invalid {name} format for '{args[name]}'. Use YYYY-MM-DDTHH:MM:SS.")
+    return parsed
+
+
+def _list_args(data, model, filter_spec, field_spec, sort_keys):
+    try:
+        return list_query.parse(data, model, filter_spec, field_spec, sort_keys)
+    except list_query.ListArgsError as error:
+        abort(400, str(error))
+
+
+async def _page_rows(session, model, page, query=None):
+    """Async counterpart of database.pagination.rows."""
+    items = []
+    for statement in pagination.statements(model, page, query):
+        items.extend((await session.execute(statement.limit(page.limit + 1 - len(items)))).all())
+        if len(items) > page.limit:
+            break
+    return items
+
+
+async def _list_validators(session, models, query, preconditions):
+    """Validators of a whole list (all=1); a page gets conditional.page_etag of its rows."""
+    etag = await session.run_sync(conditional.list_etag, models, query)
+    return conditional.evaluate(etag, None, preconditions)
+
+
+def _page_result(table, items, next_cursor, preconditions, to_dict):
+    modified, headers = conditional.evaluate(conditional.page_etag(table, items, next_cursor), None, preconditions)
+    if not modified:
+        return 304, None, headers
+    return 200, {table: [to_dict(item) for item in items], 'next': next_cursor}, headers
+
+
+async def list_jobs(data, preconditions=conditional.Preconditions()):
+    args = _list_args(data, Jobs, filters.JOB_FILTERS, serializers.JOB_FIELDS, pagination.JOB_SORT_KEYS)
+    page, include_archived = args.page, archive.wants_archived(data)
+    to_dict = serializers.from_row(args.fields)
+
+    async with db_session_async.create_session() as session:
+        if page is None:
+            modified, headers = await _list_validators(session, archive.models(include_archived), args.query,
+                                                       preconditions)
+            if not modified:
+                return 304, None, headers
+            jobs = (await session.execute(args.query(Jobs).order_by(Jobs.id))).all()
+            if include_archived:
+                archived = (await session.execute(args.query(ArchivedJob).order_by(ArchivedJob.id))).all()
+                jobs = sorted(jobs + archived, key=lambda job: job.id)
+            return 200, {'jobs': [to_dict(job) for job in jobs]}, headers
+
+        rows = await _page_rows(session, Jobs, page, args.query(Jobs))
+        if include_archived:
+            rows += await _page_rows(session, ArchivedJob, page, args.query(ArchivedJob))
+            rows.sort(key=pagination.sort_key(page), reverse=page.descending)
+        jobs, next_cursor = pagination.finish(rows, page)
+        return _page_result('jobs', jobs, next_cursor, preconditions, to_dict)
+
+
+def _object_result(obj, preconditions, make_payload):
+    modified, headers = conditional.evaluate(*conditional.object_validators(obj), preconditions)
+    if not modified:
+        return 304, None, headers
+    return 200, make_payload(), headers
+
+
+async def get_job(data, job_id, preconditions=conditional.Preconditions()):
+    async with db_session_async.create_session() as session:
+        job = (await session.scalars(_JOB_BY_ID, {'id': job_id})).first()
+        if job:
+            return _object_result(job, preconditions, lambda: {'job': job_to_dict(job)})
+        archived_job = (await session.scalars(_ARCHIVED_JOB_BY_ID, {'id': job_id})).first()
+        if not archived_job:
+            abort(404, f"Job {job_id} not found")
+        return _object_result(archived_job, preconditions, lambda: {'job': listed_job_to_dict(archived_job)})
+
+
+async def create_job(data):
+    args = parse_args(job_parser, data)
+    async with db_session_async.create_session() as session:
+        if not await session.get(User, args['team_leader_id']):
+            abort(400, f"Team leader with id {args['team_leader_id']} not found.")
+
+        job = Jobs(
+            job=args['job'],
+            team_leader=args['team_leader_id'],
+            work_size=args.get('work_size'),
+            collaborators=args.get('collaborators'),
+            is_finished=args.get('is_finished', False)
+        )
+        job.start_date = _parse_date(args, 'start_date') if args['start_date'] else datetime.datetime.now()
+        if args['end_date']:
+            job.end_date = _parse_date(args, 'end_date')
+        job.categories = await _categories(session, args.get('category_ids') or [])
+
+        session.add(job)
+        await session.commit()
+        return _written(session, 201, {'id': job.id, 'job': job_to_dict(job)})
+
+
+async def update_job(data, job_id):
+    async with db_session_async.create_session() as session:
+        job = await _job_or_404(session, job_id)
+        args = parse_args(job_put_parser, data)
+
+        if args['job'] is not None:
+            job.job = args['job']
+        if args['team_leader_id'] is not None:
+            if not await session.get(User, args['team_leader_id']):
+                abort(400, f"Team leader with id {args['team_leader_id']} not found.")
+            job.team_leader = args['team_leader_id']
+        if args['work_size'] is not None:
+            job.work_size = args['work_size']
+        if args['collaborators'] is not None:
+            job.collaborators = args['collaborators']
+        if args['is_finished'] is not None:
+            job.is_finished = args['is_finished']
+        if args['start_date'] is not None:
+            job.start_date = _parse_date(args, 'start_date')
+        if args['end_date'] is not None:
+            job.end_date = _parse_date(args, 'end_date')
+        if args.get('category_ids') is not None:
+            job.categories = await _categories(session, args['category_ids'])
+
+        await session.commit()
+        return _written(session, 200, {'job': job_to_dict(job)})
+
+
+async def delete_job(data, job_id):
+    async with db_session_async.create_session() as session:
+        await session.delete(await _job_or_404(session, job_id))
+        await session.commit()
+        return _written(session, 200, {'success': 'OK'})
+
+
+async def list_users(data, preconditions=conditional.Preconditions()):
+    args = _list_args(data, User, filters.USER_FILTERS, serializers.USER_FIELDS, pagination.USER_SORT_KEYS)
+    project = serializers.from_row(args.fields)
+    async with db_session_async.create_session() as session:
+        if args.page is None:
+            modified, headers = await _list_validators(session, [User], args.query, preconditions)
+            if not modified:
+                return 304, None, headers
+            users = (await session.execute(args.query(User))).all()
+            return 200, {'users': [project(user) for user in users]}, headers
+        users, next_cursor = pagination.finish(await _page_rows(session, User, args.page, args.query(User)), args.page)
+        return _page_result('users', users, next_cursor, preconditions, project)
+
+
+async def get_user(data, user_id, preconditions=conditional.Preconditions()):
+    async with db_session_async.create_session() as session:
+        user = await _user_or_404(session, user_id)
+        return _object_result(user, preconditions, lambda: {'user': user_to_dict(user)})
+
+
+async def _email_taken(session, email):
+    return (await session.scalars(_USER_BY_EMAIL, {'email': email})).first() is not None
+
+
+async def create_user(data):
+    args = parse_args(user_parser, data)
+    async with db_session_async.create_session() as session:
+        if await _email_taken(session, args['email']):
+            abort(409, f"User with email {args['email']} already exists")
+
+        user = User(
+            name=args['name'],
+            surname=args.get('surname'),
+            age=args.get('age'),
+            position=args.get('position'),
+            speciality=args.get('speciality'),
+            address=args.get('address'),
+            city_from=args.get('city_from'),
+            email=args['email']
+        )
+        # Password hashing is CPU bound: keep it off the event loop
+        await asyncio.to_thread(user.set_password, args['password'])
+
+        try:
+            session.add(user)
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            abort(500, f"Error creating user: {str(e)}")
+        return _written(session, 201, {'id': user.id, 'user': user_to_dict(user)})
+
+
+async def update_user(data, user_id):
+    async with db_session_async.create_session() as session:
+        user = await _user_or_404(session, user_id)
+        args = parse_args(user_put_parser, data)
+
+        for name in ('name', 'surname', 'age', 'position', 'speciality', 'address', 'city_from'):
+            if args[name] is not None:
+                setattr(user, name, args[name])
+
+        if args['email'] is not None and args['email'] != user.email:
+            if await _email_taken(session, args['email']):
+                abort(409, f"Email {args['email']} already exists")
+            user.email = args['email']
+
+        if args['password'] is not None:
+            await asyncio.to_thread(user.set_password, args['password'])
+
+        try:
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            abort(500, f"Error committing user changes: {str(e)}")
+        # modified_date is set by a trigger and expired after the UPDATE; async sessions cannot lazy load it
+        await session.refresh(user, ['modified_date'])
+        return _written(session, 200, {'user': user_to_dict(user)})
+
+
+async def delete_user(data, user_id):
+    async with db_session_async.create_session() as session:
+        user = await _user_or_404(session, user_id)
+        try:
+            await session.delete(user)
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            abort(500, f"Error deleting user: {str(e)}. Check for associated records.")
+        return _written(session, 200, {'success': 'OK'})
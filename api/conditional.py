@@ -0,0 +1,99 @@
+"""Conditional GET for jobs and users: ETag, Last-Modified and 304 Not Modified.
+
+Validators come from the row versions kept by database/versioning.py and
+are checked before the body is built: a 304 costs the query of the object
+(or of the page) and no serialization.
+
+* an object: ETag "<table>-<id>-<version>" and Last-Modified from
+  modified_date; an archived job never changes, its ETag has no version
+  and Last-Modified is archived_at;
+* a keyset page: ETag "<table>-page-<digest>" of the ids and versions of
+  the rows it returns and of its next cursor. The page is read anyway,
+  so the validator costs O(limit) like the page itself;
+* a whole list (all=1): ETag "<table>-<count>-<max version>-<last delete>"
+  of the rows it selects, for every table it reads (one aggregate query;
+  max(version) goes by ix_<table>_version).
+
+Lists have no Last-Modified: deleting a row would not move it.
+"""
+import datetime
+import hashlib
+from collections import namedtuple
+
+from flask import current_app, request
+from werkzeug.http import http_date, quote_etag
+from werkzeug.sansio.http import is_resource_modified
+
+from database import archive
+from database import versioning
+
+# The client's validators; the evaluation below does not touch the Flask request,
+# so asgi.py checks the async handlers with the same code.
+Preconditions = namedtuple('Preconditions', 'if_none_match if_modified_since if_match', defaults=(None, None, None))
+
+
+def preconditions(headers):
+    """Preconditions from a case-insensitive header mapping (Flask's request.headers or a dict)."""
+    return Preconditions(*(headers.get(name) for name in ('If-None-Match', 'If-Modified-Since', 'If-Match')))
+
+
+def object_validators(obj):
+    if archive.is_archived(obj):
+        return f'{obj.__tablename__}-{obj.id}', obj.archived_at
+    return f'{obj.__tablename__}-{obj.id}-{obj.version}', obj.modified_date
+
+
+def list_etag(session, models, query):
+    """ETag of a whole list made of the rows of query(model) for each model."""
+    versions = versioning.collection_versions(session, [(model, query(model)) for model in models])
+    return '.'.join(f'{model.__tablename__}-{count}-{version or 0}-{deleted}'
+                    for model, (count, version, deleted) in zip(models, versions))
+
+
+def page_etag(table, rows, next_cursor):
+    """ETag of a keyset page from its rows (id and version, none for archived jobs) and next cursor."""
+    digest = hashlib.blake2b(digest_size=12)
+    for row in rows:
+        digest.update(f"{row.id}-{getattr(row, 'version', '')};".encode())
+    digest.update((next_cursor or '').encode())
+    return f'{table}-page-{digest.hexdigest()}'
+
+
+def evaluate(etag, last_modified, client=Preconditions()):
+    """(modified, validator headers): whether the client's copy is stale, plus ETag/Last-Modified to send."""
+    if last_modified is not None:
+        # the database keeps naive local time; HTTP dates have no microseconds
+        last_modified = last_modified.astimezone(datetime.timezone.utc).replace(microsecond=0)
+    modified = is_resource_modified(http_if_none_match=client.if_none_match,
+                                    http_if_modified_since=client.if_modified_since,
+                                    http_if_match=client.if_match, etag=etag, last_modified=last_modified)
+    headers = [('ETag', quote_etag(etag))]
+    if last_modified is not None:
+        headers.append(('Last-Modified', http_date(last_modified)))
+    return modified, headers
+
+
+def respond(etag, last_modified, make_response):
+    """make_response() with the validators, or an empty 304 when the client's copy is current."""
+    modified, headers = evaluate(etag, last_modified, preconditions(request.headers))
+    if not modified:
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response()
+        if response.status_code != 200:
+            return response
+    for name, value in headers:
+        response.headers[name] = value
+    return response
+
+
+def object_response(obj, make_response):
+    return respond(*object_validators(obj), make_response)
+
+
+def list_response(session, models, query, make_response):
+    return respond(list_etag(session, models, query), None, make_response)
+
+
+def page_response(table, rows, next_cursor, make_response):
+    return respond(page_etag(table, rows, next_cursor), None, make_response)
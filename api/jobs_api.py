@@ -1,8 +1,19 @@
 import flask
 from flask import jsonify, make_response, request
+from database import archive
+from database import categories
 from database import db_session
+from database import filters
+from database import pagination
+from database import repository
+from database import response_cache
+from database import write_queue
 from models.jobs import Jobs
-from models.category import Category
+from . import conditional
+from . import list_query
+from . import serializers
+from . import streaming
+from .serializers import job_to_dict
 
 blueprint = flask.Blueprint(
     'jobs_api',
@@ -13,58 +24,62 @@ blueprint = flask.Blueprint(
 
 
 @blueprint.route('/jobs', methods=['GET'])
+@response_cache.cached(*archive.JOB_LIST_TABLES)
 def get_jobs():
     db_sess = db_session.create_session()
-    jobs = db_sess.query(Jobs).all()
-    if not jobs:
-        return make_response(jsonify({'error': 'No jobs found in the system'}), 404)
-    return jsonify(
-        {
-            'jobs': [
-                {
-                    'id': job.id,
-                    'team_leader_id': job.team_leader,
-                    'job': job.job,
-                    'work_size': job.work_size,
-                    'collaborators': job.collaborators,
-                    'start_date': job.start_date.isoformat() if job.start_date else None,
-                    'end_date': job.end_date.isoformat() if job.end_date else None,
-                    'is_finished': job.is_finished,
-                    'categories': [
-                        {'id': category.id, 'name': category.name}
-                        for category in job.categories
-                    ],
-                }
-                for job in jobs
-            ]
-        }
-    )
+    include_archived = archive.include_archived_requested()
+    try:
+        args = list_query.parse(request.args, Jobs, filters.JOB_FILTERS, serializers.JOB_FIELDS,
+                                pagination.JOB_SORT_KEYS)
+    except list_query.ListArgsError as error:
+        return make_response(jsonify({'error': str(error)}), 400)
+    to_dict = serializers.from_row(args.fields)
+    # stream=1: the whole list, written out while it is read (an empty list instead of 404)
+    if args.stream:
+        return streaming.response('jobs', lambda session: archive.iter_jobs(
+            session, include_archived, args.query, streaming.CHUNK_SIZE), to_dict)
+    page = args.page
+
+    def make_list_response(jobs, next_cursor):
+        if not jobs and (page is None or page.after is None):
+            return make_response(jsonify({'error': 'No jobs found in the system'}), 404)
+        return jsonify(
+            {
+                **({'next': next_cursor} if page is not None else {}),
+                'jobs': [to_dict(job) for job in jobs]
+            }
+        )
+
+    # all=1: the whole list in one response, as before pagination
+    if page is None:
+        def make_whole_list():
+            return make_list_response(archive.list_jobs(db_sess, include_archived, args.query), None)
+
+        return conditional.list_response(db_sess, archive.models(include_archived), args.query, make_whole_list)
+    jobs, next_cursor = archive.page_jobs(db_sess, page, include_archived, args.query)
+    return conditional.page_response('jobs', jobs, next_cursor, lambda: make_list_response(jobs, next_cursor))
 
 
 @blueprint.route('/jobs/<int:job_id>', methods=['GET'])
 def get_one_job(job_id):
     db_sess = db_session.create_session()
-    job = db_sess.query(Jobs).get(job_id)
+    # Falls back to the archive when the job is not in the hot table
+    job = repository.get_job(db_sess, job_id) or repository.get_archived_job(db_sess, job_id)
     if not job:
         return make_response(jsonify({'error': f'Job with id {job_id} not found'}), 404)
-    return jsonify(
-        {
-            'job': {
-                'id': job.id,
-                'team_leader_id': job.team_leader,
-                'job': job.job,
-                'work_size': job.work_size,
-                'collaborators': job.collaborators,
-                'start_date': job.start_date.isoformat() if job.start_date else None,
-                'end_date': job.end_date.isoformat() if job.end_date else None,
-                'is_finished': job.is_finished,
-                'categories': [
-                    {'id': category.id, 'name': category.name}
-                    for category in job.categories
-                ],
-            }
-        }
-    )
+    return conditional.object_response(job, lambda: jsonify(
+        {'job': serializers.listed_job_to_dict(job) if archive.is_archived(job) else job_to_dict(job)}))
+
+
+def category_ids_error(db_sess, category_ids):
+    """400 response for a bad or unknown category ID in the list, None when all are valid."""
+    for cat_id in category_ids:
+        if not isinstance(cat_id, int):
+            return make_response(jsonify({'error': f'Invalid category_id: {cat_id}. Must be an integer.'}), 400)
+    missing = categories.missing(db_sess, category_ids)
+    if missing:
+        return make_response(jsonify({'error': f'Category with id {missing[0]} not found'}), 400)
+    return None
 
 
 @blueprint.route('/jobs', methods=['POST'])
@@ -79,40 +94,32 @@ def create_job():
 
     db_sess = db_session.create_session()
 
-    new_job = Jobs(
-        job=request.json['job'],
-        team_leader=request.json['team_leader_id'],
-        work_size=request.json['work_size'],
-        collaborators=request.json.get('collaborators'),
-        is_finished=request.json.get('is_finished', False)
-    )
-
+    category_ids = None
     if 'category_ids' in request.json and isinstance(request.json['category_ids'], list):
-        for cat_id in request.json['category_ids']:
-            if not isinstance(cat_id, int):
-                return make_response(jsonify({'error': f'Invalid category_id: {cat_id}. Must be an integer.'}), 400)
-            category = db_sess.query(Category).get(cat_id)
-            if category:
-                new_job.categories.append(category)
-            else:
-                return make_response(jsonify({'error': f'Category with id {cat_id} not found'}), 400)
-
-    db_sess.add(new_job)
-    db_sess.commit()
+        error = category_ids_error(db_sess, request.json['category_ids'])
+        if error:
+            return error
+        category_ids = request.json['category_ids']
+
+    def insert_job(session):
+        job = Jobs(
+            job=request.json['job'],
+            team_leader=request.json['team_leader_id'],
+            work_size=request.json['work_size'],
+            collaborators=request.json.get('collaborators'),
+            is_finished=request.json.get('is_finished', False)
+        )
+        if category_ids is not None:
+            job.categories = categories.load(session, category_ids)
+        session.add(job)
+        return job
+
+    # "database is locked" is retried with backoff (database/write_queue.py)
+    new_job = write_queue.commit(insert_job)
 
     return make_response(jsonify({
         'message': 'Job created successfully',
-        'job': {
-            'id': new_job.id,
-            'team_leader_id': new_job.team_leader,
-            'job': new_job.job,
-            'work_size': new_job.work_size,
-            'collaborators': new_job.collaborators,
-            'start_date': new_job.start_date.isoformat() if new_job.start_date else None,
-            'end_date': new_job.end_date.isoformat() if new_job.end_date else None,
-            'is_finished': new_job.is_finished,
-            'categories': [{'id': cat.id, 'name': cat.name} for cat in new_job.categories]
-        }
+        'job': job_to_dict(new_job)
     }), 201)
 
 
@@ -122,13 +129,17 @@ def delete_job(job_id):
     Deletes a job by its ID.
     """
     db_sess = db_session.create_session()
-    job = db_sess.query(Jobs).get(job_id)
+    job = repository.get_job(db_sess, job_id)
 
     if not job:
         return make_response(jsonify({'error': f'Job with id {job_id} not found'}), 404)
 
-    db_sess.delete(job)
-    db_sess.commit()
+    def remove_job(session):
+        job = repository.get_job(session, job_id)
+        if job is not None:
+            session.delete(job)
+
+    write_queue.commit(remove_job)
 
     return make_response('', 204)
 
@@ -139,7 +150,7 @@ def edit_job(job_id):
     Edits an existing job by its ID.
     """
     db_sess = db_session.create_session()
-    job_to_edit = db_sess.query(Jobs).get(job_id)
+    job_to_edit = repository.get_job(db_sess, job_id)
 
     if not job_to_edit:
         return make_response(jsonify({'error': f'Job with id {job_id} not found'}), 404)
@@ -147,42 +158,36 @@ def edit_job(job_id):
     if not request.json:
         return make_response(jsonify({'error': 'Request must be JSON'}), 400)
 
-    job_to_edit.job = request.json.get('job', job_to_edit.job)
-    job_to_edit.team_leader = request.json.get('team_leader_id',
-                                               job_to_edit.team_leader)
-    job_to_edit.work_size = request.json.get('work_size', job_to_edit.work_size)
-    job_to_edit.collaborators = request.json.get('collaborators', job_to_edit.collaborators)
-    job_to_edit.is_finished = request.json.get('is_finished', job_to_edit.is_finished)
-
+    category_ids = None
     if 'category_ids' in request.json:
         if not isinstance(request.json['category_ids'], list):
             return make_response(jsonify({'error': 'category_ids must be a list'}), 400)
 
-        new_categories = []
-        for cat_id in request.json['category_ids']:
-            if not isinstance(cat_id, int):
-                return make_response(jsonify({'error': f'Invalid category_id: {cat_id}. Must be an integer.'}), 400)
-            category = db_sess.query(Category).get(cat_id)
-            if category:
-                new_categories.append(category)
-            else:
-                db_sess.rollback()
-                return make_response(jsonify({'error': f'Category with id {cat_id} not found'}), 400)
-        job_to_edit.categories = new_categories
-
-    db_sess.commit()
+        error = category_ids_error(db_sess, request.json['category_ids'])
+        if error:
+            return error
+        category_ids = request.json['category_ids']
+
+    def update_job(session):
+        # re-read on every attempt: a retry starts after a rollback
+        job = repository.get_job(session, job_id)
+        if job is None:
+            return None
+        job.job = request.json.get('job', job.job)
+        job.team_leader = request.json.get('team_leader_id', job.team_leader)
+        job.work_size = request.json.get('work_size', job.work_size)
+        job.collaborators = request.json.get('collaborators', job.collaborators)
+        job.is_finished = request.json.get('is_finished', job.is_finished)
+        if category_ids is not None:
+            # the ORM inserts and deletes only the association rows that changed
+            job.categories = categories.load(session, category_ids)
+        return job
+
+    job_to_edit = write_queue.commit(update_job)
+    if job_to_edit is None:
+        return make_response(jsonify({'error': f'Job with id {job_id} not found'}), 404)
 
     return jsonify({
         'message': 'Job updated successfully',
-        'job': {
-            'id': job_to_edit.id,
-            'team_leader_id': job_to_edit.team_leader,
-            'job': job_to_edit.job,
-            'work_size': job_to_edit.work_size,
-            'collaborators': job_to_edit.collaborators,
-            'start_date': job_to_edit.start_date.isoformat() if job_to_edit.start_date else None,
-            'end_date': job_to_edit.end_date.isoformat() if job_to_edit.end_date else None,
-            'is_finished': job_to_edit.is_finished,
-            'categories': [{'id': cat.id, 'name': cat.name} for cat in job_to_edit.categories]
-        }
+        'job': job_to_dict(job_to_edit)
     })
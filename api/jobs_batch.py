@@ -0,0 +1,318 @@
+"""Batch create, update and delete of jobs: /api/v2/jobs/batch.
+
+    POST   {"jobs": [{"job": ..., "team_leader_id": ..., ...}, ...], "mode": "atomic"}
+    PATCH  {"jobs": [{"id": 5, "work_size": 10}, ...], "mode": "best_effort"}
+    DELETE {"ids": [5, 6, 7]}
+
+Items take the fields of POST/PUT /api/v2/jobs. Team leaders and (for
+PATCH/DELETE) the jobs themselves are checked with one IN query per kind
+for the whole batch, categories against the process-wide category map
+(database/categories.py). The valid items are written in one transaction
+with bulk (executemany) statements; a new category set of a job changes
+only the association rows that differ.
+
+mode=atomic (the default) writes nothing when any item is invalid: the
+response is 400 and valid items get status 424. mode=best_effort writes
+the valid items and answers 207 when some failed. Every response has a
+result per item, in request order:
+
+    {"index": 0, "status": 201, "id": 12, "job": {...}}
+    {"index": 1, "status": 400, "error": "Team leader with id 99 not found."}
+"""
+import datetime
+from collections import namedtuple
+from itertools import groupby
+
+from flask import request
+from flask_restful import Resource, abort
+from sqlalchemy import bindparam, select
+
+from database import categories
+from database import filters
+from database import pagination
+from database import write_queue
+from models.category import association_table, set_categories
+from models.jobs import Jobs, job_collaborators_table, parse_collaborator_ids
+from models.users import User
+from . import serializers
+
+MODES = ('atomic', 'best_effort')
+MAX_ITEMS = 5000
+NOT_APPLIED = 424
+
+# request field -> jobs column
+COLUMNS = {
+    'job': 'job',
+    'team_leader_id': 'team_leader',
+    'work_size': 'work_size',
+    'collaborators': 'collaborators',
+    'is_finished': 'is_finished',
+    'start_date': 'start_date',
+    'end_date': 'end_date',
+}
+
+# id: the job of PATCH/DELETE; values: jobs columns to write; category_ids: None keeps the categories
+Item = namedtuple('Item', 'index id values category_ids')
+
+
+class ItemError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _string(value):
+    if value is not None and not isinstance(value, str):
+        raise TypeError('a string')
+    return value
+
+
+def _integer(value):
+    # int() would turn true into 1 and 12.7 into 12; numeric strings are accepted as reqparse does
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise TypeError('an integer')
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError('an integer')
+    return int(value)
+
+
+def _datetime(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ItemError(400, f"Invalid {name} format for '{value}'. Use YYYY-MM-DDTHH:MM:SS.")
+
+
+_CONVERTERS = {
+    'job': _string,
+    'team_leader_id': _integer,
+    'work_size': lambda value: None if value is None else _integer(value),
+    'collaborators': _string,
+    # true/false or '1'/'0', 'true'/'false', 'yes'/'no' as in list filters; bool('false') would be True
+    'is_finished': filters.parse_bool,
+}
+
+
+def _id(value):
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ItemError(400, 'id must be an integer')
+    return value
+
+
+def parse_item(index, raw, creating):
+    """Item of a POST (creating) or PATCH item; raises ItemError on a bad field."""
+    if not isinstance(raw, dict):
+        raise ItemError(400, 'Item must be a JSON object')
+    values = {}
+    for name, column in COLUMNS.items():
+        if name not in raw:
+            continue
+        if name in ('start_date', 'end_date'):
+            values[column] = _datetime(raw[name], name)
+            continue
+        try:
+            values[column] = _CONVERTERS[name](raw[name])
+        except (TypeError, ValueError):
+            raise ItemError(400, f"Invalid value for {name}: {raw[name]!r}")
+    category_ids = raw.get('category_ids')
+    if category_ids is not None:
+        if not isinstance(category_ids, list):
+            raise ItemError(400, 'category_ids must be a list')
+        try:
+            category_ids = list(dict.fromkeys(int(cat_id) for cat_id in category_ids))
+        except (TypeError, ValueError):
+            raise ItemError(400, f"Invalid category_ids: {raw['category_ids']!r}")
+    if not creating:
+        if not values and category_ids is None:
+            raise ItemError(400, 'Nothing to update')
+        return Item(index, _id(raw.get('id')), values, category_ids)
+
+    for name in ('job', 'team_leader_id'):
+        if raw.get(name) is None:
+            raise ItemError(400, f'Missing required field: {name}')
+    values.setdefault('is_finished', False)
+    values['start_date'] = values.get('start_date') or datetime.datetime.now()
+    return Item(index, None, values, category_ids or [])
+
+
+def parse_new_item(index, raw):
+    return parse_item(index, raw, creating=True)
+
+
+def parse_changed_item(index, raw):
+    return parse_item(index, raw, creating=False)
+
+
+def parse_items(raw_items, parse):
+    """([Item], {index: ItemError}) of the request items; a job id may appear only once."""
+    items, errors, seen = [], {}, set()
+    for index, raw in enumerate(raw_items):
+        try:
+            item = parse(index, raw)
+            if item.id is not None:
+                if item.id in seen:
+                    raise ItemError(400, f'Job {item.id} appears more than once in the batch')
+                seen.add(item.id)
+            items.append(item)
+        except ItemError as error:
+            errors[index] = error
+    return items, errors
+
+
+def _existing(session, column, values):
+    return set(session.scalars(select(column).where(column.in_(values)))) if values else set()
+
+
+def check_references(session, items):
+    """(valid items, {index: ItemError}): jobs and team leaders checked with one IN query per kind,
+    categories against the category map (database/categories.py)."""
+    jobs = _existing(session, Jobs.id, {item.id for item in items if item.id is not None})
+    leaders = _existing(session, User.id, {item.values['team_leader'] for item in items
+                                           if 'team_leader' in item.values})
+    unknown = set(categories.missing(session, [cat_id for item in items for cat_id in item.category_ids or ()]))
+    valid, errors = [], {}
+    for item in items:
+        missing = [cat_id for cat_id in item.category_ids or () if cat_id in unknown]
+        if item.id is not None and item.id not in jobs:
+            errors[item.index] = ItemError(404, f'Job {item.id} not found')
+        elif 'team_leader' in item.values and item.values['team_leader'] not in leaders:
+            errors[item.index] = ItemError(400, f"Team leader with id {item.values['team_leader']} not found.")
+        elif missing:
+            errors[item.index] = ItemError(400, f'Category with id {missing[0]} not found.')
+        else:
+            valid.append(item)
+    return valid, errors
+
+
+def _insert_collaborators(session, jobs):
+    """job_collaborators rows of [(job_id, item)] that set collaborators."""
+    rows = [{'job_id': job_id, 'user_id': user_id} for job_id, item in jobs if 'collaborators' in item.values
+            for user_id in parse_collaborator_ids(item.values['collaborators'])]
+    if rows:
+        session.execute(job_collaborators_table.insert(), rows)
+
+
+def _serialized(session, job_ids):
+    names = serializers.default_fields(serializers.JOB_FIELDS)
+    to_dict = serializers.from_row(names)
+    statement = select(*serializers.columns(Jobs, names, serializers.JOB_FIELDS)).where(Jobs.id.in_(job_ids))
+    return {row.id: to_dict(row) for row in pagination.results(session, statement)}
+
+
+def _checked(session, mode, items, parse_failed):
+    """check_references and whether to write: an atomic batch is written only when every item is valid."""
+    items, errors = check_references(session, items)
+    return items, errors, bool(items) and not (mode == 'atomic' and (errors or parse_failed))
+
+
+# Write units for database.write_queue.perform. They return ({index: result} of the applied
+# items or None when nothing was written, {index: ItemError} of the items that failed the checks).
+
+def insert_jobs(session, mode, items, parse_failed):
+    items, errors, write = _checked(session, mode, items, parse_failed)
+    if not write:
+        return None, errors
+    jobs = Jobs.__table__
+    # every row has every column, as executemany needs
+    rows = [dict(dict.fromkeys(COLUMNS.values()), **item.values) for item in items]
+    # RETURNING with sort_by_parameter_order makes SQLAlchemy insert into SQLite row by row. In
+    # multi-row batches ids grow in the order of the rows within this one transaction, so sorted()
+    # gives them in parameter order as well.
+    job_ids = sorted(session.scalars(jobs.insert().returning(jobs.c.id), rows))
+    # Core bypasses the Jobs mapper events, so the links are written here
+    _insert_collaborators(session, list(zip(job_ids, items)))
+    links = [{'jobs': job_id, 'category': cat_id} for job_id, item in zip(job_ids, items) for cat_id in item.category_ids]
+    if links:
+        session.execute(association_table.insert(), links)
+    jobs_by_id = _serialized(session, job_ids)
+    return {item.index: {'id': job_id, 'job': jobs_by_id[job_id]} for job_id, item in zip(job_ids, items)}, errors
+
+
+def update_jobs(session, mode, items, parse_failed):
+    items, errors, write = _checked(session, mode, items, parse_failed)
+    if not write:
+        return None, errors
+    jobs = Jobs.__table__
+    statement = jobs.update().where(jobs.c.id == bindparam('_id'))
+    # one executemany per set of changed columns
+    with_values = sorted((item for item in items if item.values), key=lambda item: sorted(item.values))
+    for _, group in groupby(with_values, key=lambda item: sorted(item.values)):
+        session.execute(statement, [dict(item.values, _id=item.id) for item in group])
+
+    collaborators = [item.id for item in items if 'collaborators' in item.values]
+    if collaborators:
+        session.execute(job_collaborators_table.delete().where(job_collaborators_table.c.job_id.in_(collaborators)))
+    _insert_collaborators(session, [(item.id, item) for item in items])
+    # only the association rows that changed are deleted or inserted
+    new_categories = {item.id: item.category_ids for item in items if item.category_ids is not None}
+    if new_categories:
+        set_categories(session, new_categories)
+
+    jobs_by_id = _serialized(session, [item.id for item in items])
+    return {item.index: {'id': item.id, 'job': jobs_by_id[item.id]} for item in items}, errors
+
+
+def delete_jobs(session, mode, items, parse_failed):
+    items, errors, write = _checked(session, mode, items, parse_failed)
+    if not write:
+        return None, errors
+    job_ids = [item.id for item in items]
+    session.execute(association_table.delete().where(association_table.c.jobs.in_(job_ids)))
+    session.execute(job_collaborators_table.delete().where(job_collaborators_table.c.job_id.in_(job_ids)))
+    session.execute(Jobs.__table__.delete().where(Jobs.id.in_(job_ids)))
+    return {item.index: {'id': item.id} for item in items}, errors
+
+
+def batch_request(key):
+    """(mode, items) of the JSON body; aborts with 400 or 413 on a malformed batch."""
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get(key), list):
+        abort(400, message=f'Request body must be a JSON object with a "{key}" list')
+    mode = body.get('mode', 'atomic')
+    if mode not in MODES:
+        abort(400, message=f"Unknown mode {mode!r}. Use one of: {', '.join(MODES)}")
+    if len(body[key]) > MAX_ITEMS:
+        abort(413, message=f'A batch may have at most {MAX_ITEMS} items')
+    return mode, body[key]
+
+
+def run_batch(unit, mode, raw_items, parse, ok_status):
+    """Parses the items, runs unit on the parsed ones and builds the (body, status) response."""
+    items, errors = parse_items(raw_items, parse)
+    applied = None
+    if items:
+        applied, reference_errors = write_queue.perform(unit, mode, items, bool(errors))
+        errors.update(reference_errors)
+
+    results = []
+    for index in range(len(raw_items)):
+        if index in errors:
+            results.append({'index': index, 'status': errors[index].status, 'error': errors[index].message})
+        elif applied is None:
+            results.append({'index': index, 'status': NOT_APPLIED,
+                            'error': 'Not applied: the atomic batch has invalid items'})
+        else:
+            results.append(dict(applied[index], index=index, status=ok_status))
+    succeeded = len(applied or ())
+    if not errors:
+        status = ok_status
+    else:
+        status = 400 if mode == 'atomic' else 207
+    return {'mode': mode, 'succeeded': succeeded, 'failed': len(raw_items) - succeeded, 'results': results}, status
+
+
+class JobsBatchResource(Resource):
+    def post(self):
+        mode, raw_items = batch_request('jobs')
+        return run_batch(insert_jobs, mode, raw_items, parse_new_item, 201)
+
+    def patch(self):
+        mode, raw_items = batch_request('jobs')
+        return run_batch(update_jobs, mode, raw_items, parse_changed_item, 200)
+
+    def delete(self):
+        mode, raw_ids = batch_request('ids')
+        return run_batch(delete_jobs, mode, raw_ids, lambda index, job_id: Item(index, _id(job_id), {}, None), 200)
@@ -1,36 +1,37 @@
 from flask_restful import Resource, abort
-from flask import jsonify
+from flask import jsonify, request
 import datetime
+from database import archive
+from database import categories
 from database import db_session
+from database import filters
+from database import pagination
+from database import repository
+from database import response_cache
+from database import write_queue
 from models.jobs import Jobs
-from models.users import User
-from models.category import Category
+from . import conditional
+from . import list_query
+from . import serializers
+from . import streaming
 from .job_parsers import job_parser, job_put_parser
+from .serializers import job_to_dict, listed_job_to_dict
 
 
 def abort_if_job_not_found(job_id):
     session = db_session.create_session()
-    job = session.query(Jobs).get(job_id)
+    job = repository.get_job(session, job_id)
     if not job:
         abort(404, message=f"Job {job_id} not found")
     return job
 
 
-def job_to_dict(job_object):
-    if not job_object:
-        return None
-    return {
-        'id': job_object.id,
-        'team_leader_id': job_object.team_leader,
-        'job': job_object.job,
-        'work_size': job_object.work_size,
-        'collaborators': job_object.collaborators,
-        'start_date': job_object.start_date.isoformat() if job_object.start_date else None,
-        'end_date': job_object.end_date.isoformat() if job_object.end_date else None,
-        'is_finished': job_object.is_finished,
-        'categories': [{'id': cat.id, 'name': cat.name} for cat in job_object.categories] if hasattr(job_object,
-                                                                                                     'categories') else []
-    }
+def list_args_or_400(model, filter_spec, field_spec, sort_keys):
+    """list_query.ListArgs from the query string; aborts with 400 on a bad argument."""
+    try:
+        return list_query.parse(request.args, model, filter_spec, field_spec, sort_keys)
+    except list_query.ListArgsError as error:
+        abort(400, message=str(error))
 
 
 def parse_datetime_from_iso(iso_string):
@@ -42,110 +43,128 @@ def parse_datetime_from_iso(iso_string):
         return None
 
 
+def parse_dates(args):
+    """Parses start_date/end_date given in args; aborts with 400 on a bad format."""
+    dates = {}
+    for name in ('start_date', 'end_date'):
+        if args[name] is None:
+            continue
+        parsed = parse_datetime_from_iso(args[name])
+        if args[name] and not parsed:
+            abort(400, message=f"Invalid {name} format for '{args[name]}'. Use YYYY-MM-DDTHH:MM:SS.")
+        dates[name] = parsed
+    return dates
+
+
+def load_categories(session, category_ids):
+    missing = categories.missing(session, category_ids)
+    if missing:
+        abort(400, message=f"Category with id {missing[0]} not found.")
+    return categories.load(session, category_ids)
+
+
+def check_team_leader(session, team_leader_id):
+    if not repository.get_user(session, team_leader_id):
+        abort(400, message=f"Team leader with id {team_leader_id} not found.")
+
+
+# Write units for database.write_queue.perform: they run in the request session or
+# in the writer thread, must not commit and return serialized data.
+
+def insert_job(session, args, dates):
+    check_team_leader(session, args['team_leader_id'])
+    job = Jobs(
+        job=args['job'],
+        team_leader=args['team_leader_id'],
+        work_size=args.get('work_size'),
+        collaborators=args.get('collaborators'),
+        is_finished=args.get('is_finished', False)
+    )
+    job.start_date = dates.get('start_date') or datetime.datetime.now()
+    if dates.get('end_date'):
+        job.end_date = dates['end_date']
+    if args.get('category_ids'):
+        job.categories = load_categories(session, args['category_ids'])
+    session.add(job)
+    session.flush()
+    return job_to_dict(job)
+
+
+def update_job(session, job_id, args, dates):
+    job = repository.get_job(session, job_id)
+    if not job:
+        abort(404, message=f"Job {job_id} not found")
+    if args['job'] is not None:
+        job.job = args['job']
+    if args['team_leader_id'] is not None:
+        check_team_leader(session, args['team_leader_id'])
+        job.team_leader = args['team_leader_id']
+    if args['work_size'] is not None:
+        job.work_size = args['work_size']
+    if args['collaborators'] is not None:
+        job.collaborators = args['collaborators']
+    if args['is_finished'] is not None:
+        job.is_finished = args['is_finished']
+    for name, value in dates.items():
+        setattr(job, name, value)
+    if args.get('category_ids') is not None:
+        job.categories = load_categories(session, args['category_ids'])
+    session.flush()
+    return job_to_dict(job)
+
+
+def delete_job(session, job_id):
+    job = repository.get_job(session, job_id)
+    if not job:
+        abort(404, message=f"Job {job_id} not found")
+    session.delete(job)
+
+
 class JobsResource(Resource):
     def get(self, job_id):
-        job = abort_if_job_not_found(job_id)
-        return jsonify({'job': job_to_dict(job)})
+        session = db_session.create_session()
+        job = repository.get_job(session, job_id)
+        if job:
+            return conditional.object_response(job, lambda: jsonify({'job': job_to_dict(job)}))
+        archived_job = repository.get_archived_job(session, job_id)
+        if not archived_job:
+            abort(404, message=f"Job {job_id} not found")
+        return conditional.object_response(archived_job, lambda: jsonify({'job': listed_job_to_dict(archived_job)}))
 
     def delete(self, job_id):
-        job = abort_if_job_not_found(job_id)
-        session = db_session.create_session()
-        job_to_delete = session.query(Jobs).get(job_id)
-        session.delete(job_to_delete)
-        session.commit()
+        write_queue.perform(delete_job, job_id)
         return jsonify({'success': 'OK'})
 
     def put(self, job_id):
-        job_to_edit = abort_if_job_not_found(job_id)
+        abort_if_job_not_found(job_id)
         args = job_put_parser.parse_args()
-        session = db_session.create_session()
-
-        current_job_in_session = session.query(Jobs).get(job_id)
-
-        if args['job'] is not None:
-            current_job_in_session.job = args['job']
-        if args['team_leader_id'] is not None:
-            leader = session.query(User).get(args['team_leader_id'])
-            if not leader:
-                abort(400, message=f"Team leader with id {args['team_leader_id']} not found.")
-            current_job_in_session.team_leader = args['team_leader_id']
-        if args['work_size'] is not None:
-            current_job_in_session.work_size = args['work_size']
-        if args['collaborators'] is not None:
-            current_job_in_session.collaborators = args['collaborators']
-        if args['is_finished'] is not None:
-            current_job_in_session.is_finished = args['is_finished']
-
-        if args['start_date'] is not None:
-            parsed_start_date = parse_datetime_from_iso(args['start_date'])
-            if args['start_date'] and not parsed_start_date:
-                abort(400, message=f"Invalid start_date format for '{args['start_date']}'. Use YYYY-MM-DDTHH:MM:SS.")
-            current_job_in_session.start_date = parsed_start_date
-
-        if args['end_date'] is not None:
-            parsed_end_date = parse_datetime_from_iso(args['end_date'])
-            if args['end_date'] and not parsed_end_date:
-                abort(400, message=f"Invalid end_date format for '{args['end_date']}'. Use YYYY-MM-DDTHH:MM:SS.")
-            current_job_in_session.end_date = parsed_end_date
-
-        if args.get('category_ids') is not None:
-            new_categories = []
-            if args['category_ids']:
-                for cat_id in args['category_ids']:
-                    category = session.query(Category).get(cat_id)
-                    if not category:
-                        abort(400, message=f"Category with id {cat_id} not found.")
-                    new_categories.append(category)
-            current_job_in_session.categories = new_categories
-
-        session.commit()
-        return jsonify({'job': job_to_dict(current_job_in_session)})
+        job = write_queue.perform(update_job, job_id, args, parse_dates(args))
+        return jsonify({'job': job})
 
 
+@response_cache.cached(*archive.JOB_LIST_TABLES)
 class JobsListResource(Resource):
     def get(self):
         session = db_session.create_session()
-        jobs = session.query(Jobs).all()
-        return jsonify({'jobs': [job_to_dict(job) for job in jobs]})
+        args = list_args_or_400(Jobs, filters.JOB_FILTERS, serializers.JOB_FIELDS, pagination.JOB_SORT_KEYS)
+        include_archived = archive.include_archived_requested()
+        to_dict = serializers.from_row(args.fields)
+        if args.stream:
+            return streaming.response('jobs', lambda stream_session: archive.iter_jobs(
+                stream_session, include_archived, args.query, streaming.CHUNK_SIZE), to_dict)
+
+        if args.page is None:
+            def make_list_response():
+                jobs = archive.list_jobs(session, include_archived, args.query)
+                return jsonify({'jobs': [to_dict(job) for job in jobs]})
+
+            return conditional.list_response(session, archive.models(include_archived), args.query,
+                                             make_list_response)
+        jobs, next_cursor = archive.page_jobs(session, args.page, include_archived, args.query)
+        return conditional.page_response('jobs', jobs, next_cursor, lambda: jsonify(
+            {'jobs': [to_dict(job) for job in jobs], 'next': next_cursor}))
 
     def post(self):
         args = job_parser.parse_args()
-        session = db_session.create_session()
-
-        leader = session.query(User).get(args['team_leader_id'])
-        if not leader:
-            abort(400, message=f"Team leader with id {args['team_leader_id']} not found.")
-
-        job = Jobs(
-            job=args['job'],
-            team_leader=args['team_leader_id'],
-            work_size=args.get('work_size'),
-            collaborators=args.get('collaborators'),
-            is_finished=args.get('is_finished', False)
-        )
-
-        if args['start_date']:
-            parsed_start_date = parse_datetime_from_iso(args['start_date'])
-            if not parsed_start_date:
-                abort(400, message=f"Invalid start_date format for '{args['start_date']}'. Use YYYY-MM-DDTHH:MM:SS.")
-            job.start_date = parsed_start_date
-        else:
-            job.start_date = datetime.datetime.now()
-
-        if args['end_date']:
-            parsed_end_date = parse_datetime_from_iso(args['end_date'])
-            if not parsed_end_date:
-                abort(400, message=f"Invalid end_date format for '{args['end_date']}'. Use YYYY-MM-DDTHH:MM:SS.")
-            job.end_date = parsed_end_date
-
-        if args.get('category_ids'):
-            for cat_id in args['category_ids']:
-                category = session.query(Category).get(cat_id)
-                if not category:
-                    session.rollback()
-                    abort(400, message=f"Category with id {cat_id} not found.")
-                job.categories.append(category)
-
-        session.add(job)
-        session.commit()
-        return {'id': job.id, 'job': job_to_dict(job)}, 201
+        job = write_queue.perform(insert_job, args, parse_dates(args))
+        return {'id': job['id'], 'job': job}, 201
@@ -0,0 +1,66 @@
+"""Query string of the job and user list endpoints: pagination, filters and fields.
+
+    /api/v2/jobs?is_finished=0&work_size_lt=20&fields=id,job,work_size&limit=50
+
+Filters (database/filters.py) become WHERE clauses, pagination arguments
+are described in database/pagination.py. fields= is a sparse fieldset:
+only the listed keys are serialized and only their columns are selected
+(api/serializers.py); the categories subquery runs only when asked for.
+"""
+from collections import namedtuple
+
+from sqlalchemy import select
+
+from database import archive
+from database import filters
+from database import pagination
+from . import serializers
+from . import streaming
+
+ListArgs = namedtuple('ListArgs', 'page fields query stream')
+
+
+class ListArgsError(ValueError):
+    """Bad pagination, filter or fields argument; handlers answer 400."""
+
+
+def parse_fields(args, spec):
+    """Requested field names in the given order, or None when fields= is absent."""
+    raw = args.get('fields')
+    if not raw:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in str(raw).split(',') if name.strip()))
+    unknown = [name for name in names if name not in spec]
+    if unknown or not names:
+        raise ListArgsError(f"Unknown fields: {', '.join(unknown) or raw}. Available: {', '.join(spec)}")
+    return names
+
+
+def parse(args, model, filter_spec, field_spec, sort_keys):
+    """ListArgs for a list endpoint; query(model) builds the filtered select of the fields.
+
+    fields are the output names: the requested ones or the defaults, plus
+    'archived' with include_archived=1. Rows of query(model) turn into
+    dicts with serializers.from_row(fields).
+
+    With stream=1 there is no page: the whole list is exported (api/streaming.py).
+    """
+    stream = streaming.wants_stream(args)
+    try:
+        page = None if stream else pagination.parse(args, sort_keys)
+        filters.conditions(model, args, filter_spec)
+    except (pagination.PageError, filters.FilterError) as error:
+        raise ListArgsError(str(error))
+    names = parse_fields(args, field_spec) or serializers.default_fields(field_spec)
+    if 'archived' in field_spec and 'archived' not in names and archive.wants_archived(args):
+        names.append('archived')
+    # id and the sort key are always read: for merging with the archive and for the next cursor;
+    # version for the ETag of a page (api/conditional.py); archived jobs have none
+    keys = ('id',) if page is None else ('id', page.sort)
+
+    def query(target):
+        target_keys = keys + ('version',) if page is not None and hasattr(target, 'version') else keys
+        return select(*serializers.columns(target, names, field_spec, target_keys)).where(
+            *filters.conditions(target, args, filter_spec))
+
+    return ListArgs(page, names, query, stream)
@@ -0,0 +1,15 @@
+import flask
+from flask import jsonify
+from database import metrics
+
+blueprint = flask.Blueprint(
+    'metrics_api',
+    __name__,
+    template_folder='templates',
+    url_prefix='/api'
+)
+
+
+@blueprint.route('/metrics', methods=['GET'])
+def get_metrics():
+    return jsonify(metrics.collect())
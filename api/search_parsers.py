@@ -0,0 +1,8 @@
+from flask_restful import reqparse
+
+search_parser = reqparse.RequestParser()
+search_parser.add_argument('q', type=str, required=True, location='args', help="Search query (q) cannot be blank!")
+search_parser.add_argument('type', type=str, location='args', default='all', choices=('all', 'jobs', 'users'),
+                           help="Search type must be one of: all, jobs, users")
+search_parser.add_argument('page', type=int, location='args', default=1, help="Page must be an integer")
+search_parser.add_argument('per_page', type=int, location='args', default=20, help="per_page must be an integer")
@@ -0,0 +1,60 @@
+from flask import jsonify
+from flask_restful import Resource, abort
+from database import db_session
+from database import search
+from .search_parsers import search_parser
+
+MAX_PER_PAGE = 100
+
+
+def job_hit_to_dict(row):
+    return {
+        'id': row['id'],
+        'job': row['job'],
+        'team_leader_id': row['team_leader'],
+        'is_finished': bool(row['is_finished']),
+        'snippet': search.highlight(row['snippet']),
+        'score': row['score'],
+    }
+
+
+def user_hit_to_dict(row):
+    return {
+        'id': row['id'],
+        'surname': row['surname'],
+        'name': row['name'],
+        'speciality': row['speciality'],
+        'position': row['position'],
+        'snippet': search.highlight(row['snippet']),
+        'score': row['score'],
+    }
+
+
+SECTIONS = {
+    'jobs': (search.search_jobs, job_hit_to_dict),
+    'users': (search.search_users, user_hit_to_dict),
+}
+
+
+class SearchResource(Resource):
+    """Ranked full-text search over jobs and users; bm25 scores are lower for better matches."""
+
+    def get(self):
+        args = search_parser.parse_args()
+        query = search.match_query(args['q'])
+        if query is None:
+            abort(400, message="Search query must contain at least one word.")
+        if args['page'] < 1:
+            abort(400, message="page must be at least 1.")
+        if not 1 <= args['per_page'] <= MAX_PER_PAGE:
+            abort(400, message=f"per_page must be between 1 and {MAX_PER_PAGE}.")
+
+        session = db_session.create_session()
+        offset = (args['page'] - 1) * args['per_page']
+        result = {'q': args['q'], 'page': args['page'], 'per_page': args['per_page']}
+        for name, (find, to_dict) in SECTIONS.items():
+            if args['type'] not in ('all', name):
+                continue
+            total, rows = find(session, query, args['per_page'], offset)
+            result[name] = {'total': total, 'items': [to_dict(row) for row in rows]}
+        return jsonify(result)
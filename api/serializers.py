@@ -0,0 +1,150 @@
+"""JSON of the API: job and user fields, list projections and the encoder.
+
+Every field is described once and serves both read paths:
+
+* lists select the fields as labelled Core columns (columns()), so a row
+  already holds the output values in field order and from_row() turns it
+  into a dict with zip(). Categories come in the same SELECT as a JSON
+  array built by SQLite (json_group_array); no ORM objects are created.
+* single objects read or written through the ORM go through job_to_dict
+  and user_to_dict.
+
+Datetimes stay datetime objects and are written as ISO 8601 by dumps():
+with orjson when it is installed, with the json module otherwise. The
+Flask app (JSONProvider), the flask_restful Api (output_json), streamed
+lists and asgi.py all encode through dumps().
+"""
+import datetime
+import json
+from collections import namedtuple
+from operator import attrgetter
+
+from flask import make_response
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import String, TypeDecorator, func, literal, select, type_coerce
+
+from models.category import Category
+from models.jobs_archive import ArchivedJob
+
+try:
+    import orjson
+except ImportError:  # optional, json is used instead
+    orjson = None
+
+# column(model): SQL expression of the field for the model; get(obj): its value from an ORM object;
+# default: output when fields= is not given
+Field = namedtuple('Field', 'column get default')
+
+
+def _attribute(name, default=True):
+    return Field(lambda model: getattr(model, name), attrgetter(name), default)
+
+
+class _JSONText(TypeDecorator):
+    """JSON built by SQLite, decoded with the same backend as dumps()."""
+    impl = String
+    cache_ok = True
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else loads(value)
+
+
+def _categories_column(model):
+    """[{"id", "name"}, ...] of a job (Jobs or ArchivedJob) by category id, as a correlated subquery."""
+    secondary = model.categories.property.secondary
+    ordered = (select(Category.id, Category.name).join(secondary, secondary.c.category == Category.id)
+               .where(secondary.c.jobs == model.id).order_by(Category.id).correlate(model).subquery())
+    array = select(func.json_group_array(func.json_object('id', ordered.c.id, 'name', ordered.c.name)))
+    return type_coerce(array.scalar_subquery(), _JSONText)
+
+
+def _categories(job):
+    return [{'id': category.id, 'name': category.name} for category in job.categories]
+
+
+JOB_FIELDS = {
+    'id': _attribute('id'),
+    'team_leader_id': _attribute('team_leader'),
+    'job': _attribute('job'),
+    'work_size': _attribute('work_size'),
+    'collaborators': _attribute('collaborators'),
+    'start_date': _attribute('start_date'),
+    'end_date': _attribute('end_date'),
+    'is_finished': _attribute('is_finished'),
+    'categories': Field(_categories_column, _categories, True),
+    # added to lists with include_archived=1 or on request
+    'archived': Field(lambda model: literal(model is ArchivedJob), lambda job: isinstance(job, ArchivedJob), False),
+}
+
+USER_FIELDS = {name: _attribute(name) for name in (
+    'id', 'surname', 'name', 'age', 'position', 'speciality', 'address', 'email', 'city_from', 'modified_date')}
+
+
+def default_fields(spec):
+    return [name for name, field in spec.items() if field.default]
+
+
+def columns(model, names, spec, keys=()):
+    """Labelled columns of the fields names, then of the attributes keys not among them.
+
+    keys are read besides the output: id and the sort key for the next cursor.
+    """
+    return [spec[name].column(model).label(name) for name in names] + [
+        getattr(model, key).label(key) for key in keys if key not in names]
+
+
+def from_row(names):
+    """Row of select(*columns(model, names, ...)) -> {name: value}."""
+    return lambda row: dict(zip(names, row))
+
+
+def to_dict(obj, spec, names=None):
+    if obj is None:
+        return None
+    return {name: spec[name].get(obj) for name in (names or default_fields(spec))}
+
+
+def job_to_dict(job):
+    return to_dict(job, JOB_FIELDS)
+
+
+def listed_job_to_dict(job):
+    """job_to_dict with an 'archived' flag, for responses that may mix hot and archived jobs."""
+    return to_dict(job, JOB_FIELDS, default_fields(JOB_FIELDS) + ['archived'])
+
+
+def user_to_dict(user):
+    return to_dict(user, USER_FIELDS)
+
+
+def _default(value):
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return DefaultJSONProvider.default(value)
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+    loads = orjson.loads
+
+    def dumps(value):
+        return orjson.dumps(value, default=_default, option=_OPTIONS).decode()
+else:
+    loads = json.loads
+
+    def dumps(value):
+        return json.dumps(value, default=_default, sort_keys=True, separators=(',', ':'))
+
+
+class JSONProvider(DefaultJSONProvider):
+    """app.json: jsonify() through dumps(); loads() is unchanged."""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+
+def output_json(data, code, headers=None):
+    """flask_restful representation of application/json through dumps()."""
+    response = make_response(dumps(data) + '\n', code)
+    response.headers.extend(headers or {})
+    return response
@@ -0,0 +1,60 @@
+"""Streaming JSON for full exports of the list endpoints (stream=1).
+
+    /api/v2/jobs?stream=1&is_finished=0
+
+The body is the same document as with all=1 ({"jobs": [...]}), but rows
+are read from the cursor CHUNK_SIZE at a time (yield_per) and written out
+as soon as a chunk is serialized. Neither the full list of objects nor
+the full JSON string is ever held in memory.
+
+stream=1 always exports the whole (filtered) list ordered by id: limit,
+sort and cursor are ignored.
+"""
+from flask import Response, stream_with_context
+from database import db_session
+from database import pagination
+from . import serializers
+
+CHUNK_SIZE = 500
+STREAM_ARG = 'stream'
+
+
+def wants_stream(args):
+    return str(args.get(STREAM_ARG, '')).lower() in ('1', 'true', 'yes')
+
+
+def results(session, statement):
+    """Rows (or entities) of statement, fetched from the cursor in chunks."""
+    return pagination.results(session, statement.execution_options(yield_per=CHUNK_SIZE))
+
+
+def json_list(key, items, to_dict):
+    """Yields the JSON text of {key: [to_dict(item), ...]} chunk by chunk."""
+    dumps = serializers.dumps
+    yield '{' + dumps(key) + ':['
+    chunk, first = [], True
+    for item in items:
+        chunk.append(dumps(to_dict(item)))
+        if len(chunk) == CHUNK_SIZE:
+            yield ('' if first else ',') + ','.join(chunk)
+            chunk, first = [], False
+    if chunk:
+        yield ('' if first else ',') + ','.join(chunk)
+    yield ']}'
+
+
+def response(key, rows, to_dict):
+    """A streamed application/json response of {key: [...]}; rows(session) yields the entities.
+
+    The request session is closed in teardown as soon as the view returns,
+    before the body is sent, so the rows are read in a session owned by
+    the generator and closed after the last chunk.
+    """
+    def generate():
+        session = db_session.new_session()
+        try:
+            yield from json_list(key, rows(session), to_dict)
+        finally:
+            session.close()
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
@@ -1,7 +1,17 @@
 import flask
 from flask import jsonify, make_response, request
 from database import db_session
-from models.users import User
+from database import filters
+from database import pagination
+from database import repository
+from database import response_cache
+from database import write_queue
+from models.users import User, hash_password
+from . import conditional
+from . import list_query
+from . import serializers
+from . import streaming
+from .serializers import user_to_dict
 
 blueprint = flask.Blueprint(
     'users_api',
@@ -11,44 +21,49 @@ blueprint = flask.Blueprint(
 )
 
 
-# --- API Helper to convert User object to dictionary (excluding password) ---
-def user_to_dict(user_object):
-    if not user_object:
-        return None
-    return {
-        'id': user_object.id,
-        'surname': user_object.surname,
-        'name': user_object.name,
-        'age': user_object.age,
-        'position': user_object.position,
-        'speciality': user_object.speciality,
-        'address': user_object.address,
-        'email': user_object.email,
-        'city_from': user_object.city_from,
-        'modified_date': user_object.modified_date.isoformat() if user_object.modified_date else None
-    }
-
-
 # --- 1. Получение всех пользователей ---
 @blueprint.route('/users', methods=['GET'])
+@response_cache.cached('users')
 def get_users():
     db_sess = db_session.create_session()
-    users = db_sess.query(User).all()
-    if not users:
-        return make_response(jsonify({'error': 'No users found'}), 404)
-    return jsonify(
-        {'users': [user_to_dict(user) for user in users]}
-    )
+    try:
+        args = list_query.parse(request.args, User, filters.USER_FILTERS, serializers.USER_FIELDS,
+                                pagination.USER_SORT_KEYS)
+    except list_query.ListArgsError as error:
+        return make_response(jsonify({'error': str(error)}), 400)
+    project = serializers.from_row(args.fields)
+    # stream=1: the whole list, written out while it is read (an empty list instead of 404)
+    if args.stream:
+        return streaming.response('users', lambda session: streaming.results(
+            session, args.query(User).order_by(User.id)), project)
+    page = args.page
+
+    def make_list_response(users, next_cursor):
+        if not users and (page is None or page.after is None):
+            return make_response(jsonify({'error': 'No users found'}), 404)
+        return jsonify(
+            {
+                **({'next': next_cursor} if page is not None else {}),
+                'users': [project(user) for user in users],
+            }
+        )
+
+    # all=1: the whole list in one response, as before pagination
+    if page is None:
+        return conditional.list_response(db_sess, [User], args.query, lambda: make_list_response(
+            pagination.results(db_sess, args.query(User)), None))
+    users, next_cursor = pagination.fetch(db_sess, User, page, args.query(User))
+    return conditional.page_response('users', users, next_cursor, lambda: make_list_response(users, next_cursor))
 
 
 # --- 2. Получение одного пользователя ---
 @blueprint.route('/users/<int:user_id>', methods=['GET'])
 def get_one_user(user_id):
     db_sess = db_session.create_session()
-    user = db_sess.query(User).get(user_id)
+    user = repository.get_user(db_sess, user_id)
     if not user:
         return make_response(jsonify({'error': f'User with id {user_id} not found'}), 404)
-    return jsonify({'user': user_to_dict(user)})
+    return conditional.object_response(user, lambda: jsonify({'user': user_to_dict(user)}))
 
 
 # --- 3. Добавление пользователя ---
@@ -64,24 +79,29 @@ def create_user():
 
     db_sess = db_session.create_session()
 
-    if db_sess.query(User).filter(User.email == request.json['email']).first():
+    if repository.get_user_by_email(db_sess, request.json['email']):
         return make_response(jsonify({'error': f'User with email {request.json["email"]} already exists'}),
                              409)  # Conflict
 
-    new_user = User(
-        name=request.json['name'],
-        surname=request.json.get('surname'),
-        age=request.json.get('age'),
-        position=request.json.get('position'),
-        speciality=request.json.get('speciality'),
-        address=request.json.get('address'),
-        email=request.json['email'],
-        city_from = request.json.get('city_from')
-    )
-    new_user.set_password(request.json['password'])
-
-    db_sess.add(new_user)
-    db_sess.commit()
+    # Hashed once, outside the unit: a retry after "database is locked" does not hash again
+    hashed_password = hash_password(request.json['password'])
+
+    def insert_user(session):
+        user = User(
+            name=request.json['name'],
+            surname=request.json.get('surname'),
+            age=request.json.get('age'),
+            position=request.json.get('position'),
+            speciality=request.json.get('speciality'),
+            address=request.json.get('address'),
+            email=request.json['email'],
+            city_from=request.json.get('city_from'),
+            hashed_password=hashed_password
+        )
+        session.add(user)
+        return user
+
+    new_user = write_queue.commit(insert_user)
 
     return make_response(jsonify({
         'message': 'User created successfully',
@@ -93,7 +113,7 @@ def create_user():
 @blueprint.route('/users/<int:user_id>', methods=['PUT'])
 def edit_user(user_id):
     db_sess = db_session.create_session()
-    user_to_edit = db_sess.query(User).get(user_id)
+    user_to_edit = repository.get_user(db_sess, user_id)
 
     if not user_to_edit:
         return make_response(jsonify({'error': f'User with id {user_id} not found'}), 404)
@@ -101,25 +121,30 @@ def edit_user(user_id):
     if not request.json:
         return make_response(jsonify({'error': 'Request must be JSON'}), 400)
 
-    user_to_edit.name = request.json.get('name', user_to_edit.name)
-    user_to_edit.surname = request.json.get('surname', user_to_edit.surname)
-    user_to_edit.age = request.json.get('age', user_to_edit.age)
-    user_to_edit.position = request.json.get('position', user_to_edit.position)
-    user_to_edit.speciality = request.json.get('speciality', user_to_edit.speciality)
-    user_to_edit.address = request.json.get('address', user_to_edit.address)
-    user_to_edit.city_from = request.json.get('city_from', user_to_edit.city_from)
-
     new_email = request.json.get('email')
     if new_email and new_email != user_to_edit.email:
-        if db_sess.query(User).filter(User.email == new_email).first():
+        if repository.get_user_by_email(db_sess, new_email):
             return make_response(jsonify({'error': f'Email {new_email} is already taken'}), 409)  # 409 Conflict
-        user_to_edit.email = new_email
 
     new_password = request.json.get('password')
-    if new_password:
-        user_to_edit.set_password(new_password)
-
-    db_sess.commit()
+    hashed_password = hash_password(new_password) if new_password else None
+
+    def update_user(session):
+        # re-read on every attempt: a retry starts after a rollback
+        user = repository.get_user(session, user_id)
+        if user is None:
+            return None
+        for name in ('name', 'surname', 'age', 'position', 'speciality', 'address', 'city_from'):
+            setattr(user, name, request.json.get(name, getattr(user, name)))
+        if new_email:
+            user.email = new_email
+        if hashed_password:
+            user.hashed_password = hashed_password
+        return user
+
+    user_to_edit = write_queue.commit(update_user)
+    if user_to_edit is None:
+        return make_response(jsonify({'error': f'User with id {user_id} not found'}), 404)
 
     return jsonify({
         'message': 'User updated successfully',
@@ -131,16 +156,19 @@ def edit_user(user_id):
 @blueprint.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
     db_sess = db_session.create_session()
-    user_to_delete = db_sess.query(User).get(user_id)
+    user_to_delete = repository.get_user(db_sess, user_id)
 
     if not user_to_delete:
         return make_response(jsonify({'error': f'User with id {user_id} not found'}), 404)
 
+    def remove_user(session):
+        user = repository.get_user(session, user_id)
+        if user is not None:
+            session.delete(user)
+
     try:
-        db_sess.delete(user_to_delete)
-        db_sess.commit()
+        write_queue.commit(remove_user)
     except Exception as e:
-        db_sess.rollback()
         return make_response(
             jsonify({'error': 'Failed to delete user. '
                               'Check for associated records (e.g., jobs).', 'details': str(e)}),
@@ -1,121 +1,140 @@
 from flask import jsonify
 from flask_restful import Resource, abort
+from werkzeug.exceptions import HTTPException
+from sqlalchemy import or_, select
+from sqlalchemy.orm import joinedload
 from database import db_session
-from models.users import User
+from database import filters
+from database import pagination
+from database import repository
+from database import response_cache
+from database import write_queue
+from models.users import User, hash_password
+from models.jobs import Jobs, job_collaborators_table
+from . import conditional
+from . import serializers
+from . import streaming
+from .jobs_resource import list_args_or_400
+from .serializers import job_to_dict, user_to_dict
 from .user_parsers import user_parser, user_put_parser
 
 
 def abort_if_user_not_found(user_id):
     session = db_session.create_session()
-    user = session.query(User).get(user_id)
+    user = repository.get_user(session, user_id)
     if not user:
         abort(404, message=f"User {user_id} not found")
     return user
 
 
-def user_to_dict(user_object):
-    if not user_object:
-        return None
-    return {
-        'id': user_object.id,
-        'surname': user_object.surname,
-        'name': user_object.name,
-        'age': user_object.age,
-        'position': user_object.position,
-        'speciality': user_object.speciality,
-        'address': user_object.address,
-        'email': user_object.email,
-        'city_from': user_object.city_from,
-        'modified_date': user_object.modified_date.isoformat() if user_object.modified_date else None
-    }
+USER_FIELDS = ('name', 'surname', 'age', 'position', 'speciality', 'address', 'city_from')
+
+
+def email_taken(session, email):
+    return repository.get_user_by_email(session, email) is not None
+
+
+# Write units for database.write_queue.perform: they run in the request session or
+# in the writer thread, must not commit and return serialized data. Passwords are
+# hashed by the caller so that hashing does not hold up the writer.
+
+def insert_user(session, args, hashed_password):
+    if email_taken(session, args['email']):
+        abort(409, message=f"User with email {args['email']} already exists")
+    user = User(email=args['email'], hashed_password=hashed_password,
+                **{name: args.get(name) for name in USER_FIELDS})
+    session.add(user)
+    session.flush()
+    return user_to_dict(user)
+
+
+def update_user(session, user_id, args, hashed_password):
+    user = repository.get_user(session, user_id)
+    if not user:
+        abort(404, message=f"User {user_id} not found")
+    for name in USER_FIELDS:
+        if args[name] is not None:
+            setattr(user, name, args[name])
+    if args['email'] is not None and args['email'] != user.email:
+        if email_taken(session, args['email']):
+            abort(409, message=f"Email {args['email']} already exists")
+        user.email = args['email']
+    if hashed_password is not None:
+        user.hashed_password = hashed_password
+    session.flush()
+    return user_to_dict(user)
+
+
+def delete_user(session, user_id):
+    user = repository.get_user(session, user_id)
+    if not user:
+        abort(404, message=f"User {user_id} not found")
+    session.delete(user)
+    session.flush()
+
+
+def perform_or_500(message, unit, *args):
+    try:
+        return write_queue.perform(unit, *args)
+    except HTTPException:
+        raise
+    except Exception as e:
+        abort(500, message=message.format(error=str(e)))
 
 
 class UsersResource(Resource):
     def get(self, user_id):
         user = abort_if_user_not_found(user_id)
-        return jsonify({'user': user_to_dict(user)})
+        return conditional.object_response(user, lambda: jsonify({'user': user_to_dict(user)}))
 
     def delete(self, user_id):
-        user = abort_if_user_not_found(user_id)
-        session = db_session.create_session()
-        user_to_delete = session.query(User).get(user_id)
-        try:
-            session.delete(user_to_delete)
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            abort(500, message=f"Error deleting user: {str(e)}. Check for associated records.")
+        perform_or_500("Error deleting user: {error}. Check for associated records.", delete_user, user_id)
         return jsonify({'success': 'OK'})
 
     def put(self, user_id):
-        user = abort_if_user_not_found(user_id)
+        abort_if_user_not_found(user_id)
         args = user_put_parser.parse_args()
-        session = db_session.create_session()
-        user_to_edit = session.query(User).get(user_id)
-
-        if args['name'] is not None:
-            user_to_edit.name = args['name']
-        if args['surname'] is not None:
-            user_to_edit.surname = args['surname']
-        if args['age'] is not None:
-            user_to_edit.age = args['age']
-        if args['position'] is not None:
-            user_to_edit.position = args['position']
-        if args['speciality'] is not None:
-            user_to_edit.speciality = args['speciality']
-        if args['address'] is not None:
-            user_to_edit.address = args['address']
-        if args['city_from'] is not None:
-            user_to_edit.city_from = args['city_from']
-
-        if args['email'] is not None and args['email'] != user_to_edit.email:
-            if session.query(User).filter(User.email == args['email']).first():
-                session.rollback()
-                abort(409, message=f"Email {args['email']} already exists")
-            user_to_edit.email = args['email']
-
-        if args['password'] is not None:
-            user_to_edit.set_password(args['password'])
-
-        try:
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            abort(500, message=f"Error committing user changes: {str(e)}")
-
-        return jsonify({'user': user_to_dict(user_to_edit)})
+        hashed_password = hash_password(args['password']) if args['password'] is not None else None
+        user = perform_or_500("Error committing user changes: {error}", update_user, user_id, args, hashed_password)
+        return jsonify({'user': user})
 
 
+@response_cache.cached('users')
 class UsersListResource(Resource):
     def get(self):
         session = db_session.create_session()
-        users = session.query(User).all()
-        return jsonify({'users': [user_to_dict(user) for user in users]})
+        args = list_args_or_400(User, filters.USER_FILTERS, serializers.USER_FIELDS, pagination.USER_SORT_KEYS)
+        project = serializers.from_row(args.fields)
+        if args.stream:
+            return streaming.response('users', lambda stream_session: streaming.results(
+                stream_session, args.query(User).order_by(User.id)), project)
+
+        if args.page is None:
+            return conditional.list_response(session, [User], args.query, lambda: jsonify(
+                {'users': [project(user) for user in pagination.results(session, args.query(User))]}))
+        users, next_cursor = pagination.fetch(session, User, args.page, args.query(User))
+        return conditional.page_response('users', users, next_cursor, lambda: jsonify(
+            {'users': [project(user) for user in users], 'next': next_cursor}))
 
     def post(self):
         args = user_parser.parse_args()
-        session = db_session.create_session()
-
-        if session.query(User).filter(User.email == args['email']).first():
+        # Cheap check before the expensive hash; insert_user repeats it inside the write
+        if email_taken(db_session.create_session(), args['email']):
             abort(409, message=f"User with email {args['email']} already exists")
+        user = perform_or_500("Error creating user: {error}", insert_user, args, hash_password(args['password']))
+        return {'id': user['id'], 'user': user}, 201
+
 
-        user = User(
-            name=args['name'],
-            surname=args.get('surname'),
-            age=args.get('age'),
-            position=args.get('position'),
-            speciality=args.get('speciality'),
-            address=args.get('address'),
-            city_from=args.get('city_from'),
-            email=args['email']
-        )
-        user.set_password(args['password'])
-
-        try:
-            session.add(user)
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            abort(500, message=f"Error creating user: {str(e)}")
-
-        return {'id': user.id, 'user': user_to_dict(user)}, 201
+class UserJobsResource(Resource):
+    def get(self, user_id):
+        abort_if_user_not_found(user_id)
+        session = db_session.create_session()
+        # Оба условия идут по индексам: ix_jobs_team_leader и ix_job_collaborators_user_id
+        collaborations = select(job_collaborators_table.c.job_id).where(job_collaborators_table.c.user_id == user_id)
+        jobs = session.scalars(select(Jobs).options(joinedload(Jobs.categories)).where(
+            or_(Jobs.team_leader == user_id, Jobs.id.in_(collaborations))
+        ).order_by(Jobs.id)).unique().all()
+        return jsonify({'jobs': [
+            dict(job_to_dict(job), role='leader' if job.team_leader == user_id else 'collaborator')
+            for job in jobs
+        ]})
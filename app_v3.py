@@ -4,38 +4,95 @@ import os
 import random
 
 import requests
-from sqlalchemy import orm
+from sqlalchemy import orm, select
+from api import aggregates_api
 from api import jobs_api
+from api import jobs_batch
+from api import metrics_api
 from api import users_api
 from api import users_resource
 from api import jobs_resource
+from api import search_resource
+from api import serializers
 from forms.department_form import DepartmentForm
 from forms.login_form import LoginForm
 from forms.register_form import RegisterForm
 from forms.job_form import JobForm
-from models.departments import Department
+from models.departments import Department, parse_member_ids, get_member_ids, set_members
 from models.users import User
 from models.jobs import Jobs
-from models.category import Category
+from database import archive
+from database import categories
 from database import db_session
+from database import instrumentation
+from database import passwords
+from database import repository
+from database import response_cache
+from database import user_cache
+from database import write_queue
 from flask_restful import Api
 from flask import Flask, url_for, render_template, request, redirect, abort
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 
 app = Flask(__name__)
+# jsonify и ответы flask_restful кодируются через api/serializers.py (orjson, если установлен)
+app.json = serializers.JSONProvider(app)
 api = Api(app)
+api.representations['application/json'] = serializers.output_json
 
 app.config['SECRET_KEY'] = 'yandexlyceum_secret_key'
 UPLOAD_FOLDER = 'static/img'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Переопределения engine_profile.DEFAULT_PROFILE (прагмы SQLite, размер пула)
+app.config['DB_ENGINE_PROFILE'] = {}
+# Подсчет открытых сессий и поиск утечек сессий по концу запроса
+app.config['DB_SESSION_DEBUG'] = False
+# Файлы реплик только для чтения; пустой список - режим реплик выключен
+app.config['DB_REPLICAS'] = []
+app.config['DB_REPLICATION_INTERVAL'] = 1.0
+# Заголовки X-DB-* со статистикой SQL (None - только в debug) и поиск N+1
+app.config['SQL_INSTRUMENTATION_HEADERS'] = None
+app.config['SQL_N_PLUS_ONE_THRESHOLD'] = 5
+# Бюджет SQL-выражений на запрос; в строгом режиме превышение - ошибка
+app.config['SQL_QUERY_BUDGET'] = None
+app.config['SQL_STRICT_BUDGET'] = False
+# Групповая фиксация записей REST-ресурсов через один поток-писатель
+app.config['DB_WRITE_QUEUE'] = False
+app.config['DB_WRITE_QUEUE_MAX_BATCH'] = 64
+app.config['DB_WRITE_QUEUE_MAX_DELAY'] = 0.002
+# Повторы транзакции при "database is locked" (вне очереди)
+app.config['DB_LOCK_RETRIES'] = 5
+# Кэш ответов списков и страницы департаментов (0 записей - выключен), TTL в секундах
+app.config['RESPONSE_CACHE_SIZE'] = 256
+app.config['RESPONSE_CACHE_TTL'] = 30.0
+# Кэш вошедшего пользователя для Flask-Login (0 записей - выключен), TTL в секундах
+app.config['USER_CACHE_SIZE'] = 1024
+app.config['USER_CACHE_TTL'] = 60.0
+# Хеширование паролей: метод, стоимость (None - по умолчанию Werkzeug) и пул процессов
+app.config['PASSWORD_HASH_METHOD'] = 'scrypt'
+app.config['PASSWORD_HASH_ITERATIONS'] = None
+app.config['PASSWORD_POOL_WORKERS'] = 2
+app.config['PASSWORD_POOL_MAX_PENDING'] = 32
+
+db_session.init_app(app)
+instrumentation.init_app(app)
+write_queue.init_app(app)
+response_cache.init_app(app)
+user_cache.init_app(app)
+passwords.init_app(app)
 
 app.register_blueprint(jobs_api.blueprint)
 app.register_blueprint(users_api.blueprint)
+app.register_blueprint(metrics_api.blueprint)
+app.register_blueprint(aggregates_api.blueprint)
 
 api.add_resource(users_resource.UsersListResource, '/api/v2/users')
 api.add_resource(users_resource.UsersResource, '/api/v2/users/<int:user_id>')
+api.add_resource(users_resource.UserJobsResource, '/api/v2/users/<int:user_id>/jobs')
 api.add_resource(jobs_resource.JobsListResource, '/api/v2/jobs')
 api.add_resource(jobs_resource.JobsResource, '/api/v2/jobs/<int:job_id>')
+api.add_resource(jobs_batch.JobsBatchResource, '/api/v2/jobs/batch')
+api.add_resource(search_resource.SearchResource, '/api/v2/search')
 
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -55,7 +112,9 @@ ASTRONAUTS = [
 @app.route("/")
 def works_log():
     db_sess = db_session.create_session()
-    jobs = db_sess.query(Jobs).all()
+    # Руководитель и категории приходят в том же SELECT: без запроса на каждую работу
+    jobs = archive.list_jobs(db_sess, archive.include_archived_requested(), query=lambda model: select(model).options(
+        orm.joinedload(model.leader), orm.joinedload(model.categories)))
     return render_template("works_log.html", jobs=jobs, title="Works log")
 
 
@@ -66,7 +125,11 @@ def index_with_title(title):
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db_session.create_session().query(User).get(user_id)
+    try:
+        # Без запроса к базе на каждый запрос: данные вошедшего пользователя из кэша процесса
+        return user_cache.load(int(user_id))
+    except ValueError:
+        return None
 
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -77,8 +140,17 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         db_sess = db_session.create_session()
-        user = db_sess.query(User).filter(User.email == form.email.data).first()
+        user = repository.get_user_by_email(db_sess, form.email.data)
         if user and user.check_password(form.password.data):
+            if passwords.needs_rehash(user.hashed_password):
+                # Хеш со старыми параметрами пересчитывается, пока пароль известен
+                hashed_password = passwords.hash_password(form.password.data)
+                try:
+                    write_queue.commit(lambda session: setattr(
+                        repository.get_user(session, user.id), 'hashed_password', hashed_password))
+                    print(f"Хеш пароля пользователя {user.email} обновлен до {passwords.current_method()}.")
+                except Exception as e:
+                    print(f"Не удалось обновить хеш пароля пользователя {user.email}: {e}")
             login_user(user, remember=form.remember_me.data)
             print(f"Пользователь {user.email} успешно вошел.")
             return redirect("/")
@@ -106,21 +178,27 @@ def register():
 
         db_sess = db_session.create_session()
 
-        if db_sess.query(User).filter(User.email == form.email.data).first():
+        if repository.get_user_by_email(db_sess, form.email.data):
             return render_template('register.html', title='Регистрация',
                                    form=form,
                                    message="Такой пользователь уже есть")
 
-        user = User(
-            name=form.name.data,
-            email=form.email.data,
-            surname=form.surname.data if form.surname.data else None,
-            age=int(form.age.data) if form.age.data else None,
-            city_from=form.city_from.data if form.city_from.data else None
-        )
-        user.set_password(form.password.data)
-        db_sess.add(user)
-        db_sess.commit()
+        hashed_password = passwords.hash_password(form.password.data)
+
+        def insert_user(session):
+            user = User(
+                name=form.name.data,
+                email=form.email.data,
+                surname=form.surname.data if form.surname.data else None,
+                age=int(form.age.data) if form.age.data else None,
+                city_from=form.city_from.data if form.city_from.data else None,
+                hashed_password=hashed_password
+            )
+            session.add(user)
+            return user
+
+        # Запись с повтором при "database is locked" (database/write_queue.py)
+        user = write_queue.commit(insert_user)
         print(f"Новый пользователь зарегистрирован: {user.email}")
         return redirect('/login')
 
@@ -136,10 +214,15 @@ def logout():
 
 
 @app.route('/departments')
+@response_cache.cached('departments', 'department_members', 'users', per_user=True)
 def departments_list():
     """Отображение списка департаментов"""
     db_sess = db_session.create_session()
-    departments = db_sess.query(Department).options(orm.joinedload(Department.chief_user)).all()
+    # Имена участников всех департаментов страницы - одним запросом (selectin)
+    departments = db_sess.query(Department).options(
+        orm.joinedload(Department.chief_user),
+        orm.selectinload(Department.member_users)
+    ).all()
     return render_template("departments_list.html",
                            departments=departments,
                            title="List of Departments")
@@ -181,6 +264,14 @@ def show_user_hometown(user_id):
     return render_template('user_hometown.html', user=user_info, title=page_title)
 
 
+def find_missing_users(db_sess, user_ids):
+    """ID из user_ids, которых нет в базе (один запрос IN)."""
+    if not user_ids:
+        return set()
+    found = {user_id for (user_id,) in db_sess.query(User.id).filter(User.id.in_(user_ids))}
+    return set(user_ids) - found
+
+
 @app.route('/add_department', methods=['GET', 'POST'])
 @login_required
 def add_department():
@@ -189,21 +280,30 @@ def add_department():
     if form.validate_on_submit():
         db_sess = db_session.create_session()
 
-        if not db_sess.query(User).get(form.chief.data):
+        if not repository.get_user(db_sess, form.chief.data):
             return render_template('add_department.html', title='Adding Department',
                                    form=form, message="Руководитель с таким ID не найден")
-        if db_sess.query(Department).filter(Department.email == form.email.data).first():
+        if repository.get_department_by_email(db_sess, form.email.data):
             return render_template('add_department.html', title='Adding Department',
                                    form=form, message="Департамент с таким email уже существует")
-
-        department = Department(
-            title=form.title.data,
-            chief=form.chief.data,
-            members=form.members.data,
-            email=form.email.data
-        )
-        db_sess.add(department)
-        db_sess.commit()
+        member_ids = parse_member_ids(form.members.data)
+        missing = find_missing_users(db_sess, member_ids)
+        if missing:
+            return render_template('add_department.html', title='Adding Department', form=form,
+                                   message=f"Участники с ID {', '.join(map(str, sorted(missing)))} не найдены")
+
+        def insert_department(session):
+            department = Department(
+                title=form.title.data,
+                chief=form.chief.data,
+                email=form.email.data
+            )
+            session.add(department)
+            session.flush()
+            set_members(session, department.id, member_ids)
+            return department
+
+        department = write_queue.commit(insert_department)
         print(f"Добавлен новый департамент: '{department.title}'")
         return redirect('/departments')
     return render_template('add_department.html', title='Adding Department', form=form)
@@ -216,7 +316,7 @@ def edit_department(dept_id):
     form = DepartmentForm()
     db_sess = db_session.create_session()
 
-    department = db_sess.query(Department).filter(Department.id == dept_id).first()
+    department = repository.get_department(db_sess, dept_id)
 
     if not department:
         abort(404)
@@ -228,10 +328,10 @@ def edit_department(dept_id):
     if request.method == "GET":
         form.title.data = department.title
         form.chief.data = department.chief
-        form.members.data = department.members
+        form.members.data = ", ".join(str(user_id) for user_id in sorted(get_member_ids(db_sess, dept_id)))
         form.email.data = department.email
     elif form.validate_on_submit():
-        if department.chief != form.chief.data and not db_sess.query(User).get(form.chief.data):
+        if department.chief != form.chief.data and not repository.get_user(db_sess, form.chief.data):
             return render_template('add_department.html', title='Editing Department',
                                    form=form, message="Руководитель с таким ID не найден")
         existing_dept_with_email = db_sess.query(Department).filter(Department.email == form.email.data,
@@ -239,13 +339,23 @@ def edit_department(dept_id):
         if existing_dept_with_email:
             return render_template('add_department.html', title='Editing Department',
                                    form=form, message="Департамент с таким email уже существует")
-
-        department.title = form.title.data
-        department.chief = form.chief.data
-        department.members = form.members.data
-        department.email = form.email.data
-        db_sess.commit()
-        print(f"Департамент {dept_id} успешно отредактирован пользователем {current_user.id}")
+        member_ids = parse_member_ids(form.members.data)
+        missing = find_missing_users(db_sess, member_ids)
+        if missing:
+            return render_template('add_department.html', title='Editing Department', form=form,
+                                   message=f"Участники с ID {', '.join(map(str, sorted(missing)))} не найдены")
+
+        def update_department(session):
+            # При повторе после отката департамент читается заново
+            department = repository.get_department(session, dept_id)
+            department.title = form.title.data
+            department.chief = form.chief.data
+            department.email = form.email.data
+            return set_members(session, dept_id, member_ids)
+
+        added, removed = write_queue.commit(update_department)
+        print(f"Департамент {dept_id} успешно отредактирован пользователем {current_user.id}: "
+              f"участников добавлено {len(added)}, удалено {len(removed)}")
         return redirect('/departments')
 
     return render_template('add_department.html', title='Editing Department', form=form)
@@ -253,15 +363,15 @@ def edit_department(dept_id):
 
 @app.route('/delete_department/<int:dept_id>', methods=['GET', 'POST'])
 @login_required
+@db_session.use_primary
 def delete_department(dept_id):
     """Обработчик удаления департамента"""
     db_sess = db_session.create_session()
-    department = db_sess.query(Department).filter(Department.id == dept_id).first()
+    department = repository.get_department(db_sess, dept_id)
     if not department:
         abort(404)
     if current_user.id == department.chief or current_user.id == 1:
-        db_sess.delete(department)
-        db_sess.commit()
+        write_queue.commit(lambda session: session.delete(repository.get_department(session, dept_id)))
         print(f"Департамент {dept_id} успешно удален пользователем {current_user.id}")
     else:
         print(f"Попытка удаления департамента {dept_id} пользователем {current_user.id} без прав.")
@@ -270,35 +380,37 @@ def delete_department(dept_id):
     return redirect('/departments')
 
 
+def form_categories(db_sess, category_ids_data, context=""):
+    """Категории из строки формы "1, 2, 3"; неверные и неизвестные ID пропускаются с предупреждением."""
+    category_ids = []
+    for cat_id_str in category_ids_data.split(','):
+        try:
+            category_ids.append(int(cat_id_str.strip()))
+        except ValueError:
+            if cat_id_str.strip():
+                print(f"Предупреждение: Неверный ID категории '{cat_id_str.strip()}'{context}.")
+    for cat_id in categories.missing(db_sess, category_ids):
+        print(f"Предупреждение: Категория с ID {cat_id} не найдена{context}.")
+    return categories.load(db_sess, category_ids)
+
+
 @app.route('/addjob', methods=['GET', 'POST'])
 @login_required
 def add_job():
     form = JobForm()
     if form.validate_on_submit():
-        db_sess = db_session.create_session()
-        job = Jobs()
-        job.job = form.job.data
-        job.work_size = form.work_size.data
-        job.collaborators = form.collaborators.data
-        job.is_finished = form.is_finished.data
-        job.team_leader = current_user.id
-
-        job.categories.clear()
-        category_ids_str = form.category_ids.data.split(',')
-        for cat_id_str in category_ids_str:
-            try:
-                cat_id = int(cat_id_str.strip())
-                category = db_sess.query(Category).get(cat_id)
-                if category:
-                    job.categories.append(category)
-                else:
-                    print(f"Предупреждение: Категория с ID {cat_id} не найдена.")
-            except ValueError:
-                if cat_id_str.strip():
-                    print(f"Предупреждение: Неверный ID категории '{cat_id_str.strip()}'.")
-
-        db_sess.add(job)
-        db_sess.commit()
+        def insert_job(session):
+            job = Jobs()
+            job.job = form.job.data
+            job.work_size = form.work_size.data
+            job.collaborators = form.collaborators.data
+            job.is_finished = form.is_finished.data
+            job.team_leader = current_user.id
+            job.categories = form_categories(session, form.category_ids.data)
+            session.add(job)
+            return job
+
+        job = write_queue.commit(insert_job)
         print(
             f"Добавлена новая работа: '{job.job}' от пользователя ID "
             f"{current_user.id} с категориями ID: {form.category_ids.data}")
@@ -330,28 +442,17 @@ def edit_job(job_id):
         form.category_ids.data = ", ".join(str(cat.id) for cat in job.categories)
 
     elif form.validate_on_submit():
-        job.job = form.job.data
-        job.work_size = form.work_size.data
-        job.collaborators = form.collaborators.data
-        job.is_finished = form.is_finished.data
-
-        job.categories.clear()
-        category_ids_str = form.category_ids.data.split(',')
-        for cat_id_str in category_ids_str:
-            try:
-                cat_id = int(cat_id_str.strip())
-                category = db_sess.query(Category).get(cat_id)
-                if category:
-                    if category not in job.categories:
-                        job.categories.append(category)
-                else:
-                    print(f"Предупреждение: Категория с ID {cat_id} не найдена при редактировании.")
-            except ValueError:
-                if cat_id_str.strip():
-                    print(f"Предупреждение: Неверный ID категории "
-                          f"'{cat_id_str.strip()}' при редактировании.")
-
-        db_sess.commit()
+        def update_job(session):
+            # При повторе после отката работа читается заново
+            job = repository.get_job(session, job_id)
+            job.job = form.job.data
+            job.work_size = form.work_size.data
+            job.collaborators = form.collaborators.data
+            job.is_finished = form.is_finished.data
+            # Присваивание списка: ORM вставит и удалит только изменившиеся строки association
+            job.categories = form_categories(session, form.category_ids.data, " при редактировании")
+
+        write_queue.commit(update_job)
         print(
             f"Работа {job_id} успешно отредактирована пользователем "
             f"{current_user.id} с категориями ID: {form.category_ids.data}")
@@ -363,14 +464,14 @@ def edit_job(job_id):
 @app.route('/deletejob/<int:job_id>',
            methods=['GET', 'POST'])
 @login_required
+@db_session.use_primary
 def delete_job(job_id):
     db_sess = db_session.create_session()
-    job = db_sess.query(Jobs).filter(Jobs.id == job_id).first()
+    job = repository.get_job(db_sess, job_id)
 
     if job:
         if current_user.id == job.team_leader or current_user.id == 1:
-            db_sess.delete(job)
-            db_sess.commit()
+            write_queue.commit(lambda session: session.delete(repository.get_job(session, job_id)))
             print(f"Работа {job_id} успешно удалена пользователем {current_user.id}")
         else:
             print(f"Попытка удаления работы {job_id} пользователем {current_user.id} без прав.")
@@ -666,6 +767,8 @@ if __name__ == '__main__':
             pass
         print(f"Создан файл {css_file}")
 
-    db_session.global_init("database/mars_explorer.db")
+    db_session.global_init("database/mars_explorer.db", app.config['DB_ENGINE_PROFILE'])
+    if app.config['DB_REPLICAS']:
+        db_session.init_replicas(app.config['DB_REPLICAS'], app.config['DB_REPLICATION_INTERVAL'])
 
     app.run(port=8080, host='127.0.0.1', debug=True)
@@ -0,0 +1,216 @@
+"""ASGI-точка входа.
+
+/api/v2/jobs и /api/v2/users обслуживаются асинхронными обработчиками из
+api/async_resources.py через aiosqlite, остальные адреса передаются
+Flask-приложению app_v3 в пуле потоков. GET-обработчики получают условия
+запроса (If-None-Match, If-Modified-Since) и отвечают 304 так же, как Flask.
+
+Запуск:
+    uvicorn asgi:app --host 127.0.0.1 --port 8080
+"""
+import asyncio
+import io
+import json
+import re
+import sys
+from urllib.parse import parse_qsl
+
+from werkzeug.datastructures import Headers
+from werkzeug.exceptions import HTTPException
+
+from api import async_resources
+from api import conditional
+from api import serializers
+from database import db_session
+from database import db_session_async
+
+DB_FILE = 'database/mars_explorer.db'
+
+ROUTES = [
+    (re.compile(r'/api/v2/jobs/?'), {
+        'GET': async_resources.list_jobs,
+        'POST': async_resources.create_job,
+    }),
+    (re.compile(r'/api/v2/jobs/(\d+)'), {
+        'GET': async_resources.get_job,
+        'PUT': async_resources.update_job,
+        'DELETE': async_resources.delete_job,
+    }),
+    (re.compile(r'/api/v2/users/?'), {
+        'GET': async_resources.list_users,
+        'POST': async_resources.create_user,
+    }),
+    (re.compile(r'/api/v2/users/(\d+)'), {
+        'GET': async_resources.get_user,
+        'PUT': async_resources.update_user,
+        'DELETE': async_resources.delete_user,
+    }),
+]
+
+
+def init(db_file=DB_FILE, profile=None):
+    """Подключает обе базы: синхронную (миграции и Flask) и асинхронную."""
+    import app_v3  # noqa: F401  модели и Flask-приложение должны быть загружены до миграций
+
+    if profile is None:
+        profile = app_v3.app.config['DB_ENGINE_PROFILE']
+    db_session.global_init(db_file, profile)
+    db_session_async.global_init(db_file, profile)
+
+
+def resolve(method, path):
+    """(обработчик, аргументы пути, разрешенные методы) или None, если адрес не асинхронный."""
+    for pattern, handlers in ROUTES:
+        match = pattern.fullmatch(path)
+        if match:
+            return handlers.get(method), [int(group) for group in match.groups()], handlers
+    return None
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def send_not_modified(send, headers):
+    await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def send_json(send, status, payload, headers=()):
+    body = serializers.dumps(payload).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+                    *headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def handle_async(route, scope, receive, send):
+    handler, path_args, handlers = route
+    if handler is None:
+        allow = ', '.join(sorted(handlers)).encode()
+        await send_json(send, 405, {'message': 'The method is not allowed for the requested URL.'},
+                        [(b'allow', allow)])
+        return
+    body = await read_body(receive)
+    try:
+        data = json.loads(body) if body else {}
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    data = {**dict(parse_qsl(scope['query_string'].decode('latin-1'))), **data}
+    kwargs = {}
+    if scope['method'] == 'GET':
+        request_headers = Headers([(name.decode('latin-1'), value.decode('latin-1'))
+                                   for name, value in scope['headers']])
+        kwargs['preconditions'] = conditional.preconditions(request_headers)
+    headers = []
+    try:
+        status, payload, *extra = await handler(data, *path_args, **kwargs)
+        if extra:
+            headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in extra[0]]
+    except async_resources.HttpError as e:
+        status, payload = e.status, {'message': e.message}
+    except HTTPException as e:
+        # например, passwords.PoolBusy: 503 с Retry-After, как у Flask
+        status, payload = e.code, {'message': e.description}
+        headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in e.get_headers()
+                   if name.lower() == 'retry-after']
+    if status == 304:
+        await send_not_modified(send, headers)
+    else:
+        await send_json(send, status, payload, headers)
+
+
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('127.0.0.1', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('127.0.0.1', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            environ[name] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def call_wsgi(wsgi_app, environ):
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                               for name, value in headers]
+
+    result = wsgi_app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return response['status'], response['headers'], body
+
+
+async def handle_wsgi(scope, receive, send):
+    # Ответ Flask собирается целиком: потоковые ответы здесь буферизуются
+    from app_v3 import app as flask_app
+
+    environ = wsgi_environ(scope, await read_body(receive))
+    status, headers, body = await asyncio.to_thread(call_wsgi, flask_app.wsgi_app, environ)
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                init()
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await db_session_async.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+    route = resolve(scope['method'], scope['path'])
+    if route is not None:
+        await handle_async(route, scope, receive, send)
+    else:
+        await handle_wsgi(scope, receive, send)
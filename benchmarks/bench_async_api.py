@@ -0,0 +1,117 @@
+"""Пропускная способность синхронного (Flask, потоки) и асинхронного (ASGI, asyncio) API.
+
+Синхронный вариант: Flask test client из пула потоков размером concurrency.
+Асинхронный вариант: asyncio.gather вызовов asgi.app в этом же процессе,
+не более concurrency одновременно. Сеть не участвует в обоих случаях.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_async_api [запросов] [concurrency ...]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import asgi
+from database import db_session, db_session_async
+from models.jobs import Jobs
+from models.users import User
+
+ROWS = 200
+
+
+def seed():
+    session = db_session.new_session()
+    session.add_all(User(name=f'Name{i}', email=f'user{i}@mars.org') for i in range(ROWS))
+    session.flush()
+    session.add_all(Jobs(job=f'job{i}', team_leader=i + 1, work_size=i % 40) for i in range(ROWS))
+    session.commit()
+    session.close()
+
+
+def workload(requests):
+    # Чтение работы и пользователя, каждая пятая операция - запись
+    for i in range(requests):
+        row = i % ROWS + 1
+        if i % 5 == 4:
+            yield 'PUT', f'/api/v2/jobs/{row}', {'work_size': i % 40}
+        elif i % 2:
+            yield 'GET', f'/api/v2/users/{row}', None
+        else:
+            yield 'GET', f'/api/v2/jobs/{row}', None
+
+
+def run_sync(flask_app, requests, concurrency):
+    def call(request):
+        method, path, payload = request
+        response = flask_app.test_client().open(path, method=method, json=payload)
+        assert response.status_code == 200, response.data
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(call, workload(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+async def asgi_call(method, path, payload):
+    body = json.dumps(payload).encode() if payload is not None else b''
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'headers': []}
+    status = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await asgi.app(scope, receive, send)
+    assert status == [200], status
+
+
+async def run_async(requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(request):
+        async with semaphore:
+            await asgi_call(*request)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(call(request) for request in workload(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+async def run_async_all(requests, levels, db_file):
+    db_session_async.global_init(db_file, {'pool_size': max(levels), 'max_overflow': 0})
+    try:
+        await run_async(requests // 10, 1)  # прогрев
+        return [await run_async(requests, concurrency) for concurrency in levels]
+    finally:
+        await db_session_async.dispose()
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    levels = [int(value) for value in sys.argv[2:]] or [1, 16, 64]
+    warnings.simplefilter('ignore')
+    with tempfile.TemporaryDirectory() as directory:
+        db_file = os.path.join(directory, 'bench.db')
+        import app_v3
+
+        db_session.global_init(db_file, {'pool_size': max(levels), 'max_overflow': 0})
+        seed()
+        run_sync(app_v3.app, requests // 10, 1)  # прогрев
+        sync_results = [run_sync(app_v3.app, requests, concurrency) for concurrency in levels]
+        async_results = asyncio.run(run_async_all(requests, levels, db_file))
+
+    print(f'{"concurrency":>12} {"sync, запр/с":>14} {"async, запр/с":>14}')
+    for concurrency, sync_rps, async_rps in zip(levels, sync_results, async_results):
+        print(f'{concurrency:>12} {sync_rps:>14.0f} {async_rps:>14.0f}')
+
+
+if __name__ == '__main__':
+    main()
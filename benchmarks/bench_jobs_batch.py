@@ -0,0 +1,78 @@
+"""Создание N работ: N запросов POST /api/v2/jobs против одного POST /api/v2/jobs/batch.
+
+База во временном файле, запросы идут через test_client приложения в этом
+же процессе. Для каждого способа печатается время, число SQL-выражений и
+работ в секунду; затем так же - изменение (PATCH) и удаление пачкой
+работ, созданных пачкой.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_jobs_batch [работ]
+"""
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+from sqlalchemy import event, insert
+
+from database import db_session
+from models.category import Category
+from models.users import User
+
+
+def item(i):
+    return {'job': f'импорт {i}', 'team_leader_id': i % 100 + 1, 'work_size': i % 40, 'collaborators': '1, 2',
+            'category_ids': [1, 2 + i % 2]}
+
+
+def measure(run):
+    statements = []
+
+    def count(*args):
+        statements.append(1)
+
+    engine = db_session.get_engine()
+    event.listen(engine, 'before_cursor_execute', count)
+    started = time.perf_counter()
+    try:
+        result = run()
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    return time.perf_counter() - started, len(statements), result
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    warnings.simplefilter('ignore')
+    with tempfile.TemporaryDirectory() as directory:
+        db_session.global_init(os.path.join(directory, 'bench.db'))
+        with db_session.get_engine().begin() as connection:
+            connection.execute(insert(User), [{'name': f'Name{i}', 'email': f'user{i}@mars.org'} for i in range(100)])
+            connection.execute(insert(Category), [{'name': 'first'}, {'name': 'second'}, {'name': 'third'}])
+        import app_v3
+        client = app_v3.app.test_client()
+
+        def one_by_one():
+            return [client.post('/api/v2/jobs', json=item(i)).get_json()['id'] for i in range(jobs)]
+
+        def batch():
+            results = client.post('/api/v2/jobs/batch', json={'jobs': [item(i) for i in range(jobs)]}).get_json()
+            return [result['id'] for result in results['results']]
+
+        print(f"работ={jobs}")
+        print(f'{"способ":>22} {"время, мс":>10} {"SQL":>7} {"работ/с":>9}')
+        for name, run in [('POST по одной', one_by_one), ('POST /batch', batch)]:
+            elapsed, statements, created = measure(run)
+            print(f'{name:>22} {elapsed * 1000:>10.1f} {statements:>7} {jobs / elapsed:>9.0f}')
+
+        changes = [{'id': job_id, 'work_size': 1, 'is_finished': True} for job_id in created]
+        for name, method, body in [('PATCH /batch', client.patch, {'jobs': changes}),
+                                   ('DELETE /batch', client.delete, {'ids': created})]:
+            elapsed, statements, response = measure(lambda: method('/api/v2/jobs/batch', json=body))
+            assert response.status_code == 200, response.get_json()
+            print(f'{name:>22} {elapsed * 1000:>10.1f} {statements:>7} {len(created) / elapsed:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Задержка чтения во время шторма входов: хеширование в потоке запроса против пула процессов.
+
+База во временном файле, запросы идут через test_client приложения из
+потоков этого же процесса. Один поток читает GET /api/v2/users/<id>, а
+concurrency потоков все это время входят через POST /login. Для каждого
+режима печатаются p50/p99 чтения, входы в секунду и отказы 503 (очередь
+пула заполнена). Режим "без входов" - задержка чтения в покое.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_login_storm [секунд_на_режим] [concurrency] [процессов_пула]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from database import db_session
+from database import passwords
+from models.users import User
+
+USERS = 50
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float('nan')
+
+
+def storm(flask_app, seconds, concurrency):
+    stop = threading.Event()
+    reads, logins = [], []
+
+    def read():
+        client = flask_app.test_client()
+        i = 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            assert client.get(f'/api/v2/users/{i % USERS + 1}').status_code == 200
+            reads.append(time.perf_counter() - started)
+            i += 1
+            time.sleep(0.005)
+
+    def login(worker):
+        i = worker
+        while not stop.is_set():
+            # новый клиент без cookie: вошедшего пользователя /login сразу перенаправляет
+            response = flask_app.test_client().post('/login', data={
+                'email': f'user{i % USERS}@mars.org', 'password': 'password'})
+            logins.append(response.status_code)
+            i += concurrency
+
+    with ThreadPoolExecutor(concurrency + 1) as pool:
+        futures = [pool.submit(read)] + [pool.submit(login, worker) for worker in range(concurrency)]
+        time.sleep(seconds)
+        stop.set()
+        for future in futures:
+            future.result()
+    return reads, logins
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else passwords.DEFAULT_WORKERS
+    warnings.simplefilter('ignore')
+    with tempfile.TemporaryDirectory() as directory:
+        import app_v3
+
+        db_session.global_init(os.path.join(directory, 'bench.db'), {'pool_size': concurrency + 1})
+        app_v3.app.config.update(WTF_CSRF_ENABLED=False, RESPONSE_CACHE_SIZE=0)
+        hashed = passwords.hash_password('password')
+        session = db_session.new_session()
+        session.add_all(User(name=f'Name{i}', email=f'user{i}@mars.org', hashed_password=hashed)
+                        for i in range(USERS))
+        session.commit()
+        session.close()
+
+        print(f"метод={passwords.current_method()}, concurrency={concurrency}, {seconds:.0f} с на режим, "
+              f"процессоров={os.cpu_count()}")
+        print(f'{"режим":>24} {"чтение p50, мс":>15} {"p99, мс":>8} {"входов/с":>9} {"503":>6}')
+        for name, pool_workers, login_threads in [('без входов', workers, 0),
+                                                  ('хеш в потоке запроса', 0, concurrency),
+                                                  (f'пул из {workers} процессов', workers, concurrency)]:
+            passwords.configure(app_v3.app.config['PASSWORD_HASH_METHOD'],
+                                app_v3.app.config['PASSWORD_HASH_ITERATIONS'], pool_workers,
+                                app_v3.app.config['PASSWORD_POOL_MAX_PENDING'])
+            reads, logins = storm(app_v3.app, seconds, login_threads)
+            succeeded = sum(1 for status in logins if status == 302)
+            rejected = sum(1 for status in logins if status == 503)
+            print(f'{name:>24} {percentile(reads, 0.5) * 1000:>15.1f} {percentile(reads, 0.99) * 1000:>8.1f} '
+                  f'{succeeded / seconds:>9.1f} {rejected:>6}')
+        passwords.configure()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Микробенчмарк выборок по ключу: Query.get / filter().first() против database.repository.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_pk_lookup [количество_вызовов]
+"""
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+from database import db_session
+from database import repository
+from models.users import User
+from models.jobs import Jobs
+from models.category import Category
+
+ROWS = 1000
+
+
+def seed(session):
+    session.add_all(User(name=f'Name{i}', surname=f'Surname{i}', email=f'user{i}@mars.org') for i in range(ROWS))
+    session.add_all(Category(name=f'category{i}') for i in range(ROWS))
+    session.flush()
+    session.add_all(Jobs(job=f'job{i}', team_leader=i + 1, work_size=i % 40) for i in range(ROWS))
+    session.commit()
+
+
+def measure(session, calls, lookup):
+    # Identity map очищается перед каждым вызовом, чтобы каждый раз шел SELECT
+    started = time.perf_counter()
+    for i in range(calls):
+        session.expunge_all()
+        lookup(session, i % ROWS + 1)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    warnings.simplefilter('ignore')
+    with tempfile.TemporaryDirectory() as directory:
+        db_session.global_init(os.path.join(directory, 'bench.db'))
+        session = db_session.new_session()
+        seed(session)
+
+        cases = [
+            ('User: query(User).get(id)', lambda s, i: s.query(User).get(i)),
+            ('User: query(User).filter(id).first()', lambda s, i: s.query(User).filter(User.id == i).first()),
+            ('User: repository.get_user', repository.get_user),
+            ('Jobs: query(Jobs).get(id)', lambda s, i: s.query(Jobs).get(i)),
+            ('Jobs: repository.get_job', repository.get_job),
+            ('Category: query(Category).get(id)', lambda s, i: s.query(Category).get(i)),
+            ('Category: repository.get_category', repository.get_category),
+            ('User by email: query.filter().first()',
+             lambda s, i: s.query(User).filter(User.email == f'user{i - 1}@mars.org').first()),
+            ('User by email: repository.get_user_by_email',
+             lambda s, i: repository.get_user_by_email(s, f'user{i - 1}@mars.org')),
+        ]
+        for name, lookup in cases:
+            measure(session, calls // 10, lookup)  # прогрев кешей
+            print(f'{name:48} {measure(session, calls, lookup):8.1f} мкс/вызов')
+
+        session.expunge_all()
+        hot = measure_hot(session, calls)
+        print(f'{"User: repository.get_user, объект в identity map":48} {hot:8.1f} мкс/вызов')
+        session.close()
+
+
+def measure_hot(session, calls):
+    # identity map хранит слабые ссылки: держим объект, иначе его соберет GC
+    user = repository.get_user(session, 1)
+    started = time.perf_counter()
+    for _ in range(calls):
+        repository.get_user(session, 1)
+    elapsed = time.perf_counter() - started
+    assert repository.get_user(session, 1) is user, "объект должен отдаваться из identity map"
+    return elapsed / calls * 1e6
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Поиск по работам и колонистам: LIKE '%...%' (как в queries/query2.py) против FTS5.
+
+База во временном файле; данные вставляются через Core, FTS-индексы
+заполняются триггерами. Для каждого запроса печатается время одной выборки
+и число найденных строк. LIKE в SQLite не сворачивает регистр кириллицы,
+поэтому для него слова берутся в том виде, в каком они хранятся.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_search [пользователей] [работ]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+
+from sqlalchemy import insert, or_, select, func
+
+from database import db_session, search
+from models.jobs import Jobs
+from models.users import User
+
+SPECIALITIES = ['инженер-исследователь', 'пилот', 'строитель', 'экзобиолог', 'врач', 'климатолог',
+                'астрогеолог', 'гляциолог', 'метеоролог', 'оператор марсохода', 'киберинженер', 'штурман']
+WORDS = ['ремонт', 'калибровка', 'шлюз', 'реактор', 'теплица', 'марсоход', 'антенна', 'бур', 'проба', 'грунт',
+         'модуль', 'купол', 'фильтр', 'насос', 'панель', 'солнечная', 'связь', 'разведка', 'склад', 'кабель']
+
+
+def seed(connection, users, jobs):
+    rnd = random.Random(1)
+    connection.execute(insert(User), [
+        {'name': f'Name{i}', 'surname': f'Surname{i}', 'email': f'user{i}@mars.org',
+         'speciality': rnd.choice(SPECIALITIES), 'position': rnd.choice(SPECIALITIES)} for i in range(users)])
+    connection.execute(insert(Jobs), [
+        {'job': ' '.join(rnd.sample(WORDS, 4)), 'team_leader': rnd.randint(1, users), 'work_size': i % 40}
+        for i in range(jobs)])
+
+
+def measure(session, run, repeat):
+    found = run(session)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        run(session)
+    return (time.perf_counter() - started) / repeat * 1000, found
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    warnings.simplefilter('ignore')
+    with tempfile.TemporaryDirectory() as directory:
+        db_session.global_init(os.path.join(directory, 'bench.db'))
+        with db_session.get_engine().begin() as connection:
+            seed(connection, users, jobs)
+        session = db_session.new_session()
+
+        def like_users(word):
+            return lambda s: s.scalar(select(func.count()).where(
+                or_(User.speciality.like(f'%{word}%'), User.position.like(f'%{word}%'))))
+
+        def like_jobs(*words):
+            return lambda s: s.scalar(select(func.count()).where(*(Jobs.job.like(f'%{w}%') for w in words)))
+
+        def fts_users(q, limit=20):
+            return lambda s: search.search_users(s, search.match_query(q), limit)[0]
+
+        def fts_jobs(q, limit=20):
+            return lambda s: search.search_jobs(s, search.match_query(q), limit)[0]
+
+        cases = [
+            ('колонисты: инженер', like_users('инженер'), fts_users('инженер')),
+            ('колонисты: штурман', like_users('штурман'), fts_users('штурман')),
+            ('работы: реактор', like_jobs('реактор'), fts_jobs('реактор')),
+            ('работы: ремонт шлюз', like_jobs('ремонт', 'шлюз'), fts_jobs('ремонт шлюз')),
+        ]
+        print(f"пользователей={users}, работ={jobs}; FTS5 - ранжированная страница из 20 строк плюс count(*)")
+        print(f'{"запрос":>24} {"LIKE, мс":>9} {"найдено":>8} {"FTS5, мс":>9} {"найдено":>8}')
+        for name, like, fts in cases:
+            like_ms, like_found = measure(session, like, 20)
+            fts_ms, fts_found = measure(session, fts, 20)
+            print(f'{name:>24} {like_ms:>9.2f} {like_found:>8} {fts_ms:>9.2f} {fts_found:>8}')
+        session.close()
+
+
+if __name__ == '__main__':
+    main()
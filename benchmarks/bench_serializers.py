@@ -0,0 +1,115 @@
+"""Сериализация списка работ: ORM-объекты против выборки колонок (api/serializers.py).
+
+Старый путь: select(Jobs) с joinedload категорий, словарь из атрибутов
+объекта с isoformat() дат и json.dumps с sort_keys, как у jsonify.
+Новый путь: select помеченных колонок с категориями в JSON-подзапросе,
+dict(zip()) из строки и serializers.dumps (orjson, если установлен).
+Печатается лучшее из нескольких прогонов время и строк в секунду, отдельно
+для чтения и для кодирования.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_serializers [работ]
+"""
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import joinedload
+
+from api import serializers
+from database import db_session
+from models.category import Category, association_table
+from models.jobs import Jobs
+from models.users import User
+
+REPEAT = 5
+
+
+def seed(connection, jobs):
+    start = datetime.datetime(2025, 1, 1)
+    connection.execute(insert(User), [{'name': f'Name{i}', 'email': f'user{i}@mars.org'} for i in range(100)])
+    connection.execute(insert(Category), [{'name': 'first'}, {'name': 'second'}, {'name': 'third'}])
+    connection.execute(insert(Jobs), [
+        {'job': f'работа {i}', 'team_leader': i % 100 + 1, 'work_size': i % 40, 'collaborators': '1, 2',
+         'start_date': start + datetime.timedelta(minutes=i), 'end_date': start + datetime.timedelta(days=1, minutes=i)}
+        for i in range(jobs)])
+    connection.execute(insert(association_table), [{'jobs': i, 'category': category}
+                                                   for i in range(1, jobs + 1) for category in (1, 2 + i % 2)])
+
+
+def orm_job_to_dict(job):
+    return {
+        'id': job.id,
+        'team_leader_id': job.team_leader,
+        'job': job.job,
+        'work_size': job.work_size,
+        'collaborators': job.collaborators,
+        'start_date': job.start_date.isoformat() if job.start_date else None,
+        'end_date': job.end_date.isoformat() if job.end_date else None,
+        'is_finished': job.is_finished,
+        'categories': [{'id': category.id, 'name': category.name} for category in job.categories],
+    }
+
+
+def orm_read(session):
+    jobs = session.scalars(select(Jobs).options(joinedload(Jobs.categories)).order_by(Jobs.id)).unique().all()
+    return [orm_job_to_dict(job) for job in jobs]
+
+
+def orm_encode(items):
+    return json.dumps({'jobs': items}, sort_keys=True, separators=(',', ':'))
+
+
+NAMES = serializers.default_fields(serializers.JOB_FIELDS)
+PROJECTION = select(*serializers.columns(Jobs, NAMES, serializers.JOB_FIELDS)).order_by(Jobs.id)
+
+
+def projection_read(session):
+    to_dict = serializers.from_row(NAMES)
+    return [to_dict(row) for row in session.execute(PROJECTION)]
+
+
+def projection_encode(items):
+    return serializers.dumps({'jobs': items})
+
+
+def best(run, *args):
+    times = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        result = run(*args)
+        times.append(time.perf_counter() - started)
+    return min(times), result
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    warnings.simplefilter('ignore')
+    with tempfile.TemporaryDirectory() as directory:
+        db_session.global_init(os.path.join(directory, 'bench.db'))
+        with db_session.get_engine().begin() as connection:
+            seed(connection, jobs)
+
+        backend = 'orjson' if serializers.orjson is not None else 'json'
+        print(f"работ={jobs}, кодировщик serializers.dumps: {backend}, лучшее из {REPEAT}")
+        print(f'{"путь":>12} {"чтение, мс":>11} {"JSON, мс":>9} {"всего, мс":>10} {"строк/с":>9}')
+        bodies = []
+        for name, read, encode in [('ORM', orm_read, orm_encode), ('колонки', projection_read, projection_encode)]:
+            session = db_session.new_session()
+            read_time, items = best(lambda: (session.expunge_all(), read(session))[1])
+            encode_time, body = best(encode, items)
+            session.close()
+            bodies.append(json.loads(body))
+            total = read_time + encode_time
+            print(f'{name:>12} {read_time * 1000:>11.1f} {encode_time * 1000:>9.1f} {total * 1000:>10.1f} '
+                  f'{len(items) / total:>9.0f}')
+        assert bodies[0] == bodies[1], "оба пути должны давать один и тот же JSON"
+
+
+if __name__ == '__main__':
+    main()
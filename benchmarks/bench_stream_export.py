@@ -0,0 +1,74 @@
+"""Выгрузка всего списка работ: all=1 (jsonify) против stream=1 (api/streaming.py).
+
+База во временном файле, запросы идут через test_client приложения в этом
+же процессе. Для каждого режима печатается время до первого куска тела и
+полное время, а отдельным прогоном под tracemalloc - пик памяти Python.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_stream_export [работ]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+from sqlalchemy import insert
+
+from database import db_session
+from models.category import Category, association_table
+from models.jobs import Jobs
+from models.users import User
+
+
+def seed(connection, jobs):
+    connection.execute(insert(User), [{'name': f'Name{i}', 'email': f'user{i}@mars.org'} for i in range(100)])
+    connection.execute(insert(Category), [{'name': 'first'}, {'name': 'second'}])
+    connection.execute(insert(Jobs), [{'job': f'работа {i}', 'team_leader': i % 100 + 1, 'work_size': i % 40}
+                                      for i in range(jobs)])
+    connection.execute(insert(association_table), [{'jobs': i, 'category': i % 2 + 1} for i in range(1, jobs + 1)])
+
+
+def timings(client, url):
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    first = None
+    size = 0
+    for chunk in response.response:
+        if first is None:
+            first = time.perf_counter() - started
+        size += len(chunk)
+    total = time.perf_counter() - started
+    response.close()
+    return first * 1000, total * 1000, size / 2 ** 20
+
+
+def peak_memory(client, url):
+    tracemalloc.start()
+    timings(client, url)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    warnings.simplefilter('ignore')
+    with tempfile.TemporaryDirectory() as directory:
+        db_session.global_init(os.path.join(directory, 'bench.db'))
+        with db_session.get_engine().begin() as connection:
+            seed(connection, jobs)
+        import app_v3
+        client = app_v3.app.test_client()
+
+        print(f"работ={jobs}")
+        print(f'{"запрос":>28} {"1-й кусок, мс":>14} {"всего, мс":>10} {"пик, МБ":>8} {"тело, МБ":>9}')
+        for url in ['/api/v2/jobs?all=1', '/api/v2/jobs?stream=1', '/api/jobs?all=1', '/api/jobs?stream=1']:
+            first, total, size = timings(client, url)
+            peak = peak_memory(client, url)
+            print(f'{url:>28} {first:>14.1f} {total:>10.1f} {peak:>8.1f} {size:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
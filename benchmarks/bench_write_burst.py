@@ -0,0 +1,72 @@
+"""Всплеск POST /api/v2/jobs: транзакция на запрос против групповой фиксации.
+
+Flask test client из пула потоков размером concurrency, база во временном
+файле. Для каждого режима печатаются запросы в секунду, p50/p99 задержки,
+число ошибок и средний размер пачки писателя.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_write_burst [запросов] [concurrency] [synchronous]
+"""
+import os
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from database import db_session, metrics, write_queue
+from models.users import User
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def burst(flask_app, requests, concurrency):
+    def call(i):
+        started = time.perf_counter()
+        response = flask_app.test_client().post('/api/v2/jobs', json={
+            'job': f'burst {i}', 'team_leader_id': 1, 'work_size': i % 40, 'collaborators': '1'})
+        return response.status_code, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(call, range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies = [latency for status, latency in results if status == 201]
+    errors = sum(1 for status, _ in results if status != 201)
+    return requests / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99), errors
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    synchronous = sys.argv[3] if len(sys.argv) > 3 else 'NORMAL'
+    warnings.simplefilter('ignore')
+    with tempfile.TemporaryDirectory() as directory:
+        import app_v3
+
+        db_session.global_init(os.path.join(directory, 'bench.db'),
+                               {'synchronous': synchronous, 'pool_size': concurrency, 'max_overflow': 0})
+        session = db_session.new_session()
+        session.add(User(name='leader', email='leader@mars.org'))
+        session.commit()
+        session.close()
+
+        print(f"synchronous={synchronous}, concurrency={concurrency}, запросов={requests}")
+        print(f'{"режим":>22} {"запр/с":>8} {"p50, мс":>8} {"p99, мс":>8} {"ошибок":>7} {"пачка":>6}')
+        for queue_enabled in (False, True):
+            app_v3.app.config['DB_WRITE_QUEUE'] = queue_enabled
+            before = metrics.collect()['writes']
+            rps, p50, p99, errors = burst(app_v3.app, requests, concurrency)
+            after = metrics.collect()['writes']
+            batches = after['batches'] - before['batches']
+            avg_batch = (after['units'] - before['units']) / batches if batches else 0
+            name = 'групповая фиксация' if queue_enabled else 'транзакция на запрос'
+            print(f'{name:>22} {rps:>8.0f} {p50 * 1000:>8.1f} {p99 * 1000:>8.1f} {errors:>7} {avg_batch:>6.1f}')
+        write_queue.stop_writer()
+
+
+if __name__ == '__main__':
+    main()
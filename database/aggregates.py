@@ -0,0 +1,229 @@
+"""Агрегаты по работам, поддерживаемые триггерами SQLite.
+
+job_team_sizes, user_hours и department_hours (models/aggregates.py)
+обновляются триггерами на jobs, job_collaborators, departments и
+department_members, поэтому остаются верными при любой записи: через ORM,
+Core (queries/bulk_load.py, database/archive.py) или напрямую в SQL.
+
+Учитываются только работы горячей таблицы jobs; работы, перенесенные в
+архив, из агрегатов вычитаются. NULL в work_size считается нулем.
+
+Проверка расхождений и пересчет:
+    python -m database.aggregates database/mars_explorer.db [--rebuild]
+"""
+import argparse
+
+from sqlalchemy import func, select, text, union
+
+from models.aggregates import department_hours_table, job_team_sizes_table, user_hours_table
+from models.departments import Department, department_members_table
+from models.jobs import Jobs
+from models.users import User
+
+TABLES = ('job_team_sizes', 'user_hours', 'department_hours')
+
+
+def _add_hours(user_id, hours):
+    return f"""
+    INSERT INTO user_hours (user_id, hours) SELECT {user_id}, {hours} WHERE {user_id} IS NOT NULL
+    ON CONFLICT (user_id) DO UPDATE SET hours = hours + excluded.hours;"""
+
+
+def _refresh_departments(condition):
+    """Пересчет department_hours для департаментов d, удовлетворяющих condition."""
+    return f"""
+    INSERT INTO department_hours (department_id, hours)
+    SELECT d.id, (SELECT coalesce(sum(uh.hours), 0) FROM user_hours uh WHERE uh.user_id IN (
+        SELECT dm.user_id FROM department_members dm WHERE dm.department_id = d.id UNION SELECT d.chief))
+    FROM departments d WHERE {condition}
+    ON CONFLICT (department_id) DO UPDATE SET hours = excluded.hours;"""
+
+
+_WORK_SIZE = 'coalesce((SELECT work_size FROM jobs WHERE id = {job_id}), 0)'
+
+TRIGGERS = {
+    'aggregates_jobs_insert': f"""
+CREATE TRIGGER aggregates_jobs_insert AFTER INSERT ON jobs BEGIN
+    INSERT OR IGNORE INTO job_team_sizes (job_id, size) VALUES (NEW.id, 0);
+    {_add_hours('NEW.team_leader', 'coalesce(NEW.work_size, 0)')}
+END""",
+    'aggregates_jobs_update': f"""
+CREATE TRIGGER aggregates_jobs_update AFTER UPDATE OF team_leader, work_size ON jobs BEGIN
+    {_add_hours('OLD.team_leader', '-coalesce(OLD.work_size, 0)')}
+    {_add_hours('NEW.team_leader', 'coalesce(NEW.work_size, 0)')}
+    UPDATE user_hours SET hours = hours + coalesce(NEW.work_size, 0) - coalesce(OLD.work_size, 0)
+    WHERE user_id IN (SELECT user_id FROM job_collaborators WHERE job_id = NEW.id);
+END""",
+    # Участников удаляем до удаления самой работы: их триггер читает work_size из jobs
+    'aggregates_jobs_delete': f"""
+CREATE TRIGGER aggregates_jobs_delete BEFORE DELETE ON jobs BEGIN
+    DELETE FROM job_collaborators WHERE job_id = OLD.id;
+    DELETE FROM job_team_sizes WHERE job_id = OLD.id;
+    {_add_hours('OLD.team_leader', '-coalesce(OLD.work_size, 0)')}
+END""",
+    'aggregates_collaborators_insert': f"""
+CREATE TRIGGER aggregates_collaborators_insert AFTER INSERT ON job_collaborators BEGIN
+    INSERT INTO job_team_sizes (job_id, size) VALUES (NEW.job_id, 1)
+    ON CONFLICT (job_id) DO UPDATE SET size = size + 1;
+    {_add_hours('NEW.user_id', _WORK_SIZE.format(job_id='NEW.job_id'))}
+END""",
+    'aggregates_collaborators_delete': f"""
+CREATE TRIGGER aggregates_collaborators_delete AFTER DELETE ON job_collaborators BEGIN
+    UPDATE job_team_sizes SET size = size - 1 WHERE job_id = OLD.job_id;
+    {_add_hours('OLD.user_id', '-' + _WORK_SIZE.format(job_id='OLD.job_id'))}
+END""",
+    'aggregates_user_hours_insert': f"""
+CREATE TRIGGER aggregates_user_hours_insert AFTER INSERT ON user_hours BEGIN
+    {_refresh_departments('d.chief = NEW.user_id OR d.id IN '
+                          '(SELECT department_id FROM department_members WHERE user_id = NEW.user_id)')}
+END""",
+    'aggregates_user_hours_update': f"""
+CREATE TRIGGER aggregates_user_hours_update AFTER UPDATE OF hours ON user_hours BEGIN
+    {_refresh_departments('d.chief = NEW.user_id OR d.id IN '
+                          '(SELECT department_id FROM department_members WHERE user_id = NEW.user_id)')}
+END""",
+    'aggregates_members_insert': f"""
+CREATE TRIGGER aggregates_members_insert AFTER INSERT ON department_members BEGIN
+    {_refresh_departments('d.id = NEW.department_id')}
+END""",
+    'aggregates_members_delete': f"""
+CREATE TRIGGER aggregates_members_delete AFTER DELETE ON department_members BEGIN
+    {_refresh_departments('d.id = OLD.department_id')}
+END""",
+    'aggregates_departments_insert': f"""
+CREATE TRIGGER aggregates_departments_insert AFTER INSERT ON departments BEGIN
+    {_refresh_departments('d.id = NEW.id')}
+END""",
+    'aggregates_departments_update': f"""
+CREATE TRIGGER aggregates_departments_update AFTER UPDATE OF chief ON departments BEGIN
+    {_refresh_departments('d.id = NEW.id')}
+END""",
+    'aggregates_departments_delete': """
+CREATE TRIGGER aggregates_departments_delete AFTER DELETE ON departments BEGIN
+    DELETE FROM department_hours WHERE department_id = OLD.id;
+END""",
+}
+
+# Эталонные значения, вычисленные заново из исходных таблиц
+EXPECTED = {
+    'job_team_sizes': """
+        SELECT j.id AS key, (SELECT count(*) FROM job_collaborators jc WHERE jc.job_id = j.id) AS value
+        FROM jobs j""",
+    'user_hours': """
+        SELECT user_id AS key, sum(coalesce(work_size, 0)) AS value FROM (
+            SELECT team_leader AS user_id, work_size FROM jobs WHERE team_leader IS NOT NULL
+            UNION ALL
+            SELECT jc.user_id, j.work_size FROM job_collaborators jc JOIN jobs j ON j.id = jc.job_id)
+        GROUP BY user_id""",
+    'department_hours': """
+        SELECT d.id AS key, (SELECT coalesce(sum(uh.hours), 0) FROM user_hours uh WHERE uh.user_id IN (
+            SELECT dm.user_id FROM department_members dm WHERE dm.department_id = d.id UNION SELECT d.chief)) AS value
+        FROM departments d""",
+}
+
+STORED = {
+    'job_team_sizes': 'SELECT job_id AS key, size AS value FROM job_team_sizes',
+    'user_hours': 'SELECT user_id AS key, hours AS value FROM user_hours',
+    'department_hours': 'SELECT department_id AS key, hours AS value FROM department_hours',
+}
+
+COLUMNS = {
+    'job_team_sizes': ('job_id', 'size'),
+    'user_hours': ('user_id', 'hours'),
+    'department_hours': ('department_id', 'hours'),
+}
+
+
+def install_triggers(connection):
+    for name, ddl in TRIGGERS.items():
+        connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS {name}')
+        connection.exec_driver_sql(ddl)
+
+
+def rebuild(connection):
+    """Пересчитывает все агрегаты из исходных таблиц.
+
+    Порядок важен: department_hours считается по уже пересчитанным user_hours.
+    """
+    for table in TABLES:
+        key, value = COLUMNS[table]
+        connection.exec_driver_sql(f'DELETE FROM {table}')
+        connection.exec_driver_sql(f'INSERT INTO {table} ({key}, {value}) {EXPECTED[table]}')
+
+
+def drift(connection):
+    """{таблица: [(ключ, хранимое значение, ожидаемое значение), ...]} для расхождений.
+
+    Отсутствующая строка и строка с нулем считаются равными.
+    """
+    result = {}
+    for table in TABLES:
+        stored = dict(connection.execute(text(STORED[table])).all())
+        expected = dict(connection.execute(text(EXPECTED[table])).all())
+        mismatches = [(key, stored.get(key), expected.get(key))
+                      for key in sorted(set(stored) | set(expected))
+                      if (stored.get(key) or 0) != (expected.get(key) or 0)]
+        if mismatches:
+            result[table] = mismatches
+    return result
+
+
+def largest_teams(session):
+    """(размер, [работы]) для работ с наибольшей командой; max и выборка идут по ix_job_team_sizes_size."""
+    size = session.scalar(select(func.max(job_team_sizes_table.c.size)))
+    if not size:
+        return 0, []
+    jobs = session.scalars(select(Jobs).join(job_team_sizes_table, job_team_sizes_table.c.job_id == Jobs.id).where(
+        job_team_sizes_table.c.size == size).order_by(Jobs.id)).all()
+    return size, jobs
+
+
+def department_user_ids(department_id):
+    return union(
+        select(department_members_table.c.user_id).where(department_members_table.c.department_id == department_id),
+        select(Department.chief).where(Department.id == department_id, Department.chief.is_not(None)),
+    )
+
+
+def users_with_hours(session, min_hours, department_id=None):
+    """[(пользователь, часы)] с часами больше min_hours, по убыванию часов."""
+    query = select(User, user_hours_table.c.hours).join(user_hours_table, user_hours_table.c.user_id == User.id).where(
+        user_hours_table.c.hours > min_hours)
+    if department_id is not None:
+        query = query.where(User.id.in_(department_user_ids(department_id)))
+    return session.execute(query.order_by(user_hours_table.c.hours.desc(), User.id)).all()
+
+
+def departments_hours(session, department_id=None):
+    """[(департамент, часы)] по ID департамента."""
+    query = select(Department, department_hours_table.c.hours).join(
+        department_hours_table, department_hours_table.c.department_id == Department.id)
+    if department_id is not None:
+        query = query.where(Department.id == department_id)
+    return session.execute(query.order_by(Department.id)).all()
+
+
+def main():
+    from database import db_session
+
+    parser = argparse.ArgumentParser(description='Проверка и пересчет агрегатов по работам')
+    parser.add_argument('db_file')
+    parser.add_argument('--rebuild', action='store_true', help='пересчитать агрегаты при расхождениях')
+    args = parser.parse_args()
+
+    db_session.global_init(args.db_file)
+    with db_session.get_engine().begin() as connection:
+        found = drift(connection)
+        for table, mismatches in found.items():
+            print(f"{table}: расхождений {len(mismatches)}")
+            for key, stored, expected in mismatches[:10]:
+                print(f"  {key}: хранится {stored}, должно быть {expected}")
+        if not found:
+            print("Расхождений нет.")
+        elif args.rebuild:
+            rebuild(connection)
+            print("Агрегаты пересчитаны.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Горячий и холодный журнал работ.
+
+Завершенные работы старше заданного возраста переносятся из jobs в
+jobs_archive вместе со связями с категориями, чтобы обычные списки читали
+только горячую таблицу. Возраст работы считается по end_date, а если она
+не задана - по start_date.
+
+Запуск из корня проекта:
+    python -m database.archive database/mars_explorer.db --days 365
+"""
+import argparse
+import datetime
+import heapq
+from operator import attrgetter
+
+import sqlalchemy
+from flask import request
+from sqlalchemy import func, select
+
+from database import pagination
+from models.category import association_table
+from models.jobs import Jobs, job_collaborators_table
+from models.jobs_archive import ArchivedJob, jobs_archive_categories_table
+
+DEFAULT_MAX_AGE_DAYS = 365
+BATCH_SIZE = 500
+INCLUDE_ARCHIVED_ARG = 'include_archived'
+
+# Таблицы, из которых собираются списки работ (database/response_cache.py)
+JOB_LIST_TABLES = ('jobs', 'jobs_archive', 'jobs_archive_categories', 'association', 'categories')
+
+_COLUMNS = ('id', 'team_leader', 'job', 'work_size', 'collaborators', 'start_date', 'end_date', 'is_finished')
+
+
+def wants_archived(args):
+    """include_archived=1 в аргументах запроса (словарь)."""
+    return str(args.get(INCLUDE_ARCHIVED_ARG, '')).lower() in ('1', 'true', 'yes')
+
+
+def include_archived_requested():
+    return wants_archived(request.args)
+
+
+def models(include_archived=False):
+    """Модели, из которых собирается список работ."""
+    return [Jobs, ArchivedJob] if include_archived else [Jobs]
+
+
+def list_jobs(session, include_archived=False, query=select):
+    """Работы горячей таблицы, а с include_archived - и архивные, по возрастанию ID.
+
+    query(модель) строит исходную выборку: сущностей или колонок с фильтрами
+    (api/list_query.py); результат - сущности или строки (pagination.results).
+    """
+    jobs = pagination.results(session, query(Jobs).order_by(Jobs.id))
+    if not include_archived:
+        return jobs
+    archived = pagination.results(session, query(ArchivedJob).order_by(ArchivedJob.id))
+    return sorted(jobs + archived, key=lambda job: job.id)
+
+
+def iter_jobs(session, include_archived=False, query=select, yield_per=500):
+    """Как list_jobs, но строки читаются из курсора частями по yield_per и
+    отдаются по одной; горячая таблица и архив сливаются по ID на лету."""
+    options = {'yield_per': yield_per}
+    jobs = pagination.results(session, query(Jobs).order_by(Jobs.id).execution_options(**options))
+    if not include_archived:
+        return jobs
+    archived = pagination.results(session, query(ArchivedJob).order_by(ArchivedJob.id).execution_options(**options))
+    return heapq.merge(jobs, archived, key=attrgetter('id'))
+
+
+def page_jobs(session, page, include_archived=False, query=select):
+    """Страница работ (database.pagination) и курсор следующей; с include_archived
+    страница собирается из обеих таблиц в общем порядке сортировки."""
+    if not include_archived:
+        return pagination.fetch(session, Jobs, page, query(Jobs))
+    merged = (pagination.rows(session, Jobs, page, query(Jobs)) +
+              pagination.rows(session, ArchivedJob, page, query(ArchivedJob)))
+    merged.sort(key=pagination.sort_key(page), reverse=page.descending)
+    return pagination.finish(merged, page)
+
+
+def is_archived(job):
+    return isinstance(job, ArchivedJob)
+
+
+def candidates(older_than, now=None):
+    cutoff = (now or datetime.datetime.now()) - older_than
+    return select(Jobs.id).where(
+        Jobs.is_finished == True,  # noqa: E712
+        func.coalesce(Jobs.end_date, Jobs.start_date) < cutoff,
+    ).order_by(Jobs.id)
+
+
+def _move(session, job_ids, archived_at):
+    jobs = Jobs.__table__
+    session.execute(ArchivedJob.__table__.insert().from_select(
+        list(_COLUMNS) + ['archived_at'],
+        select(*[jobs.c[name] for name in _COLUMNS],
+               sqlalchemy.literal(archived_at, sqlalchemy.DateTime)).where(jobs.c.id.in_(job_ids))))
+    session.execute(jobs_archive_categories_table.insert().from_select(
+        ['jobs', 'category'],
+        select(association_table.c.jobs, association_table.c.category).where(association_table.c.jobs.in_(job_ids))))
+    session.execute(association_table.delete().where(association_table.c.jobs.in_(job_ids)))
+    session.execute(job_collaborators_table.delete().where(job_collaborators_table.c.job_id.in_(job_ids)))
+    session.execute(jobs.delete().where(jobs.c.id.in_(job_ids)))
+
+
+def archive_finished_jobs(session, older_than, now=None, batch_size=BATCH_SIZE):
+    """Переносит завершенные работы старше older_than (timedelta) в архив.
+
+    Каждая пачка из batch_size работ переносится отдельной транзакцией.
+    Возвращает число перенесенных работ.
+    """
+    now = now or datetime.datetime.now()
+    query = candidates(older_than, now).limit(batch_size)
+    moved = 0
+    while True:
+        job_ids = session.scalars(query).all()
+        if not job_ids:
+            break
+        _move(session, job_ids, now)
+        session.commit()
+        moved += len(job_ids)
+    session.expire_all()
+    return moved
+
+
+def main():
+    from database import db_session
+    import models.users  # noqa: F401  связи Jobs.leader и ArchivedJob.leader
+
+    parser = argparse.ArgumentParser(description='Перенос завершенных работ в архив')
+    parser.add_argument('db_file')
+    parser.add_argument('--days', type=int, default=DEFAULT_MAX_AGE_DAYS,
+                        help='минимальный возраст завершенной работы в днях')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help='только посчитать работы для переноса')
+    args = parser.parse_args()
+
+    db_session.global_init(args.db_file)
+    session = db_session.new_session()
+    try:
+        older_than = datetime.timedelta(days=args.days)
+        if args.dry_run:
+            count = session.scalar(select(func.count()).select_from(candidates(older_than).subquery()))
+            print(f"Будет перенесено в архив работ: {count}")
+        else:
+            print(f"Перенесено в архив работ: {archive_finished_jobs(session, older_than, batch_size=args.batch_size)}")
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Категории работ: проверка списков ID по карте в памяти процесса.
+
+Категорий мало, и меняются они редко, поэтому карта {id: название} всех
+категорий загружается одним запросом и живет, пока фиксация в этом
+процессе не запишет таблицу categories (database/table_writes.py). ID,
+которого нет в карте, перечитывает ее один раз: категорию могли добавить
+в другом процессе или мимо сессии.
+
+    missing(session, ids)  - ID из списка, которых нет среди категорий
+    load(session, ids)     - объекты Category по списку одним запросом IN
+"""
+import threading
+
+from sqlalchemy import select
+
+from database import metrics
+from database import table_writes
+from models.category import Category
+
+_lock = threading.Lock()
+_names = None
+# номер сброса карты: карта, прочитанная до фиксации в categories, после нее не сохраняется
+_generation = 0
+_stats = {'loads': 0, 'lookups': 0}
+
+
+def _load(session):
+    global _names
+    with _lock:
+        generation = _generation
+    names = dict(session.execute(select(Category.id, Category.name)).all())
+    # незафиксированные категории своей транзакции в общую карту не попадают
+    shared = 'categories' not in session.info.get('written_tables', ())
+    with _lock:
+        if generation == _generation and shared:
+            _names = names
+        _stats['loads'] += 1
+    return names
+
+
+def names(session):
+    """{id: название} всех категорий; загружается при первом обращении и после записи categories."""
+    with _lock:
+        current = _names
+    return current if current is not None else _load(session)
+
+
+def missing(session, category_ids):
+    """ID из category_ids (без повторов, в исходном порядке), которых нет среди категорий."""
+    category_ids = list(dict.fromkeys(category_ids))
+    with _lock:
+        _stats['lookups'] += 1
+    known = names(session)
+    if any(cat_id not in known for cat_id in category_ids):
+        known = _load(session)
+    return [cat_id for cat_id in category_ids if cat_id not in known]
+
+
+def load(session, category_ids):
+    """Объекты Category для category_ids в том же порядке (без повторов и неизвестных ID).
+
+    Объекты из identity map сессии берутся без запроса, остальные - одним IN.
+    """
+    category_ids = list(dict.fromkeys(category_ids))
+    found = {cat_id: session.identity_map.get((Category, (cat_id,), None)) for cat_id in category_ids}
+    absent = [cat_id for cat_id, category in found.items() if category is None]
+    if absent:
+        found.update((category.id, category) for category in
+                     session.scalars(select(Category).where(Category.id.in_(absent))))
+    return [found[cat_id] for cat_id in category_ids if found.get(cat_id) is not None]
+
+
+def refresh():
+    """Сбрасывает карту: следующее обращение загрузит ее заново."""
+    global _names, _generation
+    with _lock:
+        _names = None
+        _generation += 1
+
+
+def stats():
+    with _lock:
+        return dict(_stats, size=len(_names) if _names is not None else None)
+
+
+def _on_commit(tables):
+    if 'categories' in tables or table_writes.ALL_TABLES in tables:
+        refresh()
+
+
+table_writes.subscribe(_on_commit)
+metrics.register('categories', stats)
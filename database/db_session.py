@@ -1,15 +1,93 @@
-import sqlalchemy as sa
+import itertools
+import threading
+import traceback
+
 import sqlalchemy.orm as orm
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 import sqlalchemy.ext.declarative as dec
+from flask import g, has_app_context, has_request_context, current_app, request
+
+from database import engine_profile
+from database import metrics
+from database.replication import Replicator
 
 SqlAlchemyBase = dec.declarative_base()
 
 __factory = None
+__engine = None
+__db_file = None
+__replicator = None
 
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+GENERATION_COOKIE = 'db_generation'
+GENERATION_HEADER = 'X-DB-Generation'
 
-def global_init(db_file):
-    global __factory
+
+class _SessionTracker:
+    """Учет открытых сессий для отладочного режима (DB_SESSION_DEBUG)."""
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._open = {}
+        self._scopes = itertools.count(1)
+
+    def new_scope(self):
+        return next(self._scopes)
+
+    def opened(self, session, scope):
+        if not self.enabled:
+            return
+        stack = ''.join(traceback.format_stack(limit=14)[:-2])
+        with self._lock:
+            self._open[id(session)] = (scope, stack)
+
+    def closed(self, session):
+        with self._lock:
+            self._open.pop(id(session), None)
+
+    def open_count(self):
+        with self._lock:
+            return len(self._open)
+
+    def pop_leaked(self, scope):
+        """Стеки сессий запроса scope, оставшихся открытыми; их записи удаляются,
+        чтобы незакрытые сессии не копились в _open."""
+        with self._lock:
+            leaked = [key for key, (session_scope, _) in self._open.items() if session_scope == scope]
+            return [self._open.pop(key)[1] for key in leaked]
+
+
+_tracker = _SessionTracker()
+
+
+class TrackedSession(Session):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.info['scope'] = _current_scope()
+        _tracker.opened(self, self.info['scope'])
+
+    def close(self):
+        super().close()
+        _tracker.closed(self)
+
+
+def _current_scope():
+    if not has_app_context():
+        return None
+    if 'db_scope' not in g:
+        g.db_scope = _tracker.new_scope()
+    return g.db_scope
+
+
+def global_init(db_file, profile=None):
+    """Подключается к базе данных.
+
+    profile - словарь переопределений для engine_profile.DEFAULT_PROFILE
+    (прагмы SQLite и параметры пула соединений).
+    """
+    global __factory, __engine, __db_file
 
     if __factory:
         return
@@ -17,17 +95,156 @@ def global_init(db_file):
     if not db_file or not db_file.strip():
         raise Exception("Необходимо указать файл базы данных.")
 
-    conn_str = f'sqlite:///{db_file.strip()}?check_same_thread=False'
-    print(f"Подключение к базе данных по адресу {conn_str}")
+    print(f"Подключение к базе данных по адресу sqlite:///{db_file.strip()}")
 
-    engine = sa.create_engine(conn_str, echo=False)
-    __factory = orm.sessionmaker(bind=engine)
+    engine = engine_profile.create_engine(db_file.strip(), profile)
+    __engine = engine
+    __db_file = db_file.strip()
+    __factory = orm.sessionmaker(bind=engine, class_=TrackedSession)
+    metrics.register('pool', pool_stats)
+    metrics.register('sessions', session_stats)
 
-    SqlAlchemyBase.metadata.create_all(engine)
+    from database import migrations
+    migrations.upgrade(engine)
 
 
-def create_session() -> Session:
+def init_replicas(replica_files, interval=1.0, profile=None):
+    """Включает режим реплик: запросы на чтение идут в копии базы только для чтения.
+
+    Вызывается после global_init. Реплики обновляются фоновым потоком раз в
+    interval секунд, если на основной базе были фиксации.
+    """
+    global __replicator
+    if __replicator:
+        return
+    if not __engine:
+        raise Exception("База данных не инициализирована. Вызовите global_init.")
+    replicator = Replicator(__db_file, replica_files, interval, profile)
+    replicator.start(TrackedSession)
+    __replicator = replicator
+    metrics.register('replication', replicator.stats)
+
+
+def get_replicator():
+    return __replicator
+
+
+def use_primary(view):
+    """Помечает представление, которое пишет в базу даже на GET-запросе."""
+    view.use_primary = True
+    return view
+
+
+@event.listens_for(TrackedSession, 'after_commit')
+def _on_commit(session):
+    replicator = __replicator
+    # Основная база - и движок global_init, и асинхронный движок db_session_async
+    # на тот же файл; сессии реплик поколение не меняют
+    if replicator is None or session.bind is None or session.bind.url.database != __db_file:
+        return
+    generation = replicator.note_commit()
+    session.info['write_generation'] = generation
+    note_write_generation(generation)
+
+
+def note_write_generation(generation):
+    """Запоминает поколение записи для ответа текущему запросу (read-your-writes)."""
+    if generation is not None and has_request_context():
+        g.db_write_generation = max(generation, g.get('db_write_generation') or 0)
+
+
+def _required_generation():
+    value = request.headers.get(GENERATION_HEADER) or request.cookies.get(GENERATION_COOKIE)
+    try:
+        return int(value) if value else 0
+    except ValueError:
+        return 0
+
+
+def _is_read_only_request():
+    if request.method not in READ_METHODS:
+        return False
+    view = current_app.view_functions.get(request.endpoint)
+    return not getattr(view, 'use_primary', False)
+
+
+def _request_session():
+    replicator = __replicator
+    if replicator is not None and has_request_context() and _is_read_only_request():
+        replica = replicator.pick(_required_generation())
+        if replica is not None:
+            return replica.factory()
+    return new_session()
+
+
+def init_app(app):
+    """Включает сессию на запрос: create_session() внутри запроса возвращает
+    одну и ту же сессию, которая закрывается (с откатом при ошибке) в teardown.
+
+    DB_SESSION_DEBUG=True включает подсчет открытых сессий и печать стека
+    создания сессий, оставшихся открытыми к концу запроса.
+    """
+    app.config.setdefault('DB_SESSION_DEBUG', False)
+    _tracker.enabled = app.config['DB_SESSION_DEBUG']
+    app.extensions['db_session'] = True
+    app.after_request(_remember_write_generation)
+    app.teardown_appcontext(_teardown_session)
+
+
+def _remember_write_generation(response):
+    """Read-your-writes: после записи клиент получает номер поколения и читает
+    только из реплик, которые его уже догнали (либо из основной базы)."""
+    generation = g.pop('db_write_generation', None)
+    if generation is not None:
+        response.headers[GENERATION_HEADER] = str(generation)
+        response.set_cookie(GENERATION_COOKIE, str(generation), httponly=True, samesite='Lax')
+    return response
+
+
+def _teardown_session(exc):
+    session = g.pop('db_session', None)
+    if session is not None:
+        if exc is not None:
+            session.rollback()
+        session.close()
+
+    scope = g.pop('db_scope', None)
+    if _tracker.enabled and scope is not None:
+        for stack in _tracker.pop_leaked(scope):
+            print(f"Утечка сессии: сессия не закрыта к концу запроса. Создана здесь:\n{stack}")
+
+
+def get_engine():
+    if not __engine:
+        raise Exception("База данных не инициализирована. Вызовите global_init.")
+    return __engine
+
+
+def pool_stats():
+    """Снимок счетчиков пула: выдачи, возвраты и ожидания соединений."""
+    engine = get_engine()
+    stats = engine.pool.stats.snapshot()
+    stats['pool_size'] = engine.pool.size()
+    stats['overflow'] = engine.pool.overflow()
+    return stats
+
+
+def session_stats():
+    return {'debug': _tracker.enabled, 'open': _tracker.open_count() if _tracker.enabled else None}
+
+
+def new_session() -> Session:
+    """Новая самостоятельная сессия; вызывающий код обязан ее закрыть."""
     global __factory
     if not __factory:
         raise Exception("База данных не инициализирована. Вызовите global_init.")
     return __factory()
+
+
+def create_session() -> Session:
+    """Сессия текущего запроса, а вне запроса - новая сессия."""
+    if has_app_context() and 'db_session' in current_app.extensions:
+        if 'db_session' not in g:
+            g.db_session = _request_session()
+        return g.db_session
+    return new_session()
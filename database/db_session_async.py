@@ -0,0 +1,65 @@
+"""Асинхронный вариант db_session на SQLAlchemy AsyncEngine и aiosqlite.
+
+Используется асинхронными обработчиками из api/async_resources.py (точка
+входа asgi.py). Схемой по-прежнему управляет db_session.global_init
+(миграции), поэтому его нужно вызвать до global_init из этого модуля.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database import db_session
+from database import engine_profile
+from database import metrics
+
+__factory = None
+__engine = None
+
+
+def global_init(db_file, profile=None):
+    """Создает асинхронный движок; profile - как у db_session.global_init."""
+    global __factory, __engine
+
+    if __factory:
+        return
+
+    if not db_file or not db_file.strip():
+        raise Exception("Необходимо указать файл базы данных.")
+
+    print(f"Асинхронное подключение к базе данных по адресу sqlite+aiosqlite:///{db_file.strip()}")
+
+    __engine = engine_profile.create_async_engine(db_file.strip(), profile)
+    # После commit объекты не сбрасываются: ленивую подгрузку атрибутов
+    # в асинхронном коде нельзя делать неявно. Синхронная часть сессии - TrackedSession:
+    # фиксации доходят до db_session._on_commit (поколение реплик, read-your-writes)
+    __factory = async_sessionmaker(bind=__engine, expire_on_commit=False,
+                                   sync_session_class=db_session.TrackedSession)
+    metrics.register('async_pool', pool_stats)
+
+
+async def dispose():
+    global __factory, __engine
+    if __engine is not None:
+        await __engine.dispose()
+    metrics.unregister('async_pool')
+    __factory = None
+    __engine = None
+
+
+def get_engine():
+    if not __engine:
+        raise Exception("Асинхронная база данных не инициализирована. Вызовите global_init.")
+    return __engine
+
+
+def pool_stats():
+    pool = get_engine().sync_engine.pool
+    stats = pool.stats.snapshot()
+    stats['pool_size'] = pool.size()
+    stats['overflow'] = pool.overflow()
+    return stats
+
+
+def create_session() -> AsyncSession:
+    """Новая асинхронная сессия; используется как `async with create_session() as session`."""
+    if not __factory:
+        raise Exception("Асинхронная база данных не инициализирована. Вызовите global_init.")
+    return __factory()
@@ -0,0 +1,192 @@
+import threading
+import time
+
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+# Профиль движка по умолчанию. Любой ключ можно переопределить через
+# global_init(db_file, profile={...}); значение None отключает прагму.
+DEFAULT_PROFILE = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # отрицательное значение - размер в KiB (64 MB на соединение)
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,  # мс
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_timeout': 30,  # с
+    'echo': False,
+}
+
+PRAGMAS = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store', 'busy_timeout')
+
+
+class PoolStats:
+    """Счетчики пула соединений, общие для всех потоков."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.waits = 0
+            self.wait_time = 0.0
+            self.max_wait = 0.0
+
+    def on_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def on_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+
+    def on_checkin(self):
+        with self._lock:
+            self.checkins += 1
+
+    def on_wait(self, elapsed):
+        with self._lock:
+            self.waits += 1
+            self.wait_time += elapsed
+            self.max_wait = max(self.max_wait, elapsed)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'checked_out': self.checkouts - self.checkins,
+                'waits': self.waits,
+                'wait_time_ms': round(self.wait_time * 1000, 3),
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool, который замеряет ожидание свободного соединения.
+
+    Ожиданием считается запрос соединения в момент, когда пул и overflow
+    исчерпаны и поток вынужден блокироваться до возврата соединения.
+    """
+
+    def __init__(self, creator, pool_size=5, max_overflow=10, stats=None, **kw):
+        super().__init__(creator, pool_size=pool_size, max_overflow=max_overflow, **kw)
+        self._stats_max_overflow = max_overflow
+        self.stats = stats if stats is not None else PoolStats()
+
+    def _exhausted(self):
+        if self._stats_max_overflow < 0:
+            return False
+        return self.checkedin() == 0 and self.overflow() >= self._stats_max_overflow
+
+    def _do_get(self):
+        if not self._exhausted():
+            return super()._do_get()
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.stats.on_wait(time.perf_counter() - started)
+
+    def recreate(self):
+        new_pool = super().recreate()
+        new_pool.stats = self.stats
+        return new_pool
+
+
+def build_profile(overrides=None):
+    profile = dict(DEFAULT_PROFILE)
+    if overrides:
+        unknown = set(overrides) - set(DEFAULT_PROFILE)
+        if unknown:
+            raise ValueError(f"Неизвестные параметры профиля движка: {', '.join(sorted(unknown))}")
+        profile.update(overrides)
+    return profile
+
+
+def apply_pragmas(dbapi_connection, profile):
+    cursor = dbapi_connection.cursor()
+    try:
+        # busy_timeout первым, чтобы смена journal_mode тоже ждала блокировку
+        for name in ('busy_timeout',) + tuple(p for p in PRAGMAS if p != 'busy_timeout'):
+            value = profile.get(name)
+            if value is not None:
+                cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+
+def create_engine(db_file, profile=None, stats=None, read_only=False):
+    """Создает движок SQLite с прагмами профиля и инструментированным пулом."""
+    profile = build_profile(profile)
+    stats = stats if stats is not None else PoolStats()
+    url = f'sqlite:///file:{db_file}?mode=ro&uri=true' if read_only else f'sqlite:///{db_file}'
+
+    engine = sa.create_engine(
+        url,
+        echo=profile['echo'],
+        connect_args={'check_same_thread': False},
+        poolclass=InstrumentedQueuePool,
+        pool_size=profile['pool_size'],
+        max_overflow=profile['max_overflow'],
+        pool_timeout=profile['pool_timeout'],
+    )
+    engine.pool.stats = stats
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, profile)
+        stats.on_connect()
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.on_checkout()
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        stats.on_checkin()
+
+    return engine
+
+
+def create_async_engine(db_file, profile=None, stats=None):
+    """Асинхронный движок (aiosqlite) с теми же прагмами и параметрами пула.
+
+    Ожидание свободного соединения здесь не замеряется: асинхронному движку
+    нужен AsyncAdaptedQueuePool, а не InstrumentedQueuePool.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine as sa_create_async_engine
+
+    profile = build_profile(profile)
+    stats = stats if stats is not None else PoolStats()
+    engine = sa_create_async_engine(
+        f'sqlite+aiosqlite:///{db_file}',
+        echo=profile['echo'],
+        pool_size=profile['pool_size'],
+        max_overflow=profile['max_overflow'],
+        pool_timeout=profile['pool_timeout'],
+    )
+    engine.sync_engine.pool.stats = stats
+
+    @event.listens_for(engine.sync_engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, profile)
+        stats.on_connect()
+
+    @event.listens_for(engine.sync_engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.on_checkout()
+
+    @event.listens_for(engine.sync_engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        stats.on_checkin()
+
+    return engine
@@ -0,0 +1,73 @@
+"""Фильтры списков работ и пользователей из аргументов запроса.
+
+Каждый фильтр - условие WHERE по колонке с индексом, поэтому отбор
+выполняет SQLite, а не клиент:
+    is_finished, work_size_lt/gt  - ix_jobs_is_finished, ix_jobs_work_size,
+                                    вместе - частичный ix_jobs_unfinished_work_size (query4)
+    team_leader_id                - ix_jobs_team_leader
+    category_id                   - ix_association_category
+    address, age_lt/gt            - ix_users_address_age, ix_users_age (query1, query3)
+speciality_contains - поиск подстроки LIKE '%...%', как в query2: индекс
+для него не используется, условие проверяется на строках, уже отобранных
+остальными фильтрами.
+
+Условия строятся для переданной модели, поэтому фильтры работ подходят и
+для Jobs, и для ArchivedJob.
+"""
+from sqlalchemy import false, select, true
+
+
+class FilterError(ValueError):
+    """Неверное значение фильтра; обработчики отвечают 400."""
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    lowered = str(value).lower()
+    if lowered in ('1', 'true', 'yes'):
+        return True
+    if lowered in ('0', 'false', 'no'):
+        return False
+    raise ValueError(value)
+
+
+def _is_finished(model, value):
+    # Литерал 0/1 вместо параметра: только так SQLite применяет частичный индекс по is_finished = 0
+    return model.is_finished == (true() if value else false())
+
+
+def _with_category(model, category_id):
+    links = model.categories.property.secondary
+    return model.id.in_(select(links.c.jobs).where(links.c.category == category_id))
+
+
+JOB_FILTERS = {
+    'is_finished': (parse_bool, _is_finished),
+    'team_leader_id': (int, lambda model, value: model.team_leader == value),
+    'work_size_lt': (int, lambda model, value: model.work_size < value),
+    'work_size_gt': (int, lambda model, value: model.work_size > value),
+    'category_id': (int, _with_category),
+}
+
+USER_FILTERS = {
+    'address': (str, lambda model, value: model.address == value),
+    'age_lt': (int, lambda model, value: model.age < value),
+    'age_gt': (int, lambda model, value: model.age > value),
+    'speciality_contains': (str, lambda model, value: model.speciality.contains(value, autoescape=True)),
+}
+
+
+def conditions(model, args, filters):
+    """Условия WHERE для фильтров из args (словарь), заданных непустым значением."""
+    result = []
+    for name, (convert, build) in filters.items():
+        raw = args.get(name)
+        if raw is None or raw == '':
+            continue
+        try:
+            value = convert(raw)
+        except (TypeError, ValueError):
+            raise FilterError(f"Invalid value for {name}: '{raw}'")
+        result.append(build(model, value))
+    return result
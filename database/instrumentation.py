@@ -0,0 +1,140 @@
+"""Учет SQL-запросов в пределах одного HTTP-запроса.
+
+Считает выполненные выражения, суммарное время в базе и строки (затронутые
+DML-выражениями и загруженные ORM-объекты). Одинаковые по форме выражения,
+выполненные больше SQL_N_PLUS_ONE_THRESHOLD раз за запрос, помечаются как N+1.
+
+Настройки приложения:
+    SQL_INSTRUMENTATION_HEADERS - добавлять заголовки X-DB-* (по умолчанию в debug)
+    SQL_N_PLUS_ONE_THRESHOLD    - порог повторов одной формы выражения
+    SQL_QUERY_BUDGET            - допустимое число выражений на запрос (None - без лимита)
+    SQL_STRICT_BUDGET           - при превышении бюджета бросать QueryBudgetExceeded
+"""
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context, current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from database.db_session import SqlAlchemyBase
+
+# (?, ?, ?) из развернутых IN-списков сворачиваем в (?), чтобы форма не зависела от длины списка
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryStats:
+    def __init__(self):
+        self.statements = 0
+        self.time = 0.0
+        self.rows = 0
+        self.shapes = Counter()
+
+    def record(self, statement, elapsed, rowcount):
+        self.statements += 1
+        self.time += elapsed
+        if rowcount and rowcount > 0:
+            self.rows += rowcount
+        self.shapes[statement_shape(statement)] += 1
+
+    def n_plus_one(self, threshold):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+    def as_dict(self):
+        return {'statements': self.statements, 'time_ms': round(self.time * 1000, 3), 'rows': self.rows}
+
+
+def statement_shape(statement):
+    return _IN_LIST.sub('(?)', _WHITESPACE.sub(' ', statement).strip())
+
+
+def current_stats():
+    if has_request_context():
+        return g.get('db_query_stats')
+    return None
+
+
+def query_budget(limit):
+    """Бюджет запросов для конкретного представления (перекрывает SQL_QUERY_BUDGET)."""
+
+    def decorate(view):
+        view.query_budget = limit
+        return view
+
+    return decorate
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_stats() is not None:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats()
+    started = conn.info.get('query_started')
+    if stats is None or not started:
+        return
+    stats.record(statement, time.perf_counter() - started.pop(), cursor.rowcount)
+
+
+@event.listens_for(SqlAlchemyBase, 'load', propagate=True)
+def _on_load(target, context):
+    stats = current_stats()
+    if stats is not None:
+        stats.rows += 1
+
+
+def count_rows(count):
+    """Строки выборок колонок (без ORM-сущностей и события load) в X-DB-Rows."""
+    stats = current_stats()
+    if stats is not None:
+        stats.rows += count
+
+
+def init_app(app):
+    app.config.setdefault('SQL_INSTRUMENTATION_HEADERS', None)
+    app.config.setdefault('SQL_N_PLUS_ONE_THRESHOLD', 5)
+    app.config.setdefault('SQL_QUERY_BUDGET', None)
+    app.config.setdefault('SQL_STRICT_BUDGET', False)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+def _start_request():
+    g.db_query_stats = QueryStats()
+
+
+def _finish_request(response):
+    stats = g.pop('db_query_stats', None)
+    if stats is None:
+        return response
+    config = current_app.config
+
+    suspects = stats.n_plus_one(config['SQL_N_PLUS_ONE_THRESHOLD'])
+    for shape, count in suspects:
+        print(f"Возможный N+1 в {request.method} {request.path}: выражение выполнено {count} раз: {shape[:200]}")
+
+    headers = config['SQL_INSTRUMENTATION_HEADERS']
+    if headers or (headers is None and current_app.debug):
+        response.headers['X-DB-Queries'] = str(stats.statements)
+        response.headers['X-DB-Time-ms'] = f'{stats.time * 1000:.3f}'
+        response.headers['X-DB-Rows'] = str(stats.rows)
+        response.headers['X-DB-N-Plus-One'] = str(len(suspects))
+
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', config['SQL_QUERY_BUDGET'])
+    if budget is not None and stats.statements > budget:
+        message = (f"{request.method} {request.path}: {stats.statements} SQL-выражений "
+                   f"при бюджете {budget}")
+        if config['SQL_STRICT_BUDGET']:
+            raise QueryBudgetExceeded(message)
+        print(f"Превышен бюджет запросов: {message}")
+    return response
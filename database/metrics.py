@@ -0,0 +1,21 @@
+import threading
+
+_sources = {}
+_lock = threading.Lock()
+
+
+def register(name, collector):
+    """Регистрирует источник метрик: функцию без аргументов, возвращающую dict."""
+    with _lock:
+        _sources[name] = collector
+
+
+def unregister(name):
+    with _lock:
+        _sources.pop(name, None)
+
+
+def collect():
+    with _lock:
+        sources = list(_sources.items())
+    return {name: collector() for name, collector in sources}
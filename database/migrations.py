@@ -0,0 +1,205 @@
+"""Нумерованные миграции схемы.
+
+Номер версии схемы хранится в PRAGMA user_version. Каждая миграция
+применяется один раз, в отдельной транзакции (BEGIN IMMEDIATE), вместе с
+записью нового номера версии. Миграции идемпотентны: база, созданная старым
+create_all, и пустая база приводятся к одной и той же схеме.
+"""
+from database.db_session import SqlAlchemyBase
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def register(fn):
+        if MIGRATIONS and MIGRATIONS[-1][0] >= version:
+            raise ValueError(f"Миграции должны идти по возрастанию версий: {version}")
+        MIGRATIONS.append((version, description, fn))
+        return fn
+
+    return register
+
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(connection):
+    return connection.exec_driver_sql('PRAGMA user_version').scalar()
+
+
+def _load_models():
+    # Таблицы берутся из метаданных моделей, поэтому модели должны быть импортированы
+    import models.users  # noqa: F401
+    import models.category  # noqa: F401
+    import models.jobs  # noqa: F401
+    import models.departments  # noqa: F401
+    import models.jobs_archive  # noqa: F401
+    import models.aggregates  # noqa: F401
+    import models.versions  # noqa: F401
+
+
+def _table(name):
+    return SqlAlchemyBase.metadata.tables[name]
+
+
+def _columns(connection, table_name):
+    return {row[1]: row for row in connection.exec_driver_sql(f'PRAGMA table_info({table_name})')}
+
+
+def _create_indexes(connection, table_name, index_names):
+    indexes = {index.name: index for index in _table(table_name).indexes}
+    for name in index_names:
+        indexes[name].create(connection, checkfirst=True)
+
+
+def _rebuild_table(connection, table_name):
+    """Пересоздает таблицу по описанию модели с сохранением строк
+    (порядок из документации SQLite: новая таблица, копия, DROP, RENAME).
+    Триггеры таблицы удаляются вместе с ней и должны быть созданы заново."""
+    from sqlalchemy.schema import CreateTable
+
+    table = _table(table_name)
+    existing = _columns(connection, table_name)
+    columns = ', '.join(column.name for column in table.columns if column.name in existing)
+    ddl = str(CreateTable(table).compile(connection))
+    connection.exec_driver_sql(ddl.replace(f'CREATE TABLE {table_name} ', f'CREATE TABLE {table_name}_new ', 1))
+    connection.exec_driver_sql(f'INSERT INTO {table_name}_new ({columns}) SELECT {columns} FROM {table_name}')
+    connection.exec_driver_sql(f'DROP TABLE {table_name}')
+    connection.exec_driver_sql(f'ALTER TABLE {table_name}_new RENAME TO {table_name}')
+    _create_indexes(connection, table_name, [index.name for index in table.indexes])
+
+
+def upgrade(engine):
+    """Применяет недостающие миграции; возвращает список примененных версий."""
+    with engine.connect() as connection:
+        if current_version(connection) >= latest_version():
+            return []
+
+    _load_models()
+    applied = []
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        for version, description, fn in MIGRATIONS:
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+            try:
+                # Версию перечитываем под блокировкой: другой процесс мог успеть раньше
+                if current_version(connection) >= version:
+                    connection.exec_driver_sql('ROLLBACK')
+                    continue
+                fn(connection)
+                connection.exec_driver_sql(f'PRAGMA user_version = {int(version)}')
+                connection.exec_driver_sql('COMMIT')
+            except Exception:
+                connection.exec_driver_sql('ROLLBACK')
+                raise
+            print(f"Применена миграция {version}: {description}")
+            applied.append(version)
+    return applied
+
+
+@migration(1, 'базовая схема и индексы под запросы из queries/')
+def _baseline_with_indexes(connection):
+    SqlAlchemyBase.metadata.create_all(connection, tables=[
+        _table('users'), _table('categories'), _table('jobs'), _table('association'), _table('departments'),
+    ])
+
+    # В старых базах у association нет первичного ключа: пересобираем таблицу,
+    # заодно отбрасывая дубликаты и неполные строки.
+    if not any(column[5] for column in _columns(connection, 'association').values()):
+        connection.exec_driver_sql('ALTER TABLE association RENAME TO association_old')
+        _table('association').create(connection)
+        connection.exec_driver_sql(
+            'INSERT OR IGNORE INTO association (jobs, category) '
+            'SELECT jobs, category FROM association_old WHERE jobs IS NOT NULL AND category IS NOT NULL')
+        connection.exec_driver_sql('DROP TABLE association_old')
+
+    _create_indexes(connection, 'association', ['ix_association_category'])
+    _create_indexes(connection, 'jobs', ['ix_jobs_team_leader', 'ix_jobs_is_finished', 'ix_jobs_unfinished_work_size'])
+    _create_indexes(connection, 'departments', ['ix_departments_chief'])
+    _create_indexes(connection, 'users', ['ix_users_age', 'ix_users_address_age'])
+    connection.exec_driver_sql('ANALYZE')
+
+
+@migration(2, 'таблица job_collaborators, заполненная из jobs.collaborators')
+def _job_collaborators(connection):
+    from models.jobs import parse_collaborator_ids
+
+    table = _table('job_collaborators')
+    table.create(connection, checkfirst=True)
+    rows = []
+    for job_id, collaborators in connection.exec_driver_sql('SELECT id, collaborators FROM jobs'):
+        rows.extend({'job_id': job_id, 'user_id': user_id} for user_id in parse_collaborator_ids(collaborators))
+    if rows:
+        connection.execute(table.insert().prefix_with('OR IGNORE'), rows)
+
+
+@migration(3, 'таблица department_members, заполненная из departments.members')
+def _department_members(connection):
+    from models.departments import parse_member_ids
+
+    table = _table('department_members')
+    table.create(connection, checkfirst=True)
+    rows = []
+    for department_id, members in connection.exec_driver_sql('SELECT id, members FROM departments'):
+        rows.extend({'department_id': department_id, 'user_id': user_id} for user_id in parse_member_ids(members))
+    if rows:
+        connection.execute(table.insert().prefix_with('OR IGNORE'), rows)
+
+
+@migration(4, 'архив работ jobs_archive и AUTOINCREMENT для jobs.id')
+def _jobs_archive(connection):
+    _table('jobs_archive').create(connection, checkfirst=True)
+    _table('jobs_archive_categories').create(connection, checkfirst=True)
+
+    # Без AUTOINCREMENT SQLite выдает max(id) + 1, и новая работа могла бы
+    # получить ID работы, уже перенесенной в архив
+    ddl = connection.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'jobs'").scalar()
+    if 'AUTOINCREMENT' not in ddl.upper():
+        _rebuild_table(connection, 'jobs')
+
+
+@migration(5, 'агрегаты job_team_sizes, user_hours, department_hours и их триггеры')
+def _aggregates(connection):
+    from database import aggregates
+
+    for name in aggregates.TABLES:
+        _table(name).create(connection, checkfirst=True)
+    aggregates.install_triggers(connection)
+    aggregates.rebuild(connection)
+
+
+@migration(6, 'полнотекстовый поиск jobs_fts и users_fts (FTS5) и его триггеры')
+def _search(connection):
+    from database import search
+
+    search.install(connection)
+    search.rebuild(connection)
+
+
+@migration(7, 'индексы под сортировки keyset-пагинации списков')
+def _pagination_indexes(connection):
+    _create_indexes(connection, 'jobs', ['ix_jobs_start_date', 'ix_jobs_work_size'])
+    _create_indexes(connection, 'users', ['ix_users_surname'])
+
+
+@migration(8, 'версии строк users, jobs и departments (version, modified_date) и их триггеры')
+def _row_versions(connection):
+    from sqlalchemy.schema import CreateColumn
+    from database import versioning
+
+    _table('row_versions').create(connection, checkfirst=True)
+    for table_name in versioning.TABLES:
+        existing = _columns(connection, table_name)
+        for name in ('modified_date', 'version'):
+            if name not in existing:
+                column = CreateColumn(_table(table_name).c[name]).compile(connection)
+                connection.exec_driver_sql(f'ALTER TABLE {table_name} ADD COLUMN {column}')
+    connection.exec_driver_sql('UPDATE jobs SET modified_date = coalesce(end_date, start_date) WHERE modified_date IS NULL')
+    versioning.init_counters(connection)
+    versioning.install_triggers(connection)
+
+
+@migration(9, 'индексы по version: max(version) в ETag полного списка (all=1)')
+def _version_indexes(connection):
+    _create_indexes(connection, 'jobs', ['ix_jobs_version'])
+    _create_indexes(connection, 'users', ['ix_users_version'])
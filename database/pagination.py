@@ -0,0 +1,174 @@
+"""Keyset-пагинация списков по id и необязательному ключу сортировки.
+
+Страница - это limit строк после курсора: ORDER BY ключ, id с условием
+"после последней строки предыдущей страницы" вместо OFFSET, поэтому
+каждая страница читается по индексу за O(limit) независимо от глубины.
+Курсор непрозрачен для клиента: base64url от [ключ, убывание, значение, id].
+
+Аргументы запроса: limit, sort (id, -id, work_size, -start_date, ...),
+cursor (из поля next предыдущего ответа) и all=1 для старых клиентов,
+которым нужен весь список одним ответом.
+"""
+import base64
+import binascii
+import datetime
+import json
+from collections import namedtuple
+
+from sqlalchemy import DateTime, and_, select, tuple_
+
+from database import instrumentation
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+ALL_ARG = 'all'
+
+# Ключи сортировки с индексом (ключ, rowid): ix_jobs_start_date, ix_jobs_work_size, ix_users_surname, ix_users_age
+JOB_SORT_KEYS = ('id', 'start_date', 'work_size')
+USER_SORT_KEYS = ('id', 'surname', 'age')
+
+PageRequest = namedtuple('PageRequest', 'limit sort descending after')
+
+
+class PageError(ValueError):
+    """Неверные limit, sort или cursor; обработчики отвечают 400."""
+
+
+def wants_all(args):
+    return str(args.get(ALL_ARG, '')).lower() in ('1', 'true', 'yes')
+
+
+def parse(args, sort_keys=('id',)):
+    """PageRequest из аргументов запроса (словарь) или None при all=1."""
+    if wants_all(args):
+        return None
+    try:
+        limit = int(args.get('limit') or DEFAULT_LIMIT)
+    except (TypeError, ValueError):
+        raise PageError('limit must be an integer')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise PageError(f'limit must be between 1 and {MAX_LIMIT}')
+
+    requested = args.get('sort') or None
+    if args.get('cursor'):
+        sort, descending, after = decode_cursor(args['cursor'])
+        if requested and requested != ('-' if descending else '') + sort:
+            raise PageError('cursor was issued for a different sort')
+    else:
+        requested = requested or 'id'
+        descending = requested.startswith('-')
+        sort, after = requested[1:] if descending else requested, None
+    if sort not in sort_keys:
+        raise PageError(f"sort must be one of: {', '.join(sort_keys)} (prefix with '-' for descending)")
+    return PageRequest(limit, sort, descending, after)
+
+
+def encode_cursor(page, item):
+    value = getattr(item, page.sort)
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    payload = json.dumps([page.sort, page.descending, value, item.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort, descending, value, last_id = json.loads(payload)
+        if not isinstance(sort, str) or not isinstance(last_id, int):
+            raise ValueError(cursor)
+    except (ValueError, TypeError, binascii.Error):
+        raise PageError('Invalid cursor')
+    return sort, bool(descending), (value, last_id)
+
+
+def _ranges(key, pk, page):
+    """Условия WHERE для частей страницы в порядке ORDER BY key, id.
+
+    SQLite ставит NULL раньше любых значений: при возрастании NULL идут
+    первыми, при убывании - последними. Каждая часть - один диапазон по
+    индексу (key, rowid); OR с key IS NULL заставил бы SQLite просматривать
+    индекс с начала. Сравнение строк (key, id) > (...) дает такой диапазон.
+    """
+    if page.after is None:
+        return [None]
+    value, last_id = page.after
+    if page.sort == 'id':
+        return [pk < last_id if page.descending else pk > last_id]
+    if value is not None and isinstance(key.type, DateTime):
+        try:
+            value = datetime.datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise PageError('Invalid cursor')
+    if not page.descending:
+        if value is None:
+            return [and_(key.is_(None), pk > last_id), key.is_not(None)]
+        return [tuple_(key, pk) > tuple_(value, last_id)]
+    if value is None:
+        return [and_(key.is_(None), pk < last_id)]
+    return [tuple_(key, pk) < tuple_(value, last_id), key.is_(None)]
+
+
+def statements(model, page, query=None):
+    """Выборки select(model) (или query) для одной страницы, по порядку.
+
+    Следующая выборка нужна, только если предыдущие не набрали limit + 1
+    строк; лишняя строка показывает finish, что есть следующая страница.
+    """
+    query = select(model) if query is None else query
+    key, pk = getattr(model, page.sort), model.id
+    order = [pk] if page.sort == 'id' else [key, pk]
+    if page.descending:
+        order = [column.desc() for column in order]
+    return [(query if condition is None else query.where(condition)).order_by(*order)
+            for condition in _ranges(key, pk, page)]
+
+
+def results(session, statement):
+    """Список сущностей для select(модель) или строк Row для выборки колонок (api/serializers.py).
+
+    С execution_options(yield_per=...) - итератор, читающий курсор частями.
+    unique() нужен для joinedload коллекций: строки работы повторяются по числу категорий.
+    """
+    result = session.execute(statement)
+    streamed = statement.get_execution_options().get('yield_per')
+    [first, *rest] = statement.column_descriptions
+    if not rest and first['type'] is first['entity']:
+        # yield_per несовместим с unique(), как и с joinedload коллекций
+        return iter(result.scalars()) if streamed else result.scalars().unique().all()
+    if streamed:
+        return iter(result)
+    items = result.all()
+    instrumentation.count_rows(len(items))
+    return items
+
+
+def rows(session, model, page, query=None):
+    """До limit + 1 строк страницы; finish превращает их в страницу и курсор."""
+    items = []
+    for statement in statements(model, page, query):
+        items.extend(results(session, statement.limit(page.limit + 1 - len(items))))
+        if len(items) > page.limit:
+            break
+    return items
+
+
+def fetch(session, model, page, query=None):
+    """(строки страницы, курсор следующей страницы или None)."""
+    return finish(rows(session, model, page, query), page)
+
+
+def sort_key(page):
+    """Ключ sorted() в том же порядке, что и ORDER BY SQLite (с reverse=page.descending)."""
+    def key(item):
+        value = getattr(item, page.sort)
+        return value is not None, value, item.id
+    return key
+
+
+def finish(items, page):
+    """(строки страницы, курсор следующей страницы или None) из limit + 1 выбранных строк."""
+    if len(items) <= page.limit:
+        return items, None
+    items = items[:page.limit]
+    return items, encode_cursor(page, items[-1])
@@ -0,0 +1,163 @@
+"""Хеширование и проверка паролей в ограниченном пуле процессов.
+
+PBKDF2 и scrypt занимают процессор на десятки миллисекунд и больше. Если
+считать их в потоке запроса, всплеск /login, /register или POST
+/api/v2/users занимает все потоки сервера, и чтение ждет. Поэтому хеши
+считает пул из нескольких процессов с пониженным приоритетом. Запрос ждет
+результата, но одновременно хешируется не больше PASSWORD_POOL_WORKERS
+паролей, а в очереди ждут не больше PASSWORD_POOL_MAX_PENDING операций.
+Следующая операция сразу получает PoolBusy (503 с Retry-After).
+
+Метод и стоимость хеша задаются настройками. Хеш хранит свои параметры
+("scrypt:32768:8:1$соль$хеш"), поэтому старые хеши проверяются как раньше,
+а needs_rehash() говорит, что после успешного входа хеш пора пересчитать
+с текущими параметрами.
+
+Пока init_app не вызван (скрипты, queries/bulk_load.py), хеши считаются в
+вызывающем потоке методом Werkzeug по умолчанию. Процессы пула запускаются
+через spawn и заново импортируют главный модуль, поэтому скрипт, который
+поднимает приложение, держит свой код под if __name__ == '__main__'.
+
+Настройки приложения:
+    PASSWORD_HASH_METHOD      - 'scrypt' или 'pbkdf2:<hash>', например 'pbkdf2:sha256'
+    PASSWORD_HASH_ITERATIONS  - итерации pbkdf2 или N scrypt (None - по умолчанию Werkzeug)
+    PASSWORD_POOL_WORKERS     - процессов в пуле (0 - считать в потоке запроса)
+    PASSWORD_POOL_MAX_PENDING - сколько операций может ждать свободный процесс
+    PASSWORD_POOL_NICE        - на сколько понизить приоритет процессов пула
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+from database import metrics
+
+DEFAULT_METHOD = 'scrypt'
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2 ** 15, 8, 1
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 1) // 2)
+DEFAULT_MAX_PENDING = 32
+DEFAULT_NICE = 10
+RETRY_AFTER = 1
+
+
+class PoolBusy(ServiceUnavailable):
+    description = 'Too many password operations in progress, try again later.'
+
+
+def method_string(method=DEFAULT_METHOD, iterations=None):
+    """Полная строка метода, как ее записывает generate_password_hash: 'scrypt:N:r:p' или 'pbkdf2:hash:итерации'."""
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        n, r, p = map(int, args) if args else (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        return f'scrypt:{iterations or n}:{r}:{p}'
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        default = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations or default}'
+    raise ValueError(f"Неизвестный метод хеширования пароля: {method}")
+
+
+_lock = threading.Lock()
+_method = method_string()
+_workers = 0
+_limit = 0
+_nice = 0
+_pool = None
+_pending = 0
+_stats = {'hashes': 0, 'checks': 0, 'rejected': 0, 'max_pending': 0}
+
+
+def configure(method=DEFAULT_METHOD, iterations=None, workers=0, max_pending=DEFAULT_MAX_PENDING, nice=DEFAULT_NICE):
+    """Задает параметры хеша и пула; пул с прежними параметрами закрывается."""
+    global _method, _workers, _limit, _nice, _pool
+    full_method = method_string(method, iterations)
+    with _lock:
+        pool, _pool = _pool, None
+        _method = full_method
+        _workers = workers
+        _limit = workers + max_pending
+        _nice = nice
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def init_app(app):
+    app.config.setdefault('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+    app.config.setdefault('PASSWORD_HASH_ITERATIONS', None)
+    app.config.setdefault('PASSWORD_POOL_WORKERS', DEFAULT_WORKERS)
+    app.config.setdefault('PASSWORD_POOL_MAX_PENDING', DEFAULT_MAX_PENDING)
+    app.config.setdefault('PASSWORD_POOL_NICE', DEFAULT_NICE)
+    configure(app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_HASH_ITERATIONS'],
+              app.config['PASSWORD_POOL_WORKERS'], app.config['PASSWORD_POOL_MAX_PENDING'],
+              app.config['PASSWORD_POOL_NICE'])
+    metrics.register('passwords', stats)
+
+
+def current_method():
+    return _method
+
+
+def needs_rehash(hashed_password):
+    """Хеш посчитан не текущим методом или не с текущей стоимостью."""
+    return bool(hashed_password) and hashed_password.split('$', 1)[0] != _method
+
+
+def hash_password(password):
+    return _run('hashes', generate_password_hash, password, _method)
+
+
+def check_password(hashed_password, password):
+    return _run('checks', check_password_hash, hashed_password, password)
+
+
+def stats():
+    with _lock:
+        return dict(_stats, method=_method, workers=_workers, limit=_limit, pending=_pending)
+
+
+def _lower_priority(nice):
+    # os.nice есть только в Unix; в Windows процессы пула работают с обычным приоритетом
+    if nice and hasattr(os, 'nice'):
+        os.nice(nice)
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            # Процессы создаются при первой операции, уже в рабочем процессе сервера. spawn, а не
+            # fork: сервер многопоточный (писатель, репликатор, соединения пула SQLAlchemy)
+            _pool = ProcessPoolExecutor(_workers, mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=_lower_priority, initargs=(_nice,))
+        return _pool
+
+
+def _run(counter, function, *args):
+    global _pending, _pool
+    with _lock:
+        inline = not _workers
+        if not inline and _pending >= _limit:
+            _stats['rejected'] += 1
+            raise PoolBusy(retry_after=RETRY_AFTER)
+        _stats[counter] += 1
+        if not inline:
+            _pending += 1
+            _stats['max_pending'] = max(_stats['max_pending'], _pending)
+    if inline:
+        return function(*args)
+    pool = _get_pool()
+    try:
+        return pool.submit(function, *args).result()
+    except BrokenProcessPool:
+        # Процесс пула погиб (например, убит OOM): следующая операция создаст новый пул
+        with _lock:
+            if _pool is pool:
+                _pool = None
+        raise
+    finally:
+        with _lock:
+            _pending -= 1
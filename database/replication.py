@@ -0,0 +1,185 @@
+import itertools
+import os
+import sqlite3
+import threading
+import time
+
+import sqlalchemy.orm as orm
+
+from database import engine_profile
+
+# Реплики открываются только на чтение, поэтому journal_mode не меняем:
+# режим (WAL) копируется вместе со страницами основной базы.
+REPLICA_PROFILE = {
+    'journal_mode': None,
+    'pool_size': 5,
+    'max_overflow': 10,
+}
+
+
+class Replica:
+    """Копия основной базы, доступная только на чтение."""
+
+    def __init__(self, db_file, profile=None):
+        self.db_file = db_file
+        self.generation = 0
+        self.synced_at = None
+        self.syncs = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last_error = None
+        self.refreshing = False
+        self.engine = None
+        self.factory = None
+        self._profile = dict(REPLICA_PROFILE)
+        self._profile.update(profile or {})
+
+    def open(self, session_class):
+        self.engine = engine_profile.create_engine(self.db_file, self._profile, read_only=True)
+        self.factory = orm.sessionmaker(bind=self.engine, class_=session_class)
+
+
+class Replicator:
+    """Поддерживает реплики в актуальном состоянии через online backup API SQLite.
+
+    Каждая фиксация транзакции на основной базе увеличивает номер поколения
+    (generation). Фоновый поток копирует основную базу в реплики, если они
+    отстали, и запоминает поколение, с которого началось копирование.
+
+    Копирование пишет в файл реплики, и соединения ее пула, читающие в это
+    время, мешают ему (SQLITE_BUSY). Поэтому на время копирования реплика не
+    выдается pick(), копирование ждет возврата выданных соединений (не
+    дольше drain_timeout секунд, иначе реплика ждет следующего раза), а пул
+    закрывается. Читатели в это время идут в основную базу.
+    """
+
+    def __init__(self, primary_file, replica_files, interval=1.0, profile=None, drain_timeout=1.0):
+        if not replica_files:
+            raise ValueError("Не указаны файлы реплик.")
+        self.primary_file = primary_file
+        self.replicas = [Replica(path, profile) for path in replica_files]
+        self.interval = interval
+        self.drain_timeout = drain_timeout
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._pending_since = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._round_robin = itertools.cycle(range(len(self.replicas)))
+
+    @property
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def note_commit(self):
+        """Вызывается после каждой фиксации на основной базе."""
+        with self._lock:
+            self._generation += 1
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            return self._generation
+
+    def sync_once(self, force=False):
+        target = self.generation
+        for replica in self.replicas:
+            if not force and replica.generation >= target:
+                continue
+            if not self._refresh(replica):
+                continue
+            replica.generation = target
+            replica.synced_at = time.monotonic()
+            replica.syncs += 1
+        with self._lock:
+            if all(replica.generation >= self._generation for replica in self.replicas):
+                self._pending_since = None
+
+    def _refresh(self, replica):
+        """Копирует основную базу в реплику без ее читателей; False - читатели не освободили реплику."""
+        replica.refreshing = True
+        try:
+            if replica.engine is not None:
+                deadline = time.monotonic() + self.drain_timeout
+                while replica.engine.pool.checkedout():
+                    if time.monotonic() >= deadline:
+                        replica.skipped += 1
+                        return False
+                    time.sleep(0.005)
+                replica.engine.dispose()
+            self._copy(replica.db_file)
+            return True
+        except sqlite3.Error as e:
+            replica.errors += 1
+            replica.last_error = str(e)
+            raise
+        finally:
+            replica.refreshing = False
+
+    def _copy(self, replica_file):
+        source = sqlite3.connect(self.primary_file, timeout=30)
+        target = sqlite3.connect(replica_file, timeout=30)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+
+    def start(self, session_class):
+        for replica in self.replicas:
+            directory = os.path.dirname(replica.db_file)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+        self.sync_once(force=True)
+        for replica in self.replicas:
+            replica.open(session_class)
+        self._thread = threading.Thread(target=self._run, name='db-replicator', daemon=True)
+        self._thread.start()
+        print(f"Запущена репликация в {len(self.replicas)} файл(а/ов), интервал {self.interval} с")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sync_once()
+            except sqlite3.Error as e:
+                print(f"Ошибка репликации: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        for replica in self.replicas:
+            if replica.engine is not None:
+                replica.engine.dispose()
+
+    def pick(self, min_generation=0):
+        """Реплика не старше min_generation или None, если все отстают."""
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._round_robin)]
+            if replica.factory is not None and not replica.refreshing and replica.generation >= min_generation:
+                return replica
+        return None
+
+    def stats(self):
+        generation = self.generation
+        now = time.monotonic()
+        with self._lock:
+            pending_since = self._pending_since
+        return {
+            'primary_generation': generation,
+            'replicas': [
+                {
+                    'file': replica.db_file,
+                    'generation': replica.generation,
+                    'lag_generations': generation - replica.generation,
+                    'lag_seconds': round(now - pending_since, 3)
+                    if pending_since is not None and replica.generation < generation else 0.0,
+                    'last_sync_age_seconds': round(now - replica.synced_at, 3) if replica.synced_at else None,
+                    'syncs': replica.syncs,
+                    'skipped': replica.skipped,
+                    'errors': replica.errors,
+                    'last_error': replica.last_error,
+                    'pool': replica.engine.pool.stats.snapshot() if replica.engine is not None else None,
+                }
+                for replica in self.replicas
+            ],
+        }
@@ -0,0 +1,67 @@
+"""Частые выборки моделей по ключу.
+
+Выражения собраны один раз на уровне модуля с bindparam вместо значений:
+SQLAlchemy запоминает ключ кеша у объекта выражения, поэтому повторный
+вызов не разбирает выражение заново, а сразу берет скомпилированный SQL из
+кеша движка. Session.get (и Query.get) строит SELECT и его ключ кеша при
+каждом промахе identity map, что на горячих путях заметно медленнее.
+Объект, уже загруженный в сессию, по-прежнему отдается из identity map.
+"""
+from sqlalchemy import bindparam, select
+
+from models.category import Category
+from models.departments import Department
+from models.jobs import Jobs
+from models.jobs_archive import ArchivedJob
+from models.users import User
+
+
+def _by_id(model):
+    return select(model).where(model.id == bindparam('id'))
+
+
+def _by_email(model):
+    return select(model).where(model.email == bindparam('email')).limit(1)
+
+
+_USER_BY_ID = _by_id(User)
+_JOB_BY_ID = _by_id(Jobs)
+_CATEGORY_BY_ID = _by_id(Category)
+_DEPARTMENT_BY_ID = _by_id(Department)
+_ARCHIVED_JOB_BY_ID = _by_id(ArchivedJob)
+_USER_BY_EMAIL = _by_email(User)
+_DEPARTMENT_BY_EMAIL = _by_email(Department)
+
+
+def _get(session, model, stmt, pk):
+    if (model, (pk,), None) in session.identity_map:
+        return session.get(model, pk)
+    return session.scalars(stmt, {'id': pk}).first()
+
+
+def get_user(session, user_id):
+    return _get(session, User, _USER_BY_ID, user_id)
+
+
+def get_job(session, job_id):
+    return _get(session, Jobs, _JOB_BY_ID, job_id)
+
+
+def get_archived_job(session, job_id):
+    return _get(session, ArchivedJob, _ARCHIVED_JOB_BY_ID, job_id)
+
+
+def get_category(session, category_id):
+    return _get(session, Category, _CATEGORY_BY_ID, category_id)
+
+
+def get_department(session, department_id):
+    return _get(session, Department, _DEPARTMENT_BY_ID, department_id)
+
+
+def get_user_by_email(session, email):
+    return session.scalars(_USER_BY_EMAIL, {'email': email}).first()
+
+
+def get_department_by_email(session, email):
+    return session.scalars(_DEPARTMENT_BY_EMAIL, {'email': email}).first()
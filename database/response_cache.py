@@ -0,0 +1,199 @@
+"""Кэш ответов GET-представлений в памяти процесса: LRU с TTL.
+
+Кэшируются представления, помеченные cached(таблицы...): ответ
+запоминается по пути и нормализованной строке запроса (а с per_user - еще
+и по текущему пользователю) и отдается из кэша до истечения TTL или до
+фиксации, которая записала в одну из его таблиц.
+
+После каждой фиксации удаляются записи с таблицами, которые она записала
+(database/table_writes.py). Записи мимо сессии (engine.begin(), другой
+процесс, триггеры в других таблицах) кэш не видит - их догоняет только TTL.
+
+Ответ, посчитанный во время фиксации в его таблицы, не сохраняется: на
+промахе запоминается поколение таблиц, и если к концу запроса оно сменилось,
+ответ отдается клиенту, но в кэш не попадает. В режиме реплик кэш выключен:
+после инвалидации ответ мог бы собраться на еще не догнавшей реплике.
+
+Настройки приложения:
+    RESPONSE_CACHE_SIZE - число записей (0 - кэш выключен)
+    RESPONSE_CACHE_TTL  - время жизни записи в секундах
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from urllib.parse import urlencode
+
+from flask import current_app, g, request
+from flask_login import current_user
+
+from database import db_session
+from database import metrics
+from database import table_writes
+from database.table_writes import ALL_TABLES
+
+DEFAULT_SIZE = 256
+DEFAULT_TTL = 30.0
+
+Entry = namedtuple('Entry', 'body status headers tables expires')
+
+
+class ResponseCache:
+    def __init__(self, size=DEFAULT_SIZE, ttl=DEFAULT_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys_by_table = {}
+        self._generations = {}
+        self._counters = dict.fromkeys(('hits', 'misses', 'evictions', 'expirations', 'invalidations'), 0)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= time.monotonic():
+                self._remove(key)
+                self._counters['expirations'] += 1
+                entry = None
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return entry
+
+    def generation(self, tables):
+        with self._lock:
+            return tuple(self._generations.get(table, 0) for table in (ALL_TABLES,) + tuple(tables))
+
+    def put(self, key, body, status, headers, tables, generation):
+        """Сохраняет ответ, если его таблицы не менялись с generation; вытесняет самые старые записи."""
+        with self._lock:
+            if generation != tuple(self._generations.get(table, 0) for table in (ALL_TABLES,) + tuple(tables)):
+                return False
+            self._remove(key)
+            self._entries[key] = Entry(body, status, headers, tables, time.monotonic() + self.ttl)
+            for table in tables:
+                self._keys_by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.size:
+                self._remove(next(iter(self._entries)))
+                self._counters['evictions'] += 1
+            return True
+
+    def invalidate(self, tables):
+        with self._lock:
+            if ALL_TABLES in tables:
+                tables = set(self._keys_by_table) | {ALL_TABLES}
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in list(self._keys_by_table.get(table, ())):
+                    self._remove(key)
+                    self._counters['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_table.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for table in entry.tables:
+            keys = self._keys_by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_table[table]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters, size=len(self._entries), capacity=self.size, ttl=self.ttl)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+        return stats
+
+
+_cache = None
+
+
+def get_cache():
+    return _cache
+
+
+def cached(*tables, per_user=False):
+    """Помечает представление (или класс ресурса flask_restful), ответы GET которого кэшируются.
+
+    tables - таблицы, из которых собран ответ; per_user - ответ зависит от
+    вошедшего пользователя (шаблоны с меню входа).
+    """
+
+    def decorate(view):
+        view.cache_tables = frozenset(tables)
+        view.cache_per_user = per_user
+        return view
+
+    return decorate
+
+
+def _cache_spec():
+    view = current_app.view_functions.get(request.endpoint)
+    for target in (view, getattr(view, 'view_class', None)):
+        if getattr(target, 'cache_tables', None):
+            return target.cache_tables, target.cache_per_user
+    return None, False
+
+
+def _key(per_user):
+    query = urlencode(sorted(request.args.items(multi=True)))
+    user = current_user.get_id() if per_user and current_user.is_authenticated else None
+    return request.path, query, user
+
+
+def init_app(app):
+    global _cache
+    app.config.setdefault('RESPONSE_CACHE_SIZE', DEFAULT_SIZE)
+    app.config.setdefault('RESPONSE_CACHE_TTL', DEFAULT_TTL)
+    _cache = ResponseCache(app.config['RESPONSE_CACHE_SIZE'], app.config['RESPONSE_CACHE_TTL'])
+    metrics.register('response_cache', _cache.stats)
+    table_writes.unsubscribe(_invalidate)
+    table_writes.subscribe(_invalidate)
+    app.before_request(_lookup)
+    app.after_request(_store)
+
+
+def _invalidate(tables):
+    if _cache is not None:
+        _cache.invalidate(tables)
+
+
+def _enabled():
+    return _cache is not None and _cache.size > 0 and db_session.get_replicator() is None
+
+
+def _lookup():
+    if request.method != 'GET' or not _enabled():
+        return None
+    tables, per_user = _cache_spec()
+    if not tables:
+        return None
+    key = _key(per_user)
+    entry = _cache.get(key)
+    if entry is None:
+        g.response_cache = (key, tables, _cache.generation(tables))
+        return None
+    response = current_app.response_class(entry.body, status=entry.status, headers=entry.headers)
+    response.headers['X-Cache'] = 'HIT'
+    return response.make_conditional(request.environ)
+
+
+def _store(response):
+    pending = g.pop('response_cache', None)
+    if pending is None:
+        return response
+    key, tables, generation = pending
+    if response.status_code == 200 and not response.is_streamed:
+        headers = [(name, value) for name, value in response.headers
+                   if name.lower() != 'set-cookie' and not name.startswith('X-DB-')]
+        _cache.put(key, response.get_data(), response.status_code, headers, tables, generation)
+    response.headers['X-Cache'] = 'MISS'
+    return response
@@ -0,0 +1,139 @@
+"""Полнотекстовый поиск по работам и колонистам на SQLite FTS5.
+
+jobs_fts (rowid = jobs.id): название работы и названия ее категорий.
+users_fts (rowid = users.id): фамилия, имя, специальность и должность.
+Индексы обновляются триггерами на jobs, association, categories и users,
+поэтому остаются верными при записи через ORM, Core и напрямую в SQL.
+Перенесенные в архив работы из индекса выпадают вместе со строкой jobs.
+"""
+import html
+import re
+
+from sqlalchemy import text
+
+TOKENIZE = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+TABLES = {
+    'jobs_fts': f'CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(job, categories, {TOKENIZE})',
+    'users_fts': f'CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(surname, name, speciality, position, '
+                 f'{TOKENIZE})',
+}
+
+_CATEGORIES = ("(SELECT group_concat(c.name, ' ') FROM association a JOIN categories c ON c.id = a.category "
+               "WHERE a.jobs = {job_id})")
+
+TRIGGERS = {
+    'search_jobs_insert': f"""
+CREATE TRIGGER search_jobs_insert AFTER INSERT ON jobs BEGIN
+    INSERT INTO jobs_fts (rowid, job, categories) VALUES (NEW.id, NEW.job, {_CATEGORIES.format(job_id='NEW.id')});
+END""",
+    'search_jobs_update': """
+CREATE TRIGGER search_jobs_update AFTER UPDATE OF job ON jobs BEGIN
+    UPDATE jobs_fts SET job = NEW.job WHERE rowid = NEW.id;
+END""",
+    'search_jobs_delete': """
+CREATE TRIGGER search_jobs_delete AFTER DELETE ON jobs BEGIN
+    DELETE FROM jobs_fts WHERE rowid = OLD.id;
+END""",
+    'search_association_insert': f"""
+CREATE TRIGGER search_association_insert AFTER INSERT ON association BEGIN
+    UPDATE jobs_fts SET categories = {_CATEGORIES.format(job_id='NEW.jobs')} WHERE rowid = NEW.jobs;
+END""",
+    'search_association_delete': f"""
+CREATE TRIGGER search_association_delete AFTER DELETE ON association BEGIN
+    UPDATE jobs_fts SET categories = {_CATEGORIES.format(job_id='OLD.jobs')} WHERE rowid = OLD.jobs;
+END""",
+    'search_categories_update': f"""
+CREATE TRIGGER search_categories_update AFTER UPDATE OF name ON categories BEGIN
+    UPDATE jobs_fts SET categories = {_CATEGORIES.format(job_id='jobs_fts.rowid')}
+    WHERE rowid IN (SELECT jobs FROM association WHERE category = NEW.id);
+END""",
+    'search_users_insert': """
+CREATE TRIGGER search_users_insert AFTER INSERT ON users BEGIN
+    INSERT INTO users_fts (rowid, surname, name, speciality, position)
+    VALUES (NEW.id, NEW.surname, NEW.name, NEW.speciality, NEW.position);
+END""",
+    'search_users_update': """
+CREATE TRIGGER search_users_update AFTER UPDATE OF surname, name, speciality, position ON users BEGIN
+    UPDATE users_fts SET surname = NEW.surname, name = NEW.name, speciality = NEW.speciality,
+        position = NEW.position WHERE rowid = NEW.id;
+END""",
+    'search_users_delete': """
+CREATE TRIGGER search_users_delete AFTER DELETE ON users BEGIN
+    DELETE FROM users_fts WHERE rowid = OLD.id;
+END""",
+}
+
+# Границы подсветки: управляющие символы не встречаются в данных, поэтому
+# сниппет можно экранировать целиком и только потом вставить <mark>
+_OPEN, _CLOSE = '\x02', '\x03'
+
+JOBS_SQL = """
+SELECT j.id, j.job, j.team_leader, j.is_finished,
+       snippet(jobs_fts, -1, char(2), char(3), '…', 12) AS snippet,
+       bm25(jobs_fts, 4.0, 1.0) AS score
+FROM jobs_fts JOIN jobs j ON j.id = jobs_fts.rowid
+WHERE jobs_fts MATCH :query
+ORDER BY score, j.id
+LIMIT :limit OFFSET :offset"""
+
+USERS_SQL = """
+SELECT u.id, u.surname, u.name, u.speciality, u.position,
+       snippet(users_fts, -1, char(2), char(3), '…', 12) AS snippet,
+       bm25(users_fts, 4.0, 4.0, 1.0, 1.0) AS score
+FROM users_fts JOIN users u ON u.id = users_fts.rowid
+WHERE users_fts MATCH :query
+ORDER BY score, u.id
+LIMIT :limit OFFSET :offset"""
+
+
+def install(connection):
+    for ddl in TABLES.values():
+        connection.exec_driver_sql(ddl)
+    for name, ddl in TRIGGERS.items():
+        connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS {name}')
+        connection.exec_driver_sql(ddl)
+
+
+def rebuild(connection):
+    """Заполняет индексы заново из jobs, categories и users."""
+    connection.exec_driver_sql('DELETE FROM jobs_fts')
+    connection.exec_driver_sql(f'INSERT INTO jobs_fts (rowid, job, categories) '
+                               f'SELECT j.id, j.job, {_CATEGORIES.format(job_id="j.id")} FROM jobs j')
+    connection.exec_driver_sql('DELETE FROM users_fts')
+    connection.exec_driver_sql('INSERT INTO users_fts (rowid, surname, name, speciality, position) '
+                               'SELECT id, surname, name, speciality, position FROM users')
+    for table in TABLES:
+        connection.exec_driver_sql(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+
+
+def match_query(query):
+    """'инж  Марс!' -> '"инж"* "марс"*': каждое слово как префикс, все слова обязательны.
+
+    Операторы FTS5 из пользовательского ввода не проходят, поэтому ошибки
+    синтаксиса MATCH невозможны. None, если в запросе нет ни одного слова.
+    """
+    words = re.findall(r'\w+', query or '')
+    if not words:
+        return None
+    return ' '.join(f'"{word.lower()}"*' for word in words)
+
+
+def highlight(snippet):
+    return html.escape(snippet or '').replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>')
+
+
+def _search(session, table, sql, query, limit, offset):
+    total = session.execute(text(f'SELECT count(*) FROM {table} WHERE {table} MATCH :query'),
+                            {'query': query}).scalar()
+    rows = session.execute(text(sql), {'query': query, 'limit': limit, 'offset': offset}).mappings().all()
+    return total, rows
+
+
+def search_jobs(session, query, limit, offset=0):
+    """(всего найдено, строки страницы) по релевантности; query - результат match_query."""
+    return _search(session, 'jobs_fts', JOBS_SQL, query, limit, offset)
+
+
+def search_users(session, query, limit, offset=0):
+    return _search(session, 'users_fts', USERS_SQL, query, limit, offset)
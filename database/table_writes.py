@@ -0,0 +1,89 @@
+"""Таблицы, записанные транзакцией сессии, и подписчики на их фиксацию.
+
+Записанные таблицы собираются по каждой сессии SQLAlchemy: из объектов
+flush (включая таблицы связей многие-ко-многим с изменившейся историей) и
+из DML-выражений session.execute(). После фиксации каждый подписчик
+(subscribe) получает множество этих таблиц; откат его сбрасывает. Записи
+мимо сессии (engine.begin(), другой процесс, триггеры в других таблицах)
+здесь не видны.
+"""
+import re
+import threading
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, attributes
+from sqlalchemy.sql.elements import TextClause
+
+# Все таблицы: SQL-текст, по которому таблицу не определить
+ALL_TABLES = '*'
+
+_DML_TABLE = re.compile(r'^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)'
+                        r'\s+["`\[]?(\w+)', re.IGNORECASE)
+
+_subscribers = []
+_lock = threading.Lock()
+
+
+def subscribe(callback):
+    """callback(tables) вызывается после каждой фиксации, записавшей таблицы."""
+    with _lock:
+        _subscribers.append(callback)
+
+
+def unsubscribe(callback):
+    with _lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+
+def written_tables(session):
+    return session.info.setdefault('written_tables', set())
+
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session, flush_context):
+    tables = written_tables(session)
+    for obj in set(session.new) | set(session.dirty) | set(session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        mapper = inspect(obj).mapper
+        tables.update(table.name for table in mapper.tables)
+        for relationship in mapper.relationships:
+            if relationship.secondary is not None and \
+                    attributes.get_history(obj, relationship.key, attributes.PASSIVE_NO_INITIALIZE).has_changes():
+                tables.add(relationship.secondary.name)
+
+
+def statement_table(state):
+    """Таблица, в которую пишет выражение session.execute() (ALL_TABLES - не определить), или None."""
+    statement = state.statement
+    if state.is_insert or state.is_update or state.is_delete:
+        return getattr(getattr(statement, 'table', None), 'name', ALL_TABLES)
+    if isinstance(statement, TextClause):
+        match = _DML_TABLE.match(statement.text)
+        if match:
+            return match.group(1).lower()
+    return None
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _do_orm_execute(state):
+    table = statement_table(state)
+    if table is not None:
+        written_tables(state.session).add(table)
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    tables = session.info.pop('written_tables', None)
+    if not tables:
+        return
+    with _lock:
+        subscribers = list(_subscribers)
+    for callback in subscribers:
+        callback(tables)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('written_tables', None)
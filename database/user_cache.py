@@ -0,0 +1,180 @@
+"""Вошедший пользователь для Flask-Login из кэша в памяти процесса: LRU с TTL.
+
+load_user вызывается на каждом запросе с cookie сессии. Вместо объекта User
+целиком кэшируется небольшой AuthenticatedUser - то, что читают шаблоны и
+представления (id, имя, фамилия, email). Промах читает эти столбцы одним
+запросом по первичному ключу.
+
+Запись пользователя удаляется после фиксации, которая изменила или удалила
+его через сессию (users_api.edit_user, UsersResource.put/delete, async API,
+поток-писатель). Выражение session.execute() по таблице users сбрасывает
+весь кэш. Записи мимо сессии (engine.begin(), другой процесс) кэш не видит -
+их догоняет только TTL. Как и кэш ответов, в режиме реплик кэш выключен.
+
+Настройки приложения:
+    USER_CACHE_SIZE - число пользователей (0 - кэш выключен)
+    USER_CACHE_TTL  - время жизни записи в секундах
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+from sqlalchemy import bindparam, event, inspect, select
+from sqlalchemy.orm import Session
+
+from database import db_session
+from database import metrics
+from database import table_writes
+from models.users import User
+
+DEFAULT_SIZE = 1024
+DEFAULT_TTL = 60.0
+
+# Все пользователи: запись в users, по которой не понять, чья строка изменилась
+ALL_USERS = '*'
+
+_USER_BY_ID = select(User.id, User.name, User.surname, User.email).where(User.id == bindparam('user_id'))
+
+
+class AuthenticatedUser(UserMixin):
+    """Данные вошедшего пользователя, нужные шаблонам и представлениям."""
+
+    def __init__(self, id, name, surname, email):
+        self.id = id
+        self.name = name
+        self.surname = surname
+        self.email = email
+
+    def __repr__(self):
+        return f'<AuthenticatedUser> {self.id} {self.email}'
+
+
+class UserCache:
+    def __init__(self, size=DEFAULT_SIZE, ttl=DEFAULT_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # номер сброса: пользователь, прочитанный до фиксации его изменения, после нее не сохраняется
+        self._generation = 0
+        self._counters = dict.fromkeys(('hits', 'misses', 'evictions', 'expirations', 'invalidations'), 0)
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._entries[user_id]
+                self._counters['expirations'] += 1
+                entry = None
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._counters['hits'] += 1
+            return entry[0]
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def put(self, user_id, user, generation):
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._entries[user_id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+            return True
+
+    def invalidate(self, user_ids):
+        with self._lock:
+            self._generation += 1
+            if ALL_USERS in user_ids:
+                user_ids = list(self._entries)
+            for user_id in user_ids:
+                if self._entries.pop(user_id, None) is not None:
+                    self._counters['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters, size=len(self._entries), capacity=self.size, ttl=self.ttl)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+        return stats
+
+
+_cache = None
+
+
+def get_cache():
+    return _cache
+
+
+def init_app(app):
+    global _cache
+    app.config.setdefault('USER_CACHE_SIZE', DEFAULT_SIZE)
+    app.config.setdefault('USER_CACHE_TTL', DEFAULT_TTL)
+    _cache = UserCache(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+    metrics.register('user_cache', _cache.stats)
+
+
+def _enabled():
+    return _cache is not None and _cache.size > 0 and db_session.get_replicator() is None
+
+
+def _read(user_id):
+    row = db_session.create_session().execute(_USER_BY_ID, {'user_id': user_id}).first()
+    return AuthenticatedUser(*row) if row is not None else None
+
+
+def load(user_id):
+    """AuthenticatedUser по ID из кэша, при промахе - из базы; None, если пользователя нет."""
+    if not _enabled():
+        return _read(user_id)
+    user = _cache.get(user_id)
+    if user is not None:
+        return user
+    generation = _cache.generation()
+    user = _read(user_id)
+    if user is not None:
+        _cache.put(user_id, user, generation)
+    return user
+
+
+def _written_users(session):
+    return session.info.setdefault('written_users', set())
+
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session, flush_context):
+    for obj in set(session.dirty) | set(session.deleted):
+        if isinstance(obj, User) and (obj in session.deleted or session.is_modified(obj)):
+            identity = inspect(obj).identity
+            if identity is not None:
+                _written_users(session).add(identity[0])
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _do_orm_execute(state):
+    if table_writes.statement_table(state) in (User.__tablename__, table_writes.ALL_TABLES):
+        _written_users(state.session).add(ALL_USERS)
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    user_ids = session.info.pop('written_users', None)
+    if user_ids and _cache is not None:
+        _cache.invalidate(user_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('written_users', None)
@@ -0,0 +1,103 @@
+"""Версии строк users, jobs и departments для условных GET (api/conditional.py).
+
+При каждом изменении строки триггеры SQLite выдают ей следующий номер из
+счетчика таблицы (row_versions, models/versions.py) и ставят modified_date.
+Изменением считаются и изменения связей, видимых в ответе API: категорий
+работы (association, переименование категории) и состава департамента
+(department_members). Триггеры срабатывают при любой записи: через ORM,
+Core (queries/bulk_load.py) или напрямую в SQL.
+
+Номера растут по всей таблице и не переиспользуются. Удаление строки
+тоже берет номер и запоминает его в row_versions.deleted. Поэтому тройка
+(число строк, max(version), deleted) любого подмножества строк меняется
+при любом изменении в нем: добавленная или измененная строка поднимает
+максимум, ушедшая из подмножества уменьшает число строк, а вернуть их
+прежними может только новая строка с большей версией. Удаление в любом
+месте таблицы меняет deleted: после удаления строки с наибольшей версией
+пара сама вернулась бы к прежнему значению.
+"""
+from sqlalchemy import func, select
+
+from models.versions import row_versions_table
+
+TABLES = ('users', 'jobs', 'departments')
+
+_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+
+
+def _bump(table, condition, modified=_NOW):
+    return f"""
+    UPDATE row_versions SET version = version + 1 WHERE table_name = '{table}';
+    UPDATE {table} SET version = (SELECT version FROM row_versions WHERE table_name = '{table}'),
+        modified_date = {modified}
+    WHERE {condition};"""
+
+
+TRIGGERS = {}
+for _table in TABLES:
+    TRIGGERS[f'versioning_{_table}_insert'] = f"""
+CREATE TRIGGER versioning_{_table}_insert AFTER INSERT ON {_table} BEGIN
+    {_bump(_table, 'id = NEW.id', f'coalesce(NEW.modified_date, {_NOW})')}
+END"""
+    TRIGGERS[f'versioning_{_table}_delete'] = f"""
+CREATE TRIGGER versioning_{_table}_delete AFTER DELETE ON {_table} BEGIN
+    UPDATE row_versions SET version = version + 1, deleted = version + 1 WHERE table_name = '{_table}';
+END"""
+    # Собственный UPDATE триггера меняет version и потому его не запускает
+    TRIGGERS[f'versioning_{_table}_update'] = f"""
+CREATE TRIGGER versioning_{_table}_update AFTER UPDATE ON {_table} WHEN NEW.version IS OLD.version BEGIN
+    {_bump(_table, 'id = NEW.id')}
+END"""
+TRIGGERS.update({
+    'versioning_association_insert': f"""
+CREATE TRIGGER versioning_association_insert AFTER INSERT ON association BEGIN
+    {_bump('jobs', 'id = NEW.jobs')}
+END""",
+    'versioning_association_delete': f"""
+CREATE TRIGGER versioning_association_delete AFTER DELETE ON association BEGIN
+    {_bump('jobs', 'id = OLD.jobs')}
+END""",
+    'versioning_categories_update': f"""
+CREATE TRIGGER versioning_categories_update AFTER UPDATE OF name ON categories BEGIN
+    {_bump('jobs', 'id IN (SELECT jobs FROM association WHERE category = NEW.id)')}
+END""",
+    'versioning_department_members_insert': f"""
+CREATE TRIGGER versioning_department_members_insert AFTER INSERT ON department_members BEGIN
+    {_bump('departments', 'id = NEW.department_id')}
+END""",
+    'versioning_department_members_delete': f"""
+CREATE TRIGGER versioning_department_members_delete AFTER DELETE ON department_members BEGIN
+    {_bump('departments', 'id = OLD.department_id')}
+END""",
+})
+
+
+def install_triggers(connection):
+    for name, ddl in TRIGGERS.items():
+        connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS {name}')
+        connection.exec_driver_sql(ddl)
+
+
+def init_counters(connection):
+    """Счетчики row_versions не меньше уже выданных версий."""
+    for table in TABLES:
+        connection.exec_driver_sql(
+            f"INSERT INTO row_versions (table_name, version) SELECT '{table}', coalesce(max(version), 0) FROM {table} "
+            "WHERE true ON CONFLICT (table_name) DO UPDATE SET version = max(version, excluded.version)")
+
+
+def collection_versions(session, statements):
+    """[(число строк, max(version), deleted), ...] выборок [(модель, select), ...] одним запросом.
+
+    Фильтры выборок сохраняются. У архивных работ версий нет, они не
+    меняются и не удаляются: вместо max(version) берется max(id), deleted - 0.
+    """
+    columns = []
+    for model, statement in statements:
+        version = getattr(model, 'version', model.id)
+        for aggregate in (func.count(model.id), func.max(version)):
+            columns.append(statement.with_only_columns(aggregate, maintain_column_froms=True).scalar_subquery())
+        deleted = select(row_versions_table.c.deleted).where(row_versions_table.c.table_name == model.__tablename__)
+        columns.append(func.coalesce(deleted.scalar_subquery(), 0))
+    values = session.execute(select(*columns)).one()
+    return [tuple(values[i:i + 3]) for i in range(0, len(values), 3)]
@@ -0,0 +1,259 @@
+"""Запись в SQLite: групповая фиксация через один поток-писатель и повтор при блокировке.
+
+SQLite допускает только одного писателя. Вместо того чтобы каждый запрос
+открывал свою транзакцию и ждал блокировку, небольшие единицы записи
+(функции вида unit(session, *args)) можно отправлять в очередь: поток-писатель
+берет из нее сразу несколько единиц, выполняет каждую в своей точке
+сохранения (SAVEPOINT) и фиксирует всю пачку одной транзакцией. Ошибка
+единицы откатывает только ее точку сохранения и возвращается вызвавшему
+запросу; остальные единицы пачки фиксируются.
+
+Без очереди perform() выполняет единицу в сессии запроса и повторяет
+транзакцию со случайной экспоненциальной задержкой, если база заблокирована.
+
+Настройки приложения:
+    DB_WRITE_QUEUE           - включить поток-писатель (по умолчанию выключен)
+    DB_WRITE_QUEUE_MAX_BATCH - максимум единиц в одной транзакции
+    DB_WRITE_QUEUE_MAX_DELAY - сколько писатель ждет добора пачки, с
+    DB_LOCK_RETRIES          - число попыток при "database is locked"
+"""
+import itertools
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+from flask import current_app, has_app_context
+from sqlalchemy.exc import OperationalError
+
+from database import db_session
+from database import metrics
+
+MAX_BATCH = 64
+MAX_DELAY = 0.002
+LOCK_RETRIES = 5
+BACKOFF_BASE = 0.01
+BACKOFF_MAX = 0.5
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def is_locked_error(error):
+    return isinstance(error, OperationalError) and 'database is locked' in str(error.orig or error)
+
+
+def backoff(attempt):
+    """Задержка перед попыткой attempt + 1: экспонента с полным случайным разбросом."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def begin_immediate(session):
+    """Сразу берет блокировку на запись, если транзакция SQLite еще не начата.
+
+    Иначе чтение в начале транзакции откладывает блокировку до первой записи,
+    а повышение блокировки при конкуренции завершается "database is locked"
+    без ожидания busy_timeout. Кроме того, внешний SAVEPOINT без открытой
+    транзакции в pysqlite фиксировался бы сам по себе при RELEASE.
+    """
+    connection = session.connection()
+    if not connection.connection.driver_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+class WriteStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.units = 0
+        self.failed_units = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.lock_retries = 0
+
+    def add(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def batch(self, size):
+        with self._lock:
+            self.batches += 1
+            self.units += size
+            self.max_batch = max(self.max_batch, size)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'queue_enabled': _writer is not None,
+                'units': self.units,
+                'failed_units': self.failed_units,
+                'batches': self.batches,
+                'avg_batch': round(self.units / self.batches, 2) if self.batches else 0,
+                'max_batch': self.max_batch,
+                'lock_retries': self.lock_retries,
+            }
+
+
+stats = WriteStats()
+metrics.register('writes', stats.snapshot)
+
+
+class Writer:
+    """Поток, который выполняет единицы записи пачками в одной транзакции."""
+
+    def __init__(self, session_factory, max_batch=MAX_BATCH, max_delay=MAX_DELAY, retries=LOCK_RETRIES):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.retries = retries
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, unit, *args):
+        future = Future()
+        self._queue.put((unit, args, future))
+        return future
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if batch:
+                self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        for attempt in itertools.count(1):
+            session = self.session_factory()
+            try:
+                begin_immediate(session)
+                outcomes = []
+                for unit, args, _ in batch:
+                    try:
+                        with session.begin_nested():
+                            outcomes.append((True, unit(session, *args)))
+                    except Exception as e:
+                        if is_locked_error(e):
+                            raise
+                        outcomes.append((False, e))
+                session.commit()
+                break
+            except Exception as e:
+                session.rollback()
+                if is_locked_error(e) and attempt < self.retries:
+                    stats.add(lock_retries=1)
+                    time.sleep(backoff(attempt))
+                    continue
+                for _, _, future in batch:
+                    future.set_exception(e)
+                return
+            finally:
+                generation = session.info.get('write_generation')
+                session.close()
+
+        stats.batch(len(batch))
+        for (_, _, future), (ok, value) in zip(batch, outcomes):
+            if ok:
+                future.set_result((value, generation))
+            else:
+                stats.add(failed_units=1)
+                future.set_exception(value)
+
+
+def init_app(app):
+    app.config.setdefault('DB_WRITE_QUEUE', False)
+    app.config.setdefault('DB_WRITE_QUEUE_MAX_BATCH', MAX_BATCH)
+    app.config.setdefault('DB_WRITE_QUEUE_MAX_DELAY', MAX_DELAY)
+    app.config.setdefault('DB_LOCK_RETRIES', LOCK_RETRIES)
+
+
+def get_writer():
+    """Поток-писатель, если очередь включена в настройках текущего приложения."""
+    global _writer
+    if not has_app_context() or not current_app.config.get('DB_WRITE_QUEUE'):
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                config = current_app.config
+                _writer = Writer(db_session.new_session, config['DB_WRITE_QUEUE_MAX_BATCH'],
+                                 config['DB_WRITE_QUEUE_MAX_DELAY'], config['DB_LOCK_RETRIES'])
+    return _writer
+
+
+def stop_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.stop()
+            _writer = None
+
+
+def run_with_retry(session, unit, *args, retries=LOCK_RETRIES):
+    """Выполняет и фиксирует unit(session, *args), повторяя транзакцию при блокировке базы."""
+    for attempt in itertools.count(1):
+        try:
+            begin_immediate(session)
+            result = unit(session, *args)
+            session.commit()
+            return result
+        except OperationalError as e:
+            session.rollback()
+            if not is_locked_error(e) or attempt >= retries:
+                raise
+            stats.add(lock_retries=1)
+            time.sleep(backoff(attempt))
+        except Exception:
+            session.rollback()
+            raise
+
+
+def commit(unit, *args):
+    """Выполняет unit(session, *args) в сессии запроса и фиксирует, повторяя при блокировке базы.
+
+    Для записей мимо очереди (API v1, формы), которым после фиксации нужны
+    ORM-объекты. При повторе единица выполняется заново после отката, поэтому
+    объекты она берет из сессии сама, а не из переменных представления.
+    """
+    retries = current_app.config.get('DB_LOCK_RETRIES', LOCK_RETRIES) if has_app_context() else LOCK_RETRIES
+    result = run_with_retry(db_session.create_session(), unit, *args, retries=retries)
+    stats.batch(1)
+    return result
+
+
+def perform(unit, *args):
+    """Выполняет единицу записи unit(session, *args) и возвращает ее результат.
+
+    Единица не фиксирует транзакцию сама и возвращает готовые данные (не
+    ORM-объекты): в режиме очереди ее сессия закрывается в потоке-писателе.
+    """
+    writer = get_writer()
+    if writer is None:
+        return commit(unit, *args)
+    result, generation = writer.submit(unit, *args).result()
+    db_session.note_write_generation(generation)
+    return result
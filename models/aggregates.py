@@ -0,0 +1,32 @@
+import sqlalchemy
+from database.db_session import SqlAlchemyBase
+
+# Агрегаты, которые поддерживают триггеры SQLite (database/aggregates.py).
+# Пишут в них только триггеры и пересчет; приложение их только читает.
+
+# query6: размер команды работы - число участников (job_collaborators)
+job_team_sizes_table = sqlalchemy.Table(
+    'job_team_sizes',
+    SqlAlchemyBase.metadata,
+    sqlalchemy.Column('job_id', sqlalchemy.Integer, sqlalchemy.ForeignKey('jobs.id'), primary_key=True),
+    sqlalchemy.Column('size', sqlalchemy.Integer, nullable=False, server_default='0'),
+    sqlalchemy.Index('ix_job_team_sizes_size', 'size')
+)
+
+# query_again: часы пользователя - work_size работ, где он руководитель, плюс работ, где участник
+user_hours_table = sqlalchemy.Table(
+    'user_hours',
+    SqlAlchemyBase.metadata,
+    sqlalchemy.Column('user_id', sqlalchemy.Integer, sqlalchemy.ForeignKey('users.id'), primary_key=True),
+    sqlalchemy.Column('hours', sqlalchemy.Integer, nullable=False, server_default='0'),
+    sqlalchemy.Index('ix_user_hours_hours', 'hours')
+)
+
+# Часы департамента - сумма user_hours его участников и руководителя (каждый учитывается один раз)
+department_hours_table = sqlalchemy.Table(
+    'department_hours',
+    SqlAlchemyBase.metadata,
+    sqlalchemy.Column('department_id', sqlalchemy.Integer, sqlalchemy.ForeignKey('departments.id'),
+                      primary_key=True),
+    sqlalchemy.Column('hours', sqlalchemy.Integer, nullable=False, server_default='0')
+)
@@ -5,9 +5,10 @@ association_table = sqlalchemy.Table(
     'association',
     SqlAlchemyBase.metadata,
     sqlalchemy.Column('jobs', sqlalchemy.Integer,
-                      sqlalchemy.ForeignKey('jobs.id')),
+                      sqlalchemy.ForeignKey('jobs.id'), primary_key=True),
     sqlalchemy.Column('category', sqlalchemy.Integer,
-                      sqlalchemy.ForeignKey('categories.id'))
+                      sqlalchemy.ForeignKey('categories.id'), primary_key=True),
+    sqlalchemy.Index('ix_association_category', 'category')
 )
 
 
@@ -19,3 +20,23 @@ class Category(SqlAlchemyBase):
 
     def __repr__(self):
         return f'<Category> {self.id} {self.name}'
+
+
+def set_categories(session, categories_by_job):
+    """Приводит категории работ к {ID работы: [ID категорий]}, вставляя и удаляя
+    только изменившиеся строки association. Возвращает (добавленные, удаленные)
+    пары (работа, категория)."""
+    links = association_table.c
+    current = set(session.execute(sqlalchemy.select(links.jobs, links.category).where(
+        links.jobs.in_(list(categories_by_job)))).all())
+    wanted = {(job_id, category_id) for job_id, category_ids in categories_by_job.items()
+              for category_id in category_ids}
+    added, removed = wanted - current, current - wanted
+    if removed:
+        session.execute(association_table.delete().where(
+            links.jobs == sqlalchemy.bindparam('job_id'), links.category == sqlalchemy.bindparam('category_id')),
+            [{'job_id': job_id, 'category_id': category_id} for job_id, category_id in sorted(removed)])
+    if added:
+        session.execute(association_table.insert(),
+                        [{'jobs': job_id, 'category': category_id} for job_id, category_id in sorted(added)])
+    return added, removed
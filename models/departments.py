@@ -1,6 +1,18 @@
+import datetime
 import sqlalchemy
 from sqlalchemy import orm
 from database.db_session import SqlAlchemyBase
+from .jobs import parse_collaborator_ids
+
+department_members_table = sqlalchemy.Table(
+    'department_members',
+    SqlAlchemyBase.metadata,
+    sqlalchemy.Column('department_id', sqlalchemy.Integer,
+                      sqlalchemy.ForeignKey('departments.id'), primary_key=True),
+    sqlalchemy.Column('user_id', sqlalchemy.Integer,
+                      sqlalchemy.ForeignKey('users.id'), primary_key=True),
+    sqlalchemy.Index('ix_department_members_user_id', 'user_id')
+)
 
 
 class Department(SqlAlchemyBase):
@@ -8,11 +20,54 @@ class Department(SqlAlchemyBase):
 
     id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=True)
     title = sqlalchemy.Column(sqlalchemy.String, nullable=True)
-    chief = sqlalchemy.Column(sqlalchemy.Integer, sqlalchemy.ForeignKey("users.id"))
+    chief = sqlalchemy.Column(sqlalchemy.Integer, sqlalchemy.ForeignKey("users.id"), index=True)
+    # Устаревшее поле: перенесено в department_members (миграция 3) и больше не пишется
     members = sqlalchemy.Column(sqlalchemy.String, nullable=True)
     email = sqlalchemy.Column(sqlalchemy.String, unique=True, nullable=True)
+    modified_date = sqlalchemy.Column(sqlalchemy.DateTime, default=datetime.datetime.now,
+                                      server_onupdate=sqlalchemy.FetchedValue())
+    # Номер последнего изменения строки и его время ставят триггеры (database/versioning.py)
+    version = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, server_default='0',
+                                server_onupdate=sqlalchemy.FetchedValue())
 
     chief_user = orm.relationship('User')
+    member_users = orm.relationship('User', secondary=department_members_table,
+                                    order_by='User.id', viewonly=True)
+
+    __mapper_args__ = {'eager_defaults': False}
 
     def __repr__(self):
         return f'<Department> {self.id} {self.title} chief:{self.chief}'
+
+
+def parse_member_ids(members):
+    """ID участников из строки формы "1, 2, 3" - в том же формате, что jobs.collaborators."""
+    return parse_collaborator_ids(members)
+
+
+def get_member_ids(session, department_id):
+    return {user_id for (user_id,) in session.execute(
+        sqlalchemy.select(department_members_table.c.user_id).where(
+            department_members_table.c.department_id == department_id))}
+
+
+def set_members(session, department_id, member_ids):
+    """Приводит состав департамента к member_ids, вставляя и удаляя только
+    изменившиеся строки. Возвращает (добавленные, удаленные) ID."""
+    current = get_member_ids(session, department_id)
+    wanted = set(member_ids)
+    added, removed = wanted - current, current - wanted
+    if removed:
+        session.execute(department_members_table.delete().where(
+            department_members_table.c.department_id == department_id,
+            department_members_table.c.user_id.in_(removed)))
+    if added:
+        session.execute(department_members_table.insert(),
+                        [{'department_id': department_id, 'user_id': user_id} for user_id in sorted(added)])
+    return added, removed
+
+
+@sqlalchemy.event.listens_for(Department, 'after_delete')
+def _members_after_delete(mapper, connection, target):
+    connection.execute(department_members_table.delete().where(
+        department_members_table.c.department_id == target.id))
@@ -4,25 +4,90 @@ from sqlalchemy import orm
 from database.db_session import SqlAlchemyBase
 from .category import association_table
 
+# Нормализованный список участников работы. Строка Jobs.collaborators остается
+# источником для API и форм, таблица синхронизируется с ней при каждой записи.
+job_collaborators_table = sqlalchemy.Table(
+    'job_collaborators',
+    SqlAlchemyBase.metadata,
+    sqlalchemy.Column('job_id', sqlalchemy.Integer,
+                      sqlalchemy.ForeignKey('jobs.id'), primary_key=True),
+    sqlalchemy.Column('user_id', sqlalchemy.Integer,
+                      sqlalchemy.ForeignKey('users.id'), primary_key=True),
+    sqlalchemy.Index('ix_job_collaborators_user_id', 'user_id')
+)
+
+
+def parse_collaborator_ids(collaborators):
+    """'2, 3,,x, 3' -> [2, 3]: уникальные целые ID в порядке появления."""
+    ids = []
+    for item in (collaborators or '').split(','):
+        item = item.strip()
+        if item.isdigit() and int(item) not in ids:
+            ids.append(int(item))
+    return ids
+
 
 class Jobs(SqlAlchemyBase):
     __tablename__ = 'jobs'
+    __table_args__ = (
+        # query5: незавершенные работы с фильтром по объему
+        sqlalchemy.Index('ix_jobs_unfinished_work_size', 'work_size', sqlite_where=sqlalchemy.text('is_finished = 0')),
+        # Сортировки keyset-пагинации (database/pagination.py); rowid входит в индекс неявно
+        sqlalchemy.Index('ix_jobs_start_date', 'start_date'),
+        sqlalchemy.Index('ix_jobs_work_size', 'work_size'),
+        # ID не переиспользуются после удаления: архив (jobs_archive) хранит старые ID
+        {'sqlite_autoincrement': True},
+    )
+
     id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=True)
-    team_leader = sqlalchemy.Column(sqlalchemy.Integer, sqlalchemy.ForeignKey("users.id"))
+    team_leader = sqlalchemy.Column(sqlalchemy.Integer, sqlalchemy.ForeignKey("users.id"), index=True)
     job = sqlalchemy.Column(sqlalchemy.String, nullable=True)
     work_size = sqlalchemy.Column(sqlalchemy.Integer, nullable=True)
     collaborators = sqlalchemy.Column(sqlalchemy.String, nullable=True)
     start_date = sqlalchemy.Column(sqlalchemy.DateTime, nullable=True, default=datetime.datetime.now)
     end_date = sqlalchemy.Column(sqlalchemy.DateTime, nullable=True)
-    is_finished = sqlalchemy.Column(sqlalchemy.Boolean, default=False)
+    is_finished = sqlalchemy.Column(sqlalchemy.Boolean, default=False, index=True)
+    modified_date = sqlalchemy.Column(sqlalchemy.DateTime, default=datetime.datetime.now,
+                                      server_onupdate=sqlalchemy.FetchedValue())
+    # Номер последнего изменения строки и его время ставят триггеры (database/versioning.py)
+    version = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, server_default='0', index=True,
+                                server_onupdate=sqlalchemy.FetchedValue())
 
     leader = orm.relationship('User')
+    collaborator_users = orm.relationship('User', secondary=job_collaborators_table, viewonly=True)
 
     categories = orm.relationship(
         "Category",
         secondary=association_table,
+        order_by="Category.id",
         backref="jobs"
     )
 
+    __mapper_args__ = {'eager_defaults': False}
+
     def __repr__(self):
         return f'<Job> {self.job}'
+
+
+def _sync_collaborators(connection, job_id, collaborators):
+    connection.execute(job_collaborators_table.delete().where(job_collaborators_table.c.job_id == job_id))
+    user_ids = parse_collaborator_ids(collaborators)
+    if user_ids:
+        connection.execute(job_collaborators_table.insert(),
+                           [{'job_id': job_id, 'user_id': user_id} for user_id in user_ids])
+
+
+@sqlalchemy.event.listens_for(Jobs, 'after_insert')
+def _collaborators_after_insert(mapper, connection, target):
+    _sync_collaborators(connection, target.id, target.collaborators)
+
+
+@sqlalchemy.event.listens_for(Jobs, 'after_update')
+def _collaborators_after_update(mapper, connection, target):
+    if orm.attributes.get_history(target, 'collaborators').has_changes():
+        _sync_collaborators(connection, target.id, target.collaborators)
+
+
+@sqlalchemy.event.listens_for(Jobs, 'after_delete')
+def _collaborators_after_delete(mapper, connection, target):
+    connection.execute(job_collaborators_table.delete().where(job_collaborators_table.c.job_id == target.id))
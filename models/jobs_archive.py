@@ -0,0 +1,40 @@
+import datetime
+import sqlalchemy
+from sqlalchemy import orm
+from database.db_session import SqlAlchemyBase
+
+# Связи архивных работ с категориями; колонки как у association
+jobs_archive_categories_table = sqlalchemy.Table(
+    'jobs_archive_categories',
+    SqlAlchemyBase.metadata,
+    sqlalchemy.Column('jobs', sqlalchemy.Integer,
+                      sqlalchemy.ForeignKey('jobs_archive.id'), primary_key=True),
+    sqlalchemy.Column('category', sqlalchemy.Integer,
+                      sqlalchemy.ForeignKey('categories.id'), primary_key=True)
+)
+
+
+class ArchivedJob(SqlAlchemyBase):
+    """Завершенная работа, перенесенная из jobs (см. database/archive.py).
+
+    Колонки совпадают с Jobs, ID сохраняется: id в jobs выдаются с
+    AUTOINCREMENT и не переиспользуются, поэтому с архивом не пересекаются.
+    """
+    __tablename__ = 'jobs_archive'
+
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=False)
+    team_leader = sqlalchemy.Column(sqlalchemy.Integer, sqlalchemy.ForeignKey("users.id"), index=True)
+    job = sqlalchemy.Column(sqlalchemy.String, nullable=True)
+    work_size = sqlalchemy.Column(sqlalchemy.Integer, nullable=True)
+    collaborators = sqlalchemy.Column(sqlalchemy.String, nullable=True)
+    start_date = sqlalchemy.Column(sqlalchemy.DateTime, nullable=True)
+    end_date = sqlalchemy.Column(sqlalchemy.DateTime, nullable=True)
+    is_finished = sqlalchemy.Column(sqlalchemy.Boolean, default=True)
+    archived_at = sqlalchemy.Column(sqlalchemy.DateTime, default=datetime.datetime.now)
+
+    leader = orm.relationship('User')
+    categories = orm.relationship('Category', secondary=jobs_archive_categories_table,
+                                  order_by='Category.id', viewonly=True)
+
+    def __repr__(self):
+        return f'<ArchivedJob> {self.job}'
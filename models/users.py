@@ -1,30 +1,48 @@
 import datetime
 import sqlalchemy
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from database import passwords
 from database.db_session import SqlAlchemyBase
 
 
+def hash_password(password):
+    # Считается в пуле процессов с методом и стоимостью из настроек (database/passwords.py)
+    return passwords.hash_password(password)
+
+
 class User(SqlAlchemyBase, UserMixin):
     __tablename__ = 'users'
+    __table_args__ = (
+        # query1, query2, query7: фильтр по модулю и возрасту
+        sqlalchemy.Index('ix_users_address_age', 'address', 'age'),
+        # Сортировка keyset-пагинации по фамилии (database/pagination.py)
+        sqlalchemy.Index('ix_users_surname', 'surname'),
+    )
 
     id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=True)
     surname = sqlalchemy.Column(sqlalchemy.String, nullable=True)
     name = sqlalchemy.Column(sqlalchemy.String, nullable=True)
-    age = sqlalchemy.Column(sqlalchemy.Integer, nullable=True)
+    age = sqlalchemy.Column(sqlalchemy.Integer, nullable=True, index=True)
     position = sqlalchemy.Column(sqlalchemy.String, nullable=True)
     speciality = sqlalchemy.Column(sqlalchemy.String, nullable=True)
     address = sqlalchemy.Column(sqlalchemy.String, nullable=True)
     email = sqlalchemy.Column(sqlalchemy.String, index=True, unique=True, nullable=True)
     hashed_password = sqlalchemy.Column(sqlalchemy.String, nullable=True)
-    modified_date = sqlalchemy.Column(sqlalchemy.DateTime, default=datetime.datetime.now)
+    modified_date = sqlalchemy.Column(sqlalchemy.DateTime, default=datetime.datetime.now,
+                                      server_onupdate=sqlalchemy.FetchedValue())
     city_from = sqlalchemy.Column(sqlalchemy.String, nullable=True)
+    # Номер последнего изменения строки и его время ставят триггеры (database/versioning.py)
+    version = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, server_default='0', index=True,
+                                server_onupdate=sqlalchemy.FetchedValue())
+
+    # Не брать version из RETURNING: он возвращает значения до AFTER-триггеров
+    __mapper_args__ = {'eager_defaults': False}
 
     def __repr__(self):
         return f'<User> {self.id} {self.surname} {self.name}'
 
     def set_password(self, password):
-        self.hashed_password = generate_password_hash(password)
+        self.hashed_password = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.hashed_password, password)
+        return passwords.check_password(self.hashed_password, password)
@@ -0,0 +1,13 @@
+import sqlalchemy
+from database.db_session import SqlAlchemyBase
+
+# Счетчик изменений по таблицам (database/versioning.py): последний выданный номер
+# версии строки и номер на момент последнего удаления строки. Номера не переиспользуются.
+# Пишут только триггеры.
+row_versions_table = sqlalchemy.Table(
+    'row_versions',
+    SqlAlchemyBase.metadata,
+    sqlalchemy.Column('table_name', sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column('version', sqlalchemy.Integer, nullable=False, server_default='0'),
+    sqlalchemy.Column('deleted', sqlalchemy.Integer, nullable=False, server_default='0')
+)
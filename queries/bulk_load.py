@@ -0,0 +1,341 @@
+"""Массовая загрузка пользователей и работ из CSV или JSONL.
+
+Строки читаются потоково и вставляются пачками через SQLAlchemy Core
+(executemany, одна транзакция на пачку). Пароли хешируются в пуле процессов
+на пачку вперед, пока идет вставка текущей. Ссылки на руководителей и
+категории проверяются одним запросом на пачку, строки с ошибками
+пропускаются. После каждой пачки в файл контрольной точки записывается
+число обработанных строк, и повторный запуск продолжает с этого места.
+
+Запуск из корня проекта:
+    python -m queries.bulk_load database/mars_explorer.db users colonists.csv
+    python -m queries.bulk_load database/mars_explorer.db jobs jobs.jsonl --batch-size 5000
+
+Колонки users: surname, name, age, position, speciality, address, email,
+city_from и password (или готовый hashed_password).
+Колонки jobs: job, team_leader_id, work_size, collaborators, start_date,
+end_date, is_finished и category_ids (в CSV через ';', в JSONL - список).
+"""
+import argparse
+import csv
+import datetime
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import select
+from werkzeug.security import generate_password_hash
+
+from database import db_session
+from models.category import Category, association_table
+from models.jobs import Jobs, job_collaborators_table, parse_collaborator_ids
+from models.users import User
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 10
+
+USER_COLUMNS = ('surname', 'name', 'age', 'position', 'speciality', 'address', 'email', 'city_from')
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def read_rows(path, file_format):
+    """Номер строки и словарь полей; пустые значения CSV превращаются в None.
+
+    Вместо строки JSONL, которая не разбирается или не является объектом,
+    выдается ValueError: prepare_* отклоняют ее, а загрузка идет дальше.
+    """
+    with open(path, encoding='utf-8', newline='') as f:
+        if file_format == 'csv':
+            for line_no, row in enumerate(csv.DictReader(f), start=1):
+                yield line_no, {key: (value if value != '' else None) for key, value in row.items()}
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    yield line_no, _json_row(line)
+
+
+def _json_row(line):
+    try:
+        row = json.loads(line)
+    except ValueError as e:
+        return ValueError(f"неверный JSON: {e}")
+    if not isinstance(row, dict):
+        return ValueError(f"ожидался объект JSON, а не {type(row).__name__}")
+    return row
+
+
+def _fields(row):
+    """Словарь полей строки; ошибка чтения строки поднимается, чтобы строку отклонили."""
+    if isinstance(row, Exception):
+        raise row
+    return row
+
+
+def batched(rows, size):
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _int(value):
+    return int(value) if value is not None else None
+
+
+def _datetime(value):
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in TRUE_VALUES if value is not None else False
+
+
+def _collaborators(value):
+    """Строка участников для Jobs.collaborators; список ID из JSONL склеивается через ','."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, list) and all(isinstance(item, (int, str)) and not isinstance(item, bool)
+                                       for item in value):
+        return ','.join(str(item) for item in value)
+    raise ValueError(f"collaborators: ожидалась строка или список ID, а не {value!r}")
+
+
+def _ids(value):
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [int(item) for item in value]
+    return [int(item) for item in str(value).replace(',', ';').split(';') if item.strip()]
+
+
+class Checkpoint:
+    """Число обработанных строк входного файла, переживающее перезапуск."""
+
+    def __init__(self, path, source, kind):
+        self.path = path
+        self.key = {'source': os.path.abspath(source), 'kind': kind}
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        with open(self.path, encoding='utf-8') as f:
+            state = json.load(f)
+        if {key: state.get(key) for key in self.key} != self.key:
+            raise ValueError(f"Контрольная точка {self.path} относится к другому файлу или типу данных")
+        return state['rows']
+
+    def save(self, rows):
+        if not self.path:
+            return
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(self.key, rows=rows), f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Report:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.read = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, line_no, reason):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"строка {line_no}: {reason}")
+
+    def rate(self):
+        return self.read / max(time.perf_counter() - self.started, 1e-9)
+
+    def progress(self):
+        print(f"Обработано строк: {self.read}, вставлено: {self.inserted}, "
+              f"отклонено: {self.rejected}, {self.rate():.0f} строк/с")
+
+
+def prepare_users(batch, report):
+    users = []
+    for line_no, row in batch:
+        try:
+            row = _fields(row)
+            if not row.get('email'):
+                raise ValueError("не указан email")
+            if not row.get('password') and not row.get('hashed_password'):
+                raise ValueError("не указан пароль")
+            user = {name: row.get(name) for name in USER_COLUMNS}
+            user['age'] = _int(user['age'])
+            user['hashed_password'] = row.get('hashed_password')
+            user['modified_date'] = datetime.datetime.now()
+            users.append((line_no, user, row.get('password')))
+        except (TypeError, ValueError) as e:
+            report.reject(line_no, e)
+    return users
+
+
+def hash_passwords(pool, workers, users, method):
+    passwords = [password for _, user, password in users if not user['hashed_password']]
+    chunksize = max(1, len(passwords) // (4 * workers))
+    return pool.map(_hash, passwords, itertools.repeat(method), chunksize=chunksize)
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method) if method else generate_password_hash(password)
+
+
+def insert_users(connection, users, hashes, report):
+    hashes = iter(hashes)
+    for _, user, _ in users:
+        if not user['hashed_password']:
+            user['hashed_password'] = next(hashes)
+
+    emails = [user['email'] for _, user, _ in users]
+    taken = set(connection.scalars(select(User.email).where(User.email.in_(emails))))
+    rows = []
+    for line_no, user, _ in users:
+        if user['email'] in taken:
+            report.reject(line_no, f"email {user['email']} уже существует")
+            continue
+        taken.add(user['email'])
+        rows.append(user)
+    if rows:
+        connection.execute(User.__table__.insert(), rows)
+    report.inserted += len(rows)
+
+
+def prepare_jobs(batch, report):
+    jobs = []
+    for line_no, row in batch:
+        try:
+            row = _fields(row)
+            if not row.get('job'):
+                raise ValueError("не указано название работы")
+            job = {
+                'job': row['job'],
+                'team_leader': int(row['team_leader_id']),
+                'work_size': _int(row.get('work_size')),
+                'collaborators': _collaborators(row.get('collaborators')),
+                'start_date': _datetime(row.get('start_date')) or datetime.datetime.now(),
+                'end_date': _datetime(row.get('end_date')),
+                'is_finished': _bool(row.get('is_finished')),
+            }
+            jobs.append((line_no, job, _ids(row.get('category_ids'))))
+        except (KeyError, TypeError, ValueError) as e:
+            report.reject(line_no, e if not isinstance(e, KeyError) else f"не указано поле {e}")
+    return jobs
+
+
+def insert_jobs(connection, jobs, category_ids, report):
+    leaders = {job['team_leader'] for _, job, _ in jobs}
+    known_leaders = set(connection.scalars(select(User.id).where(User.id.in_(leaders))))
+
+    valid = []
+    for line_no, job, categories in jobs:
+        missing = [cat_id for cat_id in categories if cat_id not in category_ids]
+        if job['team_leader'] not in known_leaders:
+            report.reject(line_no, f"руководитель {job['team_leader']} не найден")
+        elif missing:
+            report.reject(line_no, f"категории не найдены: {missing}")
+        else:
+            valid.append((job, categories))
+    if not valid:
+        return
+
+    # Без sort_by_parameter_order: с ним SQLAlchemy вставляет в SQLite по одной строке. ID
+    # (AUTOINCREMENT) растут в порядке строк внутри одной транзакции, поэтому sorted() дает
+    # их в порядке переданных строк
+    job_ids = sorted(connection.scalars(Jobs.__table__.insert().returning(Jobs.__table__.c.id),
+                                        [job for job, _ in valid]))
+
+    # Вставка через Core минует события маппера Jobs, поэтому связи пишем сами
+    collaborators, links = [], []
+    for job_id, (job, categories) in zip(job_ids, valid):
+        collaborators.extend({'job_id': job_id, 'user_id': user_id}
+                             for user_id in parse_collaborator_ids(job['collaborators']))
+        links.extend({'jobs': job_id, 'category': cat_id} for cat_id in dict.fromkeys(categories))
+    if collaborators:
+        connection.execute(job_collaborators_table.insert(), collaborators)
+    if links:
+        connection.execute(association_table.insert(), links)
+    report.inserted += len(valid)
+
+
+def load_users(engine, rows, batch_size, workers, hash_method, checkpoint, skipped, report):
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        pending = None
+        for batch in itertools.chain(batched(rows, batch_size), [None]):
+            # Хеши следующей пачки считаются в пуле, пока вставляется текущая
+            prepared = None
+            if batch is not None:
+                users = prepare_users(batch, report)
+                prepared = (batch, users, hash_passwords(pool, workers, users, hash_method))
+            if pending is not None:
+                done_batch, users, hashes = pending
+                with engine.begin() as connection:
+                    insert_users(connection, users, list(hashes), report)
+                report.read += len(done_batch)
+                checkpoint.save(skipped + report.read)
+                report.progress()
+            pending = prepared
+
+
+def load_jobs(engine, rows, batch_size, checkpoint, skipped, report):
+    with engine.connect() as connection:
+        category_ids = set(connection.scalars(select(Category.id)))
+    for batch in batched(rows, batch_size):
+        jobs = prepare_jobs(batch, report)
+        with engine.begin() as connection:
+            insert_jobs(connection, jobs, category_ids, report)
+        report.read += len(batch)
+        checkpoint.save(skipped + report.read)
+        report.progress()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Массовая загрузка пользователей и работ')
+    parser.add_argument('db_file')
+    parser.add_argument('kind', choices=['users', 'jobs'])
+    parser.add_argument('source', help='файл .csv или .jsonl')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='по умолчанию - по расширению файла')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=None, help='процессы для хеширования паролей')
+    parser.add_argument('--hash-method', default=None, help='метод generate_password_hash, например pbkdf2')
+    parser.add_argument('--checkpoint', default=None, help='по умолчанию <source>.<kind>.checkpoint')
+    parser.add_argument('--restart', action='store_true', help='игнорировать контрольную точку')
+    args = parser.parse_args()
+
+    file_format = args.format or ('csv' if args.source.lower().endswith('.csv') else 'jsonl')
+    checkpoint = Checkpoint(args.checkpoint or f'{args.source}.{args.kind}.checkpoint', args.source, args.kind)
+    skipped = 0 if args.restart else checkpoint.load()
+    if skipped:
+        print(f"Продолжение с контрольной точки: пропущено строк {skipped}")
+
+    db_session.global_init(args.db_file)
+    engine = db_session.get_engine()
+    rows = itertools.islice(read_rows(args.source, file_format), skipped, None)
+    report = Report()
+    if args.kind == 'users':
+        load_users(engine, rows, args.batch_size, args.workers, args.hash_method, checkpoint, skipped, report)
+    else:
+        load_jobs(engine, rows, args.batch_size, checkpoint, skipped, report)
+    checkpoint.clear()
+
+    print(f"Готово: обработано строк {report.read}, вставлено {report.inserted}, "
+          f"отклонено {report.rejected}, {report.rate():.0f} строк/с")
+    for error in report.errors:
+        print(f"  {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,6 @@
 import sys
 from database import db_session
-from models.users import User
-from models.jobs import Jobs
+from database import aggregates
 
 
 def main():
@@ -12,35 +11,17 @@ def main():
     try:
         db_session.global_init(db_name)
         session = db_session.create_session()
-        all_jobs = session.query(Jobs).all()
-
-        if not all_jobs:
-            return
-
-        max_team_size = 0
-        jobs_with_sizes = []
-
-        for job in all_jobs:
-            collaborators_str = job.collaborators if job.collaborators else ""
-            ids = [item for item in collaborators_str.split(',') if item.strip()]
-            current_team_size = len(ids)
-            jobs_with_sizes.append((current_team_size, job.team_leader))
-            if current_team_size > max_team_size:
-                max_team_size = current_team_size
-
-        if max_team_size == 0:
-            return
-
-        leader_ids_with_max_team = {
-            leader_id for size, leader_id in jobs_with_sizes if size == max_team_size
-        }
-
-        if not leader_ids_with_max_team:
+        # Размеры команд поддерживаются триггерами в job_team_sizes (database/aggregates.py)
+        size, jobs = aggregates.largest_teams(session)
+        if not size:
             return
 
-        leaders = session.query(User).filter(User.id.in_(leader_ids_with_max_team)).all()
+        leaders = {}
+        for job in jobs:
+            if job.leader is not None:
+                leaders.setdefault(job.leader.id, job.leader)
 
-        for leader in leaders:
+        for leader in leaders.values():
             print(f"{leader.surname} {leader.name}")
 
     except Exception as e:
@@ -1,9 +1,7 @@
 import sys
-from collections import defaultdict
 
+from database import aggregates
 from database import db_session
-from models.users import User
-from models.jobs import Jobs
 from models.departments import Department
 
 
@@ -23,34 +21,12 @@ def main():
         if not department:
             return
 
-        member_ids_str = department.members if department.members else ""
-        member_ids = [int(id_str.strip()) for id_str in member_ids_str.split(',') if id_str.strip()]
-        if department.chief not in member_ids:
-            member_ids.append(department.chief)
-
-        if not member_ids:
-            return
-
-        all_jobs = session.query(Jobs).all()
-        user_hours = defaultdict(int)
-
-        for job in all_jobs:
-            collaborators_ids = [int(id_str.strip()) for id_str in job.collaborators.split(',') if
-                                 job.collaborators and id_str.strip()]
-            work_size = job.work_size if job.work_size else 0
-            for user_id in collaborators_ids:
-                if user_id in member_ids:
-                    user_hours[user_id] += work_size
-            if job.team_leader in member_ids:
-                user_hours[job.team_leader] += work_size
-
-        eligible_user_ids = [user_id for user_id, total_hours in user_hours.items() if
-                             total_hours > min_hours_threshold]
-
-        if not eligible_user_ids:
+        # Часы пользователей поддерживаются триггерами в user_hours (database/aggregates.py)
+        rows = aggregates.users_with_hours(session, min_hours_threshold, department.id)
+        if not rows:
             return
 
-        eligible_users = session.query(User).filter(User.id.in_(eligible_user_ids)).all()
+        eligible_users = sorted((user for user, hours in rows), key=lambda user: user.id)
 
         for user in eligible_users:
             print(f"{user.surname} {user.name}")
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """Приложение в этом же процессе на временной базе (для тестов без живого сервера)."""
+    from database import db_session
+    import app_v3
+
+    db_session.global_init(str(tmp_path_factory.mktemp('db') / 'mars_explorer.db'))
+    app_v3.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, SQL_INSTRUMENTATION_HEADERS=True)
+
+    from models.users import User
+    from models.category import Category
+    session = db_session.new_session()
+    try:
+        for i in range(1, 4):
+            user = User(name=f'Name{i}', surname=f'Surname{i}', email=f'user{i}@mars.org', age=20 + i)
+            user.set_password('password')
+            session.add(user)
+        session.add_all([Category(name='first'), Category(name='second')])
+        session.commit()
+    finally:
+        session.close()
+    return app_v3.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def replicator(app, tmp_path, monkeypatch):
+    """Включенные реплики (одна, во временном файле); фоновый поток не копирует, копирует sync_once()."""
+    from database import db_session
+    from database.replication import Replicator
+
+    replicator = Replicator(db_session.get_engine().url.database, [str(tmp_path / 'replica.db')], interval=3600)
+    replicator.start(db_session.TrackedSession)
+    monkeypatch.setattr(db_session, '__replicator', replicator)
+    yield replicator
+    replicator.stop()
@@ -0,0 +1,93 @@
+import datetime
+
+from database import aggregates, archive, db_session
+from models.departments import Department, set_members
+from models.jobs import Jobs
+
+
+def assert_no_drift():
+    with db_session.get_engine().connect() as connection:
+        assert aggregates.drift(connection) == {}
+
+
+def user_hours(client, department_id=None):
+    url = '/api/stats/user_hours' + (f'?department_id={department_id}' if department_id else '')
+    return {user['id']: user['hours'] for user in client.get(url).get_json()['users']}
+
+
+def test_aggregates_follow_api_writes(client):
+    before = user_hours(client)
+    response = client.post('/api/v2/jobs', json={'job': 'aggregated', 'team_leader_id': 1, 'work_size': 30,
+                                                 'collaborators': '2, 3'})
+    assert response.status_code == 201, response.get_json()
+    job_id = response.get_json()['id']
+    assert_no_drift()
+    hours = user_hours(client)
+    assert hours.get(1, 0) - before.get(1, 0) == 30 and hours.get(2, 0) - before.get(2, 0) == 30
+
+    assert client.put(f'/api/v2/jobs/{job_id}', json={'work_size': 40, 'collaborators': '3',
+                                                      'team_leader_id': 2}).status_code == 200
+    assert_no_drift()
+    hours = user_hours(client)
+    assert hours.get(1, 0) == before.get(1, 0)
+    assert hours.get(2, 0) - before.get(2, 0) == 40 and hours.get(3, 0) - before.get(3, 0) == 40
+
+    assert client.delete(f'/api/v2/jobs/{job_id}').status_code == 200
+    assert_no_drift()
+    assert user_hours(client) == before
+
+
+def test_largest_teams_and_department_hours(client):
+    response = client.post('/api/v2/jobs', json={'job': 'big team', 'team_leader_id': 3, 'work_size': 5,
+                                                 'collaborators': '1, 2, 3'})
+    job_id = response.get_json()['id']
+    largest = client.get('/api/stats/largest_teams').get_json()
+    assert largest['size'] >= 3
+    if largest['size'] == 3:
+        assert job_id in [job['id'] for job in largest['jobs']]
+
+    session = db_session.new_session()
+    try:
+        department = Department(title='aggregates', chief=3)
+        session.add(department)
+        session.flush()
+        set_members(session, department.id, {1})
+        session.commit()
+        department_id = department.id
+    finally:
+        session.close()
+    assert_no_drift()
+
+    all_hours = user_hours(client)
+    expected = all_hours.get(1, 0) + all_hours.get(3, 0)
+    assert set(user_hours(client, department_id)) <= {1, 3}
+    stats = client.get(f'/api/stats/department_hours/{department_id}').get_json()
+    assert stats['departments'][0]['hours'] == expected
+    assert client.get('/api/stats/department_hours/99999').status_code == 404
+
+    session = db_session.new_session()
+    try:
+        set_members(session, department_id, {2})
+        session.commit()
+    finally:
+        session.close()
+    assert_no_drift()
+
+
+def test_archiving_and_rebuild_keep_aggregates_consistent(client):
+    old = datetime.datetime(2020, 1, 1)
+    session = db_session.new_session()
+    try:
+        session.add(Jobs(job='aggregates archive', team_leader=2, work_size=7, collaborators='1',
+                         is_finished=True, start_date=old, end_date=old))
+        session.commit()
+        archive.archive_finished_jobs(session, datetime.timedelta(days=30))
+    finally:
+        session.close()
+    assert_no_drift()
+
+    with db_session.get_engine().begin() as connection:
+        connection.exec_driver_sql('UPDATE user_hours SET hours = hours + 1000')
+        assert 'user_hours' in aggregates.drift(connection)
+        aggregates.rebuild(connection)
+        assert aggregates.drift(connection) == {}
@@ -0,0 +1,179 @@
+import asyncio
+import json
+
+import pytest
+
+import asgi
+from database import db_session, db_session_async, passwords
+
+
+async def asgi_call(method, path, payload=None, headers=()):
+    """(статус, заголовки ответа, тело) запроса к ASGI-приложению."""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    path, _, query_string = path.partition('?')
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query_string.encode(),
+             'headers': [(name.lower().encode(), value.encode()) for name, value in headers]}
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi.app(scope, receive, send)
+    response_headers = {name.decode(): value.decode() for name, value in sent[0]['headers']}
+    return sent[0]['status'], response_headers, b''.join(message.get('body', b'') for message in sent[1:])
+
+
+async def asgi_request(method, path, payload=None):
+    status, _, data = await asgi_call(method, path, payload)
+    return status, json.loads(data) if data.startswith((b'{', b'[')) else data
+
+
+def run(*requests):
+    """Выполняет запросы по очереди в одном цикле событий и возвращает ответы."""
+
+    async def scenario():
+        db_session_async.global_init(db_session.get_engine().url.database)
+        try:
+            return [await asgi_request(*request) for request in requests]
+        finally:
+            await db_session_async.dispose()
+
+    return asyncio.run(scenario())
+
+
+@pytest.fixture(autouse=True)
+def database(app):
+    return app
+
+
+def test_async_job_crud():
+    [(status, created)] = run(('POST', '/api/v2/jobs', {
+        'job': 'async job', 'team_leader_id': 1, 'work_size': 3, 'collaborators': '2', 'category_ids': [1, 2]}))
+    assert status == 201, created
+    job_id = created['id']
+    assert [category['id'] for category in created['job']['categories']] == [1, 2]
+
+    (status, job), (status_put, edited), (status_list, jobs) = run(
+        ('GET', f'/api/v2/jobs/{job_id}'),
+        ('PUT', f'/api/v2/jobs/{job_id}', {'work_size': 7, 'category_ids': [2]}),
+        ('GET', '/api/v2/jobs?all=1'),
+    )
+    assert status == 200 and job['job']['job'] == 'async job'
+    assert status_put == 200 and edited['job']['work_size'] == 7
+    assert [category['id'] for category in edited['job']['categories']] == [2]
+    assert job_id in [item['id'] for item in jobs['jobs']]
+
+    (status_delete, _), (status_missing, missing) = run(
+        ('DELETE', f'/api/v2/jobs/{job_id}'),
+        ('GET', f'/api/v2/jobs/{job_id}'),
+    )
+    assert status_delete == 200
+    assert status_missing == 404 and missing['message'] == f"Job {job_id} not found"
+
+
+def test_async_job_validation():
+    (status_missing, missing), (status_leader, leader), (status_method, _) = run(
+        ('POST', '/api/v2/jobs', {'team_leader_id': 1}),
+        ('POST', '/api/v2/jobs', {'job': 'x', 'team_leader_id': 99999}),
+        ('PATCH', '/api/v2/jobs'),
+    )
+    assert status_missing == 400 and 'job' in missing['message']
+    assert status_leader == 400
+    assert status_method == 405
+
+
+def test_async_user_crud():
+    (status, created), (status_duplicate, _) = run(
+        ('POST', '/api/v2/users', {'name': 'Async', 'email': 'async@mars.org', 'password': 'pw', 'age': 30}),
+        ('POST', '/api/v2/users', {'name': 'Async', 'email': 'async@mars.org', 'password': 'pw'}),
+    )
+    assert status == 201, created
+    assert status_duplicate == 409
+    user_id = created['id']
+
+    (status_put, edited), (status_delete, _), (status_missing, _) = run(
+        ('PUT', f'/api/v2/users/{user_id}', {'age': 31}),
+        ('DELETE', f'/api/v2/users/{user_id}'),
+        ('GET', f'/api/v2/users/{user_id}'),
+    )
+    assert status_put == 200 and edited['user']['age'] == 31
+    assert status_delete == 200
+    assert status_missing == 404
+
+
+def test_non_async_paths_fall_back_to_flask():
+    [(status, metrics)] = run(('GET', '/api/metrics'))
+    assert status == 200
+    assert 'pool' in metrics
+
+
+def test_async_conditional_get_matches_flask(client):
+    etag = client.get('/api/v2/users/2').headers['ETag']
+    # первая страница от новых работ к старым: новая работа попадает на нее
+    jobs_page = '/api/v2/jobs?limit=5&sort=-id'
+    list_etag = client.get(jobs_page).headers['ETag']
+
+    async def scenario():
+        db_session_async.global_init(db_session.get_engine().url.database)
+        try:
+            status, headers, _ = await asgi_call('GET', '/api/v2/users/2')
+            assert status == 200 and headers['etag'] == etag and 'last-modified' in headers
+            status, headers, body = await asgi_call('GET', '/api/v2/users/2', headers=[('If-None-Match', etag)])
+            assert status == 304 and body == b'' and headers['etag'] == etag
+            status, _, _ = await asgi_call('GET', '/api/v2/users/2',
+                                           headers=[('If-Modified-Since', headers['last-modified'])])
+            assert status == 304
+
+            status, headers, _ = await asgi_call('GET', jobs_page, headers=[('If-None-Match', list_etag)])
+            assert status == 304 and headers['etag'] == list_etag
+            await asgi_call('POST', '/api/v2/jobs', {'job': 'etag', 'team_leader_id': 1})
+            status, headers, _ = await asgi_call('GET', jobs_page, headers=[('If-None-Match', list_etag)])
+            assert status == 200 and headers['etag'] != list_etag
+
+            await asgi_call('PUT', '/api/v2/users/2', {'speciality': 'etag'})
+            status, headers, _ = await asgi_call('GET', '/api/v2/users/2', headers=[('If-None-Match', etag)])
+            assert status == 200 and headers['etag'] != etag
+        finally:
+            await db_session_async.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_async_password_pool_busy_is_503(monkeypatch):
+    monkeypatch.setattr(passwords, '_workers', 1)
+    monkeypatch.setattr(passwords, '_pending', passwords.stats()['limit'] + 1)
+
+    async def scenario():
+        db_session_async.global_init(db_session.get_engine().url.database)
+        try:
+            return await asgi_call('POST', '/api/v2/users', {'name': 'Busy', 'email': 'busy-async@mars.org',
+                                                             'password': 'pw'})
+        finally:
+            await db_session_async.dispose()
+
+    status, headers, body = asyncio.run(scenario())
+    assert status == 503 and headers['retry-after'] == '1'
+    assert json.loads(body)['message'] == passwords.PoolBusy.description
+
+
+def test_async_write_advances_replica_generation(replicator):
+    generation = replicator.generation
+
+    async def scenario():
+        db_session_async.global_init(db_session.get_engine().url.database)
+        try:
+            created = await asgi_call('POST', '/api/v2/jobs', {'job': 'replicated', 'team_leader_id': 1})
+            read = await asgi_call('GET', '/api/v2/jobs?limit=1')
+            return created, read
+        finally:
+            await db_session_async.dispose()
+
+    (status, headers, _), (_, read_headers, _) = asyncio.run(scenario())
+    assert status == 201
+    assert replicator.generation == generation + 1, "async commit did not reach db_session._on_commit"
+    assert headers['x-db-generation'] == str(generation + 1)
+    assert f'db_generation={generation + 1}' in headers['set-cookie']
+    assert 'x-db-generation' not in read_headers
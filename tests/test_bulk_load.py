@@ -0,0 +1,144 @@
+import itertools
+import json
+
+from sqlalchemy import event, select
+
+from database import db_session
+from models.category import association_table
+from models.jobs import Jobs, job_collaborators_table
+from models.users import User
+from queries import bulk_load
+
+
+def write_jsonl(path, rows):
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows), encoding='utf-8')
+    return str(path)
+
+
+def test_bulk_load_users_and_jobs(app, tmp_path):
+    engine = db_session.get_engine()
+    users_csv = tmp_path / 'users.csv'
+    users_csv.write_text('name,email,age,password\n'
+                         'Bulk1,bulk1@mars.org,30,pw\n'
+                         'Dup,user1@mars.org,31,pw\n'
+                         'Bad,bulk_bad@mars.org,old,pw\n', encoding='utf-8')
+    report = bulk_load.Report()
+    checkpoint = bulk_load.Checkpoint(None, str(users_csv), 'users')
+    bulk_load.load_users(engine, bulk_load.read_rows(str(users_csv), 'csv'), 2, 1, 'pbkdf2:sha256:1000',
+                         checkpoint, 0, report)
+    assert (report.read, report.inserted, report.rejected) == (3, 1, 2)
+
+    session = db_session.new_session()
+    try:
+        user = session.scalars(select(User).where(User.email == 'bulk1@mars.org')).one()
+        assert user.check_password('pw') and user.age == 30
+    finally:
+        session.close()
+
+    source = write_jsonl(tmp_path / 'jobs.jsonl', [
+        {'job': 'bulk job', 'team_leader_id': user.id, 'collaborators': '1, 2', 'category_ids': [1, 2]},
+        {'job': 'bulk orphan', 'team_leader_id': 99999},
+        {'job': 'bulk bad category', 'team_leader_id': 1, 'category_ids': [999]},
+        {'job': 'bulk resumed', 'team_leader_id': 1, 'is_finished': True},
+    ])
+    checkpoint = bulk_load.Checkpoint(str(tmp_path / 'jobs.checkpoint'), source, 'jobs')
+    report = bulk_load.Report()
+    rows = itertools.islice(bulk_load.read_rows(source, 'jsonl'), 0, 3)
+    bulk_load.load_jobs(engine, rows, 2, checkpoint, 0, report)
+    assert (report.inserted, report.rejected) == (1, 2)
+    assert checkpoint.load() == 3
+
+    # Повторный запуск продолжает с контрольной точки
+    skipped = checkpoint.load()
+    report = bulk_load.Report()
+    bulk_load.load_jobs(engine, itertools.islice(bulk_load.read_rows(source, 'jsonl'), skipped, None), 2,
+                        checkpoint, skipped, report)
+    assert (report.read, report.inserted) == (1, 1)
+
+    with engine.connect() as connection:
+        jobs = dict(connection.execute(select(Jobs.job, Jobs.id).where(Jobs.job.like('bulk%'))).all())
+        assert set(jobs) == {'bulk job', 'bulk resumed'}
+        assert set(connection.scalars(select(job_collaborators_table.c.user_id).where(
+            job_collaborators_table.c.job_id == jobs['bulk job']))) == {1, 2}
+        assert set(connection.scalars(select(association_table.c.category).where(
+            association_table.c.jobs == jobs['bulk job']))) == {1, 2}
+
+
+def test_malformed_jsonl_lines_are_rejected(app, tmp_path):
+    source = tmp_path / 'jobs.jsonl'
+    source.write_text('{"job": "bulk before bad json", "team_leader_id": 1}\n'
+                      '{"job": "broken\n'
+                      '[1, 2]\n'
+                      '{"job": "bulk after bad json", "team_leader_id": 1}\n', encoding='utf-8')
+    checkpoint = bulk_load.Checkpoint(str(tmp_path / 'jobs.checkpoint'), str(source), 'jobs')
+    report = bulk_load.Report()
+    bulk_load.load_jobs(db_session.get_engine(), bulk_load.read_rows(str(source), 'jsonl'), 10, checkpoint, 0,
+                        report)
+    assert (report.read, report.inserted, report.rejected) == (4, 2, 2)
+    assert report.errors[0].startswith('строка 2: неверный JSON')
+    assert report.errors[1] == 'строка 3: ожидался объект JSON, а не list'
+    assert checkpoint.load() == 4
+
+
+def test_collaborators_list_is_joined_and_other_types_rejected(app, tmp_path):
+    source = write_jsonl(tmp_path / 'jobs.jsonl', [
+        {'job': 'bulk listed collaborators', 'team_leader_id': 1, 'collaborators': [2, '3']},
+        {'job': 'bulk numeric collaborators', 'team_leader_id': 1, 'collaborators': 2},
+        {'job': 'bulk nested collaborators', 'team_leader_id': 1, 'collaborators': [[2]]},
+    ])
+    engine = db_session.get_engine()
+    report = bulk_load.Report()
+    bulk_load.load_jobs(engine, bulk_load.read_rows(source, 'jsonl'), 10,
+                        bulk_load.Checkpoint(None, source, 'jobs'), 0, report)
+    assert (report.inserted, report.rejected) == (1, 2)
+    with engine.connect() as connection:
+        job_id, collaborators = connection.execute(select(Jobs.id, Jobs.collaborators).where(
+            Jobs.job == 'bulk listed collaborators')).one()
+        assert collaborators == '2,3'
+        assert set(connection.scalars(select(job_collaborators_table.c.user_id).where(
+            job_collaborators_table.c.job_id == job_id))) == {2, 3}
+
+
+def test_job_batch_is_one_multi_row_insert(app, tmp_path):
+    """Пачка работ вставляется одним INSERT на таблицу, а не по строке; ID совпадают со строками."""
+    engine = db_session.get_engine()
+    # отдельный руководитель: по нему работы теста находятся и удаляются
+    with engine.begin() as connection:
+        leader_id = connection.execute(User.__table__.insert().values(
+            name='Batch', email='batch-leader@mars.org')).inserted_primary_key[0]
+    source = write_jsonl(tmp_path / 'jobs.jsonl', [
+        {'job': f'batched {i}', 'team_leader_id': leader_id, 'collaborators': str(2 + i % 2),
+         'category_ids': [1 + i % 2]}
+        for i in range(200)])
+    executes = []
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def record(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith('INSERT'):
+            executes.append(statement.split()[2])
+
+    report = bulk_load.Report()
+    try:
+        bulk_load.load_jobs(engine, bulk_load.read_rows(source, 'jsonl'), 200,
+                            bulk_load.Checkpoint(None, source, 'jobs'), 0, report)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert report.inserted == 200
+    assert sorted(executes) == ['association', 'job_collaborators', 'jobs'], executes
+
+    with engine.begin() as connection:
+        rows = connection.execute(
+            select(Jobs.job, job_collaborators_table.c.user_id, association_table.c.category)
+            .join(job_collaborators_table, job_collaborators_table.c.job_id == Jobs.id)
+            .join(association_table, association_table.c.jobs == Jobs.id)
+            .where(Jobs.team_leader == leader_id)).all()
+        # 200 работ с категориями мешали бы поиску и спискам в других тестах
+        job_ids = select(Jobs.id).where(Jobs.team_leader == leader_id).scalar_subquery()
+        connection.execute(association_table.delete().where(association_table.c.jobs.in_(job_ids)))
+        connection.execute(job_collaborators_table.delete().where(job_collaborators_table.c.job_id.in_(job_ids)))
+        connection.execute(Jobs.__table__.delete().where(Jobs.team_leader == leader_id))
+        connection.execute(User.__table__.delete().where(User.id == leader_id))
+    assert len(rows) == 200
+    for job, user_id, category in rows:
+        i = int(job.rsplit(' ', 1)[1])
+        assert (user_id, category) == (2 + i % 2, 1 + i % 2), f"links of {job} belong to another row"
@@ -0,0 +1,91 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event, select
+
+from database import categories
+from database import db_session
+from models.category import Category, association_table, set_categories
+
+
+@contextmanager
+def captured_sql():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db_session.get_engine()
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+
+def category_statements(statements):
+    return [statement for statement, _ in statements if 'FROM categories' in statement]
+
+
+def test_category_ids_are_checked_against_the_map(client):
+    categories.names(db_session.new_session())
+    with captured_sql() as statements:
+        response = client.post('/api/v2/jobs', json={'job': 'mapped', 'team_leader_id': 1, 'category_ids': [2, 1, 2]})
+    assert response.status_code == 201
+    assert [c['id'] for c in response.get_json()['job']['categories']] == [2, 1]
+    # одна выборка объектов IN и ни одной проверки по ID
+    [select_in] = category_statements(statements)
+    assert 'IN' in select_in
+
+    loads = categories.stats()['loads']
+    response = client.put(f"/api/jobs/{response.get_json()['id']}", json={'category_ids': [1, 999]})
+    assert response.status_code == 400 and response.get_json()['error'] == 'Category with id 999 not found'
+    assert categories.stats()['loads'] == loads + 1, "an unknown ID reloads the map once"
+    assert client.post('/api/v2/jobs', json={'job': 'x', 'team_leader_id': 1, 'category_ids': [998]}).get_json() == {
+        'message': 'Category with id 998 not found.'}
+
+
+def test_map_is_refreshed_after_category_commit(client):
+    session = db_session.new_session()
+    try:
+        known = categories.names(session)
+        category = Category(name='третья')
+        session.add(category)
+        session.flush()
+        # своя незафиксированная категория в общую карту не попадает
+        assert categories.missing(session, [category.id]) == []
+        assert category.id not in categories.names(session)
+        session.commit()
+        assert categories.names(session) == {**known, category.id: 'третья'}
+        job = client.post('/api/v2/jobs', json={'job': 'third', 'team_leader_id': 1,
+                                                'category_ids': [category.id]}).get_json()['job']
+        assert job['categories'] == [{'id': category.id, 'name': 'третья'}]
+    finally:
+        session.close()
+
+
+def test_replacing_categories_writes_only_the_difference(client):
+    job_id = client.post('/api/v2/jobs', json={'job': 'diff', 'team_leader_id': 1,
+                                               'category_ids': [1, 2]}).get_json()['id']
+    with captured_sql() as statements:
+        assert client.put(f'/api/jobs/{job_id}', json={'category_ids': [2]}).status_code == 200
+    writes = [statement for statement, _ in statements
+              if 'association' in statement and not statement.lstrip().startswith('SELECT')]
+    assert len(writes) == 1 and writes[0].startswith('DELETE FROM association')
+
+    version = client.get(f'/api/v2/jobs/{job_id}').headers['ETag']
+    with captured_sql() as statements:
+        assert client.put(f'/api/v2/jobs/{job_id}', json={'category_ids': [2]}).status_code == 200
+    assert not [statement for statement, _ in statements if statement.startswith(('DELETE FROM association',
+                                                                                  'INSERT INTO association'))]
+    assert client.get(f'/api/v2/jobs/{job_id}').headers['ETag'] == version
+
+    session = db_session.new_session()
+    try:
+        added, removed = set_categories(session, {job_id: [1]})
+        assert added == {(job_id, 1)} and removed == {(job_id, 2)}
+        assert set_categories(session, {job_id: [1]}) == (set(), set())
+        session.commit()
+        assert session.scalars(select(association_table.c.category).where(
+            association_table.c.jobs == job_id)).all() == [1]
+    finally:
+        session.close()
@@ -0,0 +1,118 @@
+import pytest
+from sqlalchemy import event
+
+from database import db_session
+from database import response_cache
+
+
+def revalidate(client, url, response):
+    return client.get(url, headers={'If-None-Match': response.headers['ETag']})
+
+
+@pytest.mark.parametrize('prefix', ['/api', '/api/v2'])
+def test_object_etag_and_last_modified(client, prefix):
+    job_id = client.post('/api/v2/jobs', json={'job': 'conditional', 'team_leader_id': 1,
+                                               'category_ids': [1]}).get_json()['id']
+    url = f'{prefix}/jobs/{job_id}'
+    first = client.get(url)
+    assert first.status_code == 200 and first.headers['ETag'] and first.last_modified
+
+    cached = revalidate(client, url, first)
+    assert cached.status_code == 304 and cached.data == b''
+    assert cached.headers['ETag'] == first.headers['ETag']
+    since = client.get(url, headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert since.status_code == 304
+
+    # смена категорий тоже новая версия работы
+    assert client.put(f'/api/jobs/{job_id}', json={'category_ids': [1, 2]}).status_code == 200
+    changed = revalidate(client, url, first)
+    assert changed.status_code == 200 and changed.headers['ETag'] != first.headers['ETag']
+    assert [c['id'] for c in changed.get_json()['job']['categories']] == [1, 2]
+    assert revalidate(client, url, changed).status_code == 304
+
+    assert client.get(f'{prefix}/jobs/999999', headers={'If-None-Match': '*'}).status_code == 404
+
+
+@pytest.mark.parametrize('prefix', ['/api', '/api/v2'])
+def test_user_etag_changes_on_update(client, prefix):
+    url = f'{prefix}/users/1'
+    first = client.get(url)
+    assert revalidate(client, url, first).status_code == 304
+    assert client.put('/api/v2/users/1', json={'city_from': f'город {prefix}'}).status_code == 200
+    changed = revalidate(client, url, first)
+    assert changed.status_code == 200 and changed.get_json()['user']['city_from'] == f'город {prefix}'
+    assert changed.last_modified >= first.last_modified
+
+
+# Страницы - от новых работ к старым, чтобы записанная работа попадала на первую страницу
+@pytest.mark.parametrize('url', ['/api/jobs?all=1', '/api/v2/jobs?all=1&team_leader_id=1',
+                                 '/api/v2/jobs?limit=2&sort=-id', '/api/v2/jobs?include_archived=1&sort=-id',
+                                 '/api/v2/jobs?team_leader_id=1&fields=id,job&sort=-id'])
+def test_list_etag_follows_inserts_updates_and_deletes(client, url):
+    client.post('/api/v2/jobs', json={'job': 'listed', 'team_leader_id': 1})
+    response = client.get(url)
+    assert response.status_code == 200 and 'Last-Modified' not in response.headers
+    assert revalidate(client, url, response).status_code == 304
+
+    job_id = client.post('/api/v2/jobs', json={'job': 'listed', 'team_leader_id': 1}).get_json()['id']
+    inserted = revalidate(client, url, response)
+    assert inserted.status_code == 200
+    assert client.put(f'/api/jobs/{job_id}', json={'work_size': 99}).status_code == 200
+    updated = revalidate(client, url, inserted)
+    assert updated.status_code == 200
+    assert client.delete(f'/api/v2/jobs/{job_id}').status_code == 200
+    deleted = revalidate(client, url, updated)
+    assert deleted.status_code == 200
+    etags = [page.headers['ETag'] for page in (response, inserted, updated, deleted)]
+    if 'all=1' in url:
+        assert len(set(etags)) == 4
+    else:
+        # ETag страницы - по ее строкам: после удаления это снова та же страница
+        assert len(set(etags[:3])) == 3 and etags[3] == etags[0]
+
+
+def test_users_list_and_streams(client):
+    response = client.get('/api/v2/users?all=1')
+    assert revalidate(client, '/api/v2/users?all=1', response).status_code == 304
+    assert 'ETag' not in client.get('/api/v2/users?stream=1').headers
+
+
+def aggregates(client, url, **kwargs):
+    """Ответ на GET и выполненные для него выражения с count() или max()."""
+    statements = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        if 'count(' in statement.lower() or 'max(' in statement.lower():
+            statements.append(statement)
+
+    event.listen(db_session.get_engine(), 'before_cursor_execute', record)
+    try:
+        return client.get(url, **kwargs), statements
+    finally:
+        event.remove(db_session.get_engine(), 'before_cursor_execute', record)
+
+
+@pytest.mark.parametrize('url', ['/api/v2/jobs?limit=5', '/api/jobs?limit=5&sort=-work_size',
+                                 '/api/v2/jobs?limit=5&include_archived=1', '/api/v2/users?limit=2',
+                                 '/api/users?limit=2'])
+def test_page_etag_reads_only_the_page(client, monkeypatch, url):
+    monkeypatch.setattr(response_cache.get_cache(), 'size', 0)
+    response, statements = aggregates(client, url)
+    assert response.status_code == 200 and response.headers['ETag'].startswith(('"jobs-page-', '"users-page-'))
+    assert statements == [], "a page must not aggregate the whole collection"
+    cached, statements = aggregates(client, url, headers={'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304 and statements == []
+
+    next_page = client.get(f"{url}&cursor={response.get_json()['next']}")
+    assert next_page.headers['ETag'] != response.headers['ETag']
+
+
+def test_whole_list_etag_uses_version_index(client, monkeypatch):
+    monkeypatch.setattr(response_cache.get_cache(), 'size', 0)
+    response, statements = aggregates(client, '/api/v2/jobs?all=1')
+    assert response.status_code == 200 and len(statements) == 1
+    with db_session.get_engine().connect() as connection:
+        for table in ('jobs', 'users'):
+            plan = ' '.join(row[-1] for row in connection.exec_driver_sql(
+                f'EXPLAIN QUERY PLAN SELECT max(version) FROM {table}'))
+            assert f'ix_{table}_version' in plan, plan
@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy import select
+
+from database import db_session
+from models.users import User
+
+
+def test_one_session_per_request(app):
+    with app.test_request_context('/api/v2/users', method='POST'):
+        session = db_session.create_session()
+        assert db_session.create_session() is session
+        session.scalar(select(User.id).limit(1))
+        assert session.in_transaction()
+    assert not session.in_transaction(), "the request session is closed at teardown"
+
+    with app.test_request_context('/api/v2/users', method='POST'):
+        assert db_session.create_session() is not session
+
+
+def test_request_session_rolled_back_on_exception(app):
+    with pytest.raises(RuntimeError):
+        with app.test_request_context('/api/v2/users', method='POST'):
+            session = db_session.create_session()
+            session.add(User(name='Rollback', email='rollback@mars.org'))
+            session.flush()
+            raise RuntimeError('ошибка в обработчике')
+
+    check = db_session.new_session()
+    try:
+        assert check.scalar(select(User.id).where(User.email == 'rollback@mars.org')) is None
+    finally:
+        check.close()
+
+
+def test_leaked_session_is_reported_once(app, monkeypatch, capsys):
+    monkeypatch.setattr(db_session._tracker, 'enabled', True)
+    open_before = db_session.session_stats()['open']
+    with app.test_request_context('/api/v2/users', method='POST'):
+        db_session.create_session()
+        leaked = db_session.new_session()
+        assert db_session.session_stats()['open'] == open_before + 2
+    try:
+        output = capsys.readouterr().out
+        assert output.count('Утечка сессии') == 1, "only the session not closed by the request is reported"
+        assert 'test_leaked_session_is_reported_once' in output, "the report shows where the session was created"
+        assert db_session.session_stats()['open'] == open_before, "reported sessions are dropped from the tracker"
+    finally:
+        leaked.close()
@@ -0,0 +1,79 @@
+from sqlalchemy import event, select
+
+from database import db_session
+from models.departments import Department, get_member_ids, parse_member_ids, set_members
+
+
+def member_writes(engine):
+    """Список (оператор, параметры) записей в department_members, выполненных через engine."""
+    writes = []
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def record(connection, cursor, statement, parameters, context, executemany):
+        if 'department_members' in statement and statement.lstrip().startswith(('INSERT', 'DELETE')):
+            writes.append((statement.split()[0], parameters))
+
+    return writes, lambda: event.remove(engine, 'before_cursor_execute', record)
+
+
+def test_parse_member_ids():
+    assert parse_member_ids('3, 1,,x, 3') == [3, 1]
+    assert parse_member_ids(None) == []
+
+
+def test_set_members_writes_only_the_difference(app):
+    session = db_session.new_session()
+    writes, stop = member_writes(db_session.get_engine())
+    try:
+        department = Department(title='set_members', chief=1, email='set_members@mars.org')
+        session.add(department)
+        session.flush()
+        assert set_members(session, department.id, [1, 2]) == ({1, 2}, set())
+        assert get_member_ids(session, department.id) == {1, 2}
+
+        del writes[:]
+        assert set_members(session, department.id, [2, 3]) == ({3}, {1})
+        assert get_member_ids(session, department.id) == {2, 3}
+        assert [operation for operation, _ in writes] == ['DELETE', 'INSERT']
+        assert writes[1][1] == (department.id, 3), "only the new member is inserted"
+
+        del writes[:]
+        assert set_members(session, department.id, {3, 2}) == (set(), set())
+        assert writes == [], "an unchanged member list writes nothing"
+    finally:
+        stop()
+        session.rollback()
+        session.close()
+
+
+def members(department_id):
+    session = db_session.new_session()
+    try:
+        return get_member_ids(session, department_id)
+    finally:
+        session.close()
+
+
+def test_department_form_add_and_edit(client):
+    client.post('/login', data={'email': 'user1@mars.org', 'password': 'password'})
+    form = {'title': 'Form department', 'chief': 1, 'members': '2, 3', 'email': 'form-department@mars.org'}
+    assert client.post('/add_department', data=form).status_code == 302
+    session = db_session.new_session()
+    try:
+        department_id = session.scalar(select(Department.id).where(Department.email == form['email']))
+    finally:
+        session.close()
+    assert members(department_id) == {2, 3}
+
+    page = client.get(f'/edit_department/{department_id}').get_data(as_text=True)
+    assert 'value="2, 3"' in page
+    assert client.post(f'/edit_department/{department_id}', data=dict(form, members='3, 1')).status_code == 302
+    assert members(department_id) == {1, 3}
+
+    response = client.post(f'/edit_department/{department_id}', data=dict(form, members='1, 99999'))
+    assert 'Участники с ID 99999 не найдены' in response.get_data(as_text=True)
+    assert members(department_id) == {1, 3}
+
+    assert client.post(f'/delete_department/{department_id}').status_code == 302
+    assert members(department_id) == set()
+    client.get('/logout')
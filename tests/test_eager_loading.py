@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import delete, insert, select
+
+from database import db_session
+from database import response_cache
+from models.category import association_table
+from models.jobs import Jobs
+from models.users import User
+from test_async_api import run
+
+
+def add_jobs(leader_id, count):
+    with db_session.get_engine().begin() as connection:
+        start = connection.scalar(select(Jobs.id).order_by(Jobs.id.desc()).limit(1)) or 0
+        connection.execute(insert(Jobs), [{'job': f'eager {i}', 'team_leader': leader_id, 'work_size': i % 40}
+                                          for i in range(count)])
+        job_ids = connection.scalars(select(Jobs.id).where(Jobs.team_leader == leader_id, Jobs.id > start)).all()
+        connection.execute(insert(association_table), [{'jobs': job_id, 'category': category}
+                                                       for job_id in job_ids for category in (1, 2)])
+
+
+@pytest.fixture
+def leader_id(app):
+    session = db_session.new_session()
+    try:
+        leader = User(name='Eager', surname='Loader', email='eager@mars.org')
+        session.add(leader)
+        session.commit()
+        leader_id = leader.id
+    finally:
+        session.close()
+    yield leader_id
+    with db_session.get_engine().begin() as connection:
+        job_ids = select(Jobs.id).where(Jobs.team_leader == leader_id)
+        connection.execute(delete(association_table).where(association_table.c.jobs.in_(job_ids)))
+        connection.execute(delete(Jobs).where(Jobs.team_leader == leader_id))
+        connection.execute(delete(User).where(User.id == leader_id))
+
+
+def query_counts(client, leader_id):
+    urls = ['/', f'/api/jobs?all=1&team_leader_id={leader_id}', f'/api/v2/jobs?all=1&team_leader_id={leader_id}',
+            f'/api/v2/jobs?limit=1000&team_leader_id={leader_id}', f'/api/v2/users/{leader_id}/jobs',
+            f'/api/v2/jobs?all=1&include_archived=1&team_leader_id={leader_id}']
+    counts = {}
+    for url in urls:
+        response = client.get(url)
+        assert response.status_code == 200, url
+        counts[url] = int(response.headers['X-DB-Queries'])
+    return counts
+
+
+def test_job_lists_use_constant_number_of_queries(client, leader_id, monkeypatch):
+    # считаются запросы самих представлений; add_jobs пишет мимо сессии и кэш ответов не сбрасывает
+    monkeypatch.setattr(response_cache.get_cache(), 'size', 0)
+    add_jobs(leader_id, 10)
+    small = query_counts(client, leader_id)
+    [(status, body)] = run(('GET', f'/api/v2/jobs?all=1&team_leader_id={leader_id}'))
+    assert status == 200 and all(len(job['categories']) == 2 for job in body['jobs'])
+
+    add_jobs(leader_id, 9990)
+    large = query_counts(client, leader_id)
+    assert large == small
+    assert max(small.values()) <= 3
+
+    jobs = client.get(f'/api/v2/jobs?limit=1000&team_leader_id={leader_id}').get_json()['jobs']
+    assert len(jobs) == 1000 and all([c['id'] for c in job['categories']] == [1, 2] for job in jobs)
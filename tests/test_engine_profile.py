@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+from database import engine_profile
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = engine_profile.create_engine(str(tmp_path / 'profile.db'), {
+        'pool_size': 1, 'max_overflow': 0, 'pool_timeout': 5, 'cache_size': -2000})
+    yield engine
+    engine.dispose()
+
+
+def test_fresh_connection_gets_profile_pragmas(engine):
+    with engine.connect() as connection:
+        def pragma(name):
+            return connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('synchronous') == 1  # NORMAL
+        assert pragma('cache_size') == -2000, "profile overrides replace the defaults"
+        assert pragma('temp_store') == 2  # MEMORY
+        assert pragma('busy_timeout') == 5000
+    assert engine.pool.stats.snapshot()['connects'] == 1
+
+    with pytest.raises(ValueError):
+        engine_profile.build_profile({'unknown_pragma': 1})
+
+
+def test_pool_counters_after_exhaustion(engine):
+    holder = engine.connect()
+    got_connection = threading.Event()
+
+    def wait_for_connection():
+        with engine.connect():
+            got_connection.set()
+
+    waiter = threading.Thread(target=wait_for_connection)
+    waiter.start()
+    # пул из одного соединения без overflow исчерпан: второй поток ждет возврата
+    assert not got_connection.wait(0.1)
+    holder.close()
+    waiter.join(5)
+    assert got_connection.is_set()
+
+    stats = engine.pool.stats.snapshot()
+    assert stats['connects'] == 1
+    assert stats['checkouts'] == 2 and stats['checkins'] == 2 and stats['checked_out'] == 0
+    assert stats['waits'] == 1 and stats['max_wait_ms'] >= 50
+
+
+def test_metrics_report_pool_counters(client):
+    before = client.get('/api/metrics').get_json()['pool']
+    client.get('/api/v2/users/1')
+    after = client.get('/api/metrics').get_json()['pool']
+    assert after['checkouts'] > before['checkouts'] and after['checkins'] > before['checkins']
+    assert after['checked_out'] == 0 and 'pool_size' in after and 'wait_time_ms' in after
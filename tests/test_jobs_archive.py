@@ -0,0 +1,74 @@
+import datetime
+
+import sqlalchemy
+
+from database import archive, db_session, engine_profile, migrations
+from models.category import Category
+from models.jobs import Jobs
+
+OLD = datetime.datetime(2020, 1, 1)
+
+
+def add_job(session, **fields):
+    job = Jobs(job=fields.pop('job', 'archive test'), team_leader=1, work_size=1, **fields)
+    session.add(job)
+    session.commit()
+    return job.id
+
+
+def test_archive_moves_only_old_finished_jobs(client):
+    session = db_session.new_session()
+    try:
+        old_id = add_job(session, is_finished=True, start_date=OLD, end_date=OLD, collaborators='2',
+                         categories=[session.get(Category, 1)])
+        unfinished_id = add_job(session, is_finished=False, start_date=OLD)
+        recent_id = add_job(session, is_finished=True, start_date=datetime.datetime.now())
+        latest_id = add_job(session, is_finished=True, start_date=OLD, job='latest')
+
+        moved = archive.archive_finished_jobs(session, datetime.timedelta(days=30), batch_size=1)
+        assert moved >= 2
+        assert session.get(Jobs, old_id) is None and session.get(Jobs, latest_id) is None
+        assert session.get(Jobs, unfinished_id) is not None and session.get(Jobs, recent_id) is not None
+    finally:
+        session.close()
+
+    hot = [job['id'] for job in client.get('/api/v2/jobs?all=1').get_json()['jobs']]
+    assert old_id not in hot and recent_id in hot
+
+    listed = {job['id']: job for job in client.get('/api/v2/jobs?include_archived=1&all=1').get_json()['jobs']}
+    assert listed[old_id]['archived'] is True and listed[recent_id]['archived'] is False
+    assert [category['id'] for category in listed[old_id]['categories']] == [1]
+
+    response = client.get(f'/api/v2/jobs/{old_id}')
+    assert response.status_code == 200
+    assert response.get_json()['job']['collaborators'] == '2'
+    assert client.get(f'/api/jobs/{old_id}').get_json()['job']['archived'] is True
+    assert client.put(f'/api/v2/jobs/{old_id}', json={'work_size': 2}).status_code == 404
+
+    # ID архивной работы не достается новой работе, даже если она была последней
+    session = db_session.new_session()
+    try:
+        assert add_job(session) > latest_id
+    finally:
+        session.close()
+
+
+def test_migration_adds_autoincrement_to_legacy_jobs(tmp_path):
+    db_file = str(tmp_path / 'legacy.db')
+    engine = engine_profile.create_engine(db_file)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            'CREATE TABLE jobs (id INTEGER NOT NULL PRIMARY KEY, team_leader INTEGER, job VARCHAR, '
+            'work_size INTEGER, collaborators VARCHAR, start_date DATETIME, end_date DATETIME, is_finished BOOLEAN)')
+        connection.exec_driver_sql("INSERT INTO jobs (id, job, collaborators) VALUES (7, 'legacy', '1')")
+
+    migrations.upgrade(engine)
+
+    with engine.connect() as connection:
+        ddl = connection.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'jobs'").scalar()
+        assert 'AUTOINCREMENT' in ddl
+        assert connection.exec_driver_sql('SELECT job FROM jobs WHERE id = 7').scalar() == 'legacy'
+        assert connection.execute(sqlalchemy.text(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'index' AND tbl_name = 'jobs'")).scalar() >= 3
+        assert migrations.current_version(connection) == migrations.latest_version()
+    engine.dispose()
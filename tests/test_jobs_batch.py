@@ -0,0 +1,125 @@
+import pytest
+
+
+from test_list_filters import captured_sql
+
+
+def job_ids(client, leader_id):
+    return {job['id'] for job in client.get(f'/api/v2/jobs?all=1&team_leader_id={leader_id}').get_json()['jobs']}
+
+
+def test_batch_create_update_delete(client):
+    items = [{'job': f'batch {i}', 'team_leader_id': 3, 'work_size': i, 'collaborators': '1, 2',
+              'category_ids': [2, 1], 'end_date': '2026-03-01T10:00:00'} for i in range(20)]
+    with captured_sql() as statements:
+        response = client.post('/api/v2/jobs/batch', json={'jobs': items})
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['succeeded'] == 20 and body['failed'] == 0
+    created = [result['id'] for result in body['results']]
+    assert [result['index'] for result in body['results']] == list(range(20))
+    assert body['results'][5]['job']['work_size'] == 5
+    assert body['results'][5]['job']['categories'] == [{'id': 1, 'name': 'first'}, {'id': 2, 'name': 'second'}]
+    assert body['results'][5]['job']['end_date'] == '2026-03-01T10:00:00'
+    # проверки ссылок - по одному IN на вид, запись - пачками, а не по запросу на работу
+    assert len([s for s in statements if s.lstrip().upper().startswith(('SELECT', 'INSERT'))]) < 10
+    assert set(created) <= job_ids(client, 3)
+    single = client.get(f'/api/v2/jobs/{created[0]}').get_json()['job']
+    assert single == body['results'][0]['job']
+
+    response = client.patch('/api/v2/jobs/batch', json={'jobs': [
+        {'id': created[0], 'work_size': 100, 'is_finished': True},
+        {'id': created[1], 'category_ids': [2], 'collaborators': '2'},
+        {'id': created[2], 'job': 'renamed'},
+    ]})
+    assert response.status_code == 200
+    jobs = {result['id']: result['job'] for result in response.get_json()['results']}
+    assert jobs[created[0]]['work_size'] == 100 and jobs[created[0]]['is_finished'] is True
+    assert [c['id'] for c in jobs[created[1]]['categories']] == [2] and jobs[created[1]]['collaborators'] == '2'
+    assert jobs[created[2]]['job'] == 'renamed' and jobs[created[2]]['work_size'] == 2
+    assert client.get(f'/api/v2/jobs/{created[1]}').get_json()['job'] == jobs[created[1]]
+
+    response = client.delete('/api/v2/jobs/batch', json={'ids': created})
+    assert response.status_code == 200 and response.get_json()['succeeded'] == 20
+    assert not set(created) & job_ids(client, 3)
+    assert client.get(f'/api/v2/jobs/{created[0]}').status_code == 404
+
+
+def test_atomic_batch_writes_nothing_on_error(client):
+    before = job_ids(client, 2)
+    response = client.post('/api/v2/jobs/batch', json={'jobs': [
+        {'job': 'ok', 'team_leader_id': 2},
+        {'job': 'bad leader', 'team_leader_id': 999999},
+        {'job': 'bad category', 'team_leader_id': 2, 'category_ids': [1, 999]},
+        {'team_leader_id': 2},
+        {'job': 'bad date', 'team_leader_id': 2, 'start_date': 'yesterday'},
+    ]})
+    assert response.status_code == 400
+    body = response.get_json()
+    assert [result['status'] for result in body['results']] == [424, 400, 400, 400, 400]
+    assert body['results'][1]['error'] == 'Team leader with id 999999 not found.'
+    assert body['results'][2]['error'] == 'Category with id 999 not found.'
+    assert body['results'][3]['error'] == 'Missing required field: job'
+    assert body['succeeded'] == 0 and body['failed'] == 5
+    assert job_ids(client, 2) == before
+
+
+def test_best_effort_batch_applies_valid_items(client):
+    [job_id] = [r['id'] for r in client.post('/api/v2/jobs/batch', json={
+        'jobs': [{'job': 'kept', 'team_leader_id': 2}]}).get_json()['results']]
+    response = client.patch('/api/v2/jobs/batch', json={'mode': 'best_effort', 'jobs': [
+        {'id': job_id, 'work_size': 7},
+        {'id': 999999, 'work_size': 1},
+        {'id': job_id, 'work_size': 8},
+        {'id': job_id},
+    ]})
+    assert response.status_code == 207
+    body = response.get_json()
+    assert [result['status'] for result in body['results']] == [200, 404, 400, 400]
+    assert client.get(f'/api/v2/jobs/{job_id}').get_json()['job']['work_size'] == 7
+
+    response = client.delete('/api/v2/jobs/batch', json={'mode': 'best_effort', 'ids': [job_id, 999999, 'x']})
+    assert response.status_code == 207
+    assert [result['status'] for result in response.get_json()['results']] == [200, 404, 400]
+    assert client.get(f'/api/v2/jobs/{job_id}').status_code == 404
+
+
+@pytest.mark.parametrize('body', [None, {}, {'jobs': 'x'}, {'jobs': [], 'mode': 'sometimes'}])
+def test_malformed_batch(client, body):
+    assert client.post('/api/v2/jobs/batch', json=body).status_code == 400
+
+
+def test_batch_size_limit(client, monkeypatch):
+    from api import jobs_batch
+    monkeypatch.setattr(jobs_batch, 'MAX_ITEMS', 2)
+    assert client.delete('/api/v2/jobs/batch', json={'ids': [1, 2, 3]}).status_code == 413
+
+
+def test_is_finished_strings_are_parsed_not_truthy(client):
+    [job_id] = [r['id'] for r in client.post('/api/v2/jobs/batch', json={
+        'jobs': [{'job': 'flags', 'team_leader_id': 2, 'is_finished': 'true'}]}).get_json()['results']]
+    assert client.get(f'/api/v2/jobs/{job_id}').get_json()['job']['is_finished'] is True
+    for value in ('false', '0', False):
+        response = client.patch('/api/v2/jobs/batch', json={'jobs': [{'id': job_id, 'is_finished': value}]})
+        assert response.status_code == 200
+        assert response.get_json()['results'][0]['job']['is_finished'] is False
+    response = client.patch('/api/v2/jobs/batch', json={'jobs': [{'id': job_id, 'is_finished': 'maybe'}]})
+    assert response.status_code == 400
+    assert response.get_json()['results'][0]['error'] == "Invalid value for is_finished: 'maybe'"
+
+
+@pytest.mark.parametrize('field, value', [('team_leader_id', True), ('team_leader_id', 2.5),
+                                          ('work_size', 12.7), ('work_size', False), ('work_size', [1])])
+def test_integer_fields_reject_bools_and_fractions(client, field, value):
+    item = {'job': 'strict', 'team_leader_id': 2, field: value}
+    response = client.post('/api/v2/jobs/batch', json={'jobs': [item]})
+    assert response.status_code == 400
+    assert response.get_json()['results'][0]['error'] == f'Invalid value for {field}: {value!r}'
+
+
+def test_integral_floats_and_numeric_strings_are_accepted(client):
+    response = client.post('/api/v2/jobs/batch', json={'jobs': [
+        {'job': 'float', 'team_leader_id': 2.0, 'work_size': '12'}]})
+    assert response.status_code == 201
+    job = response.get_json()['results'][0]['job']
+    assert job['team_leader_id'] == 2 and job['work_size'] == 12
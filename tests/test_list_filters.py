@@ -0,0 +1,100 @@
+import contextlib
+
+import pytest
+from sqlalchemy import event
+
+from database import db_session
+from test_async_api import run
+
+
+@contextlib.contextmanager
+def captured_sql():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db_session.get_engine()
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+
+def ids(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    return {item['id'] for item in body.get('jobs', body.get('users', []))}
+
+
+@pytest.fixture(scope='module')
+def created(app):
+    client = app.test_client()
+    users = {}
+    for key, address, age, speciality in [('kid', 'module_9', 15, 'engineer'), ('teen', 'module_9', 17, 'pilot'),
+                                          ('adult', 'module_9', 30, 'chief engineer'),
+                                          ('other', 'module_8', 12, '100%_sure')]:
+        response = client.post('/api/v2/users', json={'name': key, 'address': address, 'age': age,
+                                                      'speciality': speciality, 'email': f'{key}.filters@mars.org',
+                                                      'password': 'pw'})
+        users[key] = response.get_json()['id']
+    jobs = {}
+    for key, work_size, finished, categories in [('small', 10, False, [1]), ('big', 30, False, [2]),
+                                                 ('done', 5, True, [1, 2])]:
+        response = client.post('/api/v2/jobs', json={'job': f'filter {key}', 'team_leader_id': users['adult'],
+                                                     'work_size': work_size, 'is_finished': finished,
+                                                     'category_ids': categories})
+        jobs[key] = response.get_json()['id']
+    return users, jobs
+
+
+def test_user_filters(client, created):
+    users, _ = created
+    assert ids(client, '/api/v2/users?all=1&address=module_9&age_lt=18') == {users['kid'], users['teen']}
+    assert ids(client, '/api/users?address=module_9&age_gt=16&age_lt=40') == {users['teen'], users['adult']}
+    assert ids(client, '/api/v2/users?all=1&address=module_9&speciality_contains=engineer') == {
+        users['kid'], users['adult']}
+    # % и _ ищутся буквально, а не как шаблон LIKE
+    assert ids(client, '/api/v2/users?all=1&speciality_contains=0%25_') == {users['other']}
+    assert ids(client, '/api/v2/users?all=1&speciality_contains=x%25') == set()
+
+
+def test_job_filters(client, created):
+    users, jobs = created
+    leader = users['adult']
+    assert ids(client, f'/api/v2/jobs?team_leader_id={leader}&is_finished=0&work_size_lt=20') == {jobs['small']}
+    assert ids(client, f'/api/jobs?team_leader_id={leader}&work_size_gt=8') == {jobs['small'], jobs['big']}
+    assert ids(client, f'/api/v2/jobs?team_leader_id={leader}&category_id=2&limit=1') <= {jobs['big'], jobs['done']}
+    assert ids(client, f'/api/v2/jobs?all=1&team_leader_id={leader}&category_id=2') == {jobs['big'], jobs['done']}
+    assert ids(client, f'/api/v2/jobs?all=1&team_leader_id={leader}&is_finished=true') == {jobs['done']}
+
+    [(status, body)] = run(('GET', f'/api/v2/jobs?team_leader_id={leader}&is_finished=0&fields=id,work_size'))
+    assert status == 200
+    assert sorted(body['jobs'], key=lambda job: job['id']) == [
+        {'id': jobs['small'], 'work_size': 10}, {'id': jobs['big'], 'work_size': 30}]
+
+
+def test_fields_project_columns_in_sql(client, created):
+    users, jobs = created
+    with captured_sql() as statements:
+        body = client.get(f"/api/v2/jobs?team_leader_id={users['adult']}&fields=job,id").get_json()
+    assert all(set(job) == {'job', 'id'} for job in body['jobs'])
+    [select] = [statement for statement in statements if 'FROM jobs' in statement and 'count(' not in statement]
+    assert 'jobs.collaborators' not in select and 'jobs.start_date' not in select
+    assert not any('categories' in statement for statement in statements)
+
+    with captured_sql() as statements:
+        body = client.get(f"/api/v2/jobs?team_leader_id={users['adult']}&fields=id,categories").get_json()
+    assert {job['id']: [c['id'] for c in job['categories']] for job in body['jobs']}[jobs['done']] == [1, 2]
+    assert len([statement for statement in statements if 'categories' in statement]) == 1
+
+    user = client.get("/api/users?address=module_8&fields=email").get_json()['users'][0]
+    assert user == {'email': 'other.filters@mars.org'}
+
+
+@pytest.mark.parametrize('url', ['/api/v2/jobs?fields=id,secret', '/api/v2/jobs?is_finished=maybe',
+                                 '/api/v2/users?age_lt=x', '/api/jobs?work_size_gt=big', '/api/users?fields=hashed_password'])
+def test_bad_filter_or_fields(client, url):
+    assert client.get(url).status_code == 400
@@ -0,0 +1,88 @@
+import pytest
+
+from database import engine_profile
+from database import migrations
+
+# Схема, которую создавал create_all до миграций: у association нет первичного ключа
+BASELINE_SCHEMA = '''
+CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, surname VARCHAR, name VARCHAR, age INTEGER,
+    position VARCHAR, speciality VARCHAR, address VARCHAR, email VARCHAR, hashed_password VARCHAR,
+    modified_date DATETIME, city_from VARCHAR);
+CREATE UNIQUE INDEX ix_users_email ON users (email);
+CREATE TABLE categories (id INTEGER PRIMARY KEY AUTOINCREMENT, name VARCHAR);
+CREATE TABLE jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, team_leader INTEGER REFERENCES users (id), job VARCHAR,
+    work_size INTEGER, collaborators VARCHAR, start_date DATETIME, end_date DATETIME, is_finished BOOLEAN);
+CREATE TABLE association (jobs INTEGER REFERENCES jobs (id), category INTEGER REFERENCES categories (id));
+CREATE TABLE departments (id INTEGER PRIMARY KEY AUTOINCREMENT, title VARCHAR, chief INTEGER REFERENCES users (id),
+    members VARCHAR, email VARCHAR UNIQUE);
+INSERT INTO users (id, name, email) VALUES (1, 'Name1', 'user1@mars.org'), (2, 'Name2', 'user2@mars.org');
+INSERT INTO categories (id, name) VALUES (1, 'first'), (2, 'second');
+INSERT INTO jobs (id, team_leader, job, work_size, collaborators, is_finished)
+    VALUES (1, 1, 'old job', 10, '2, 1', 0);
+INSERT INTO association (jobs, category) VALUES (1, 1), (1, 1), (1, 2), (1, NULL);
+INSERT INTO departments (id, title, chief, members) VALUES (1, 'old department', 1, '1, 2');
+'''
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = engine_profile.create_engine(str(tmp_path / 'migrations.db'))
+    yield engine
+    engine.dispose()
+
+
+def version(engine):
+    with engine.connect() as connection:
+        return migrations.current_version(connection)
+
+
+def rows(engine, sql):
+    with engine.connect() as connection:
+        return connection.exec_driver_sql(sql).all()
+
+
+def test_upgrade_empty_database(engine):
+    applied = migrations.upgrade(engine)
+    assert applied == [number for number, _, _ in migrations.MIGRATIONS]
+    assert version(engine) == migrations.latest_version()
+    tables = {name for name, in rows(engine, "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {'users', 'jobs', 'association', 'job_collaborators', 'department_members', 'jobs_archive'} <= tables
+
+
+def test_second_upgrade_is_noop(engine):
+    migrations.upgrade(engine)
+    schema = rows(engine, 'SELECT type, name, sql FROM sqlite_master ORDER BY name')
+    assert migrations.upgrade(engine) == []
+    assert rows(engine, 'SELECT type, name, sql FROM sqlite_master ORDER BY name') == schema
+
+
+def test_upgrade_create_all_baseline(engine):
+    with engine.connect() as connection:
+        connection.connection.executescript(BASELINE_SCHEMA)
+
+    assert migrations.upgrade(engine)[0] == 1
+    assert version(engine) == migrations.latest_version()
+    primary_key = [row[1] for row in rows(engine, 'PRAGMA table_info(association)') if row[5]]
+    assert sorted(primary_key) == ['category', 'jobs']
+    assert rows(engine, 'SELECT jobs, category FROM association ORDER BY category') == [(1, 1), (1, 2)], \
+        "duplicate and incomplete association rows are dropped"
+    assert rows(engine, 'SELECT user_id FROM job_collaborators ORDER BY user_id') == [(1,), (2,)]
+    assert rows(engine, 'SELECT user_id FROM department_members ORDER BY user_id') == [(1,), (2,)]
+    assert rows(engine, 'SELECT job, work_size FROM jobs') == [('old job', 10)]
+
+
+def test_failed_migration_rolls_back(engine, monkeypatch):
+    migrations.upgrade(engine)
+    latest = migrations.latest_version()
+
+    def broken(connection):
+        connection.exec_driver_sql('CREATE TABLE half_done (id INTEGER)')
+        connection.exec_driver_sql('INSERT INTO users (name) VALUES (\'half\')')
+        raise RuntimeError('миграция упала')
+
+    monkeypatch.setattr(migrations, 'MIGRATIONS', migrations.MIGRATIONS + [(latest + 1, 'broken', broken)])
+    with pytest.raises(RuntimeError):
+        migrations.upgrade(engine)
+    assert version(engine) == latest
+    assert not rows(engine, "SELECT name FROM sqlite_master WHERE name = 'half_done'")
+    assert not rows(engine, "SELECT id FROM users WHERE name = 'half'")
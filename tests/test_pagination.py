@@ -0,0 +1,79 @@
+import datetime
+import types
+
+import pytest
+
+from database import pagination
+from test_async_api import run
+
+
+def walk(client, url, key, **params):
+    """Все ID списка, собранные по страницам через курсор next."""
+    ids, cursor = [], None
+    while True:
+        query = dict(params, **({'cursor': cursor} if cursor else {}))
+        response = client.get(url, query_string=query)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        assert len(body[key]) <= params['limit']
+        ids.extend(item['id'] for item in body[key])
+        cursor = body['next']
+        if cursor is None:
+            return ids
+
+
+def expected_order(items, field, descending):
+    ordered = sorted(items, key=lambda item: (item[field] is not None, item[field], item['id']), reverse=descending)
+    return [item['id'] for item in ordered]
+
+
+@pytest.fixture(scope='module')
+def jobs(app):
+    client = app.test_client()
+    for work_size in (5, None, 5, 1, None, 9, 5):
+        response = client.post('/api/v2/jobs', json={'job': 'paged', 'team_leader_id': 1, 'work_size': work_size})
+        assert response.status_code == 201
+    return client.get('/api/v2/jobs?all=1').get_json()['jobs']
+
+
+@pytest.mark.parametrize('sort', ['id', '-id', 'work_size', '-work_size', 'start_date', '-start_date'])
+def test_jobs_keyset_walk_matches_full_list(client, jobs, sort):
+    field, descending = sort.lstrip('-'), sort.startswith('-')
+    expected = expected_order(jobs, field, descending)
+    assert walk(client, '/api/v2/jobs', 'jobs', limit=2, sort=sort) == expected
+    assert walk(client, '/api/jobs', 'jobs', limit=3, sort=sort) == expected
+
+
+def test_users_keyset_walk_and_async(client, jobs):
+    users = client.get('/api/v2/users?all=1').get_json()['users']
+    assert 'next' not in client.get('/api/v2/users?all=1').get_json()
+    assert walk(client, '/api/v2/users', 'users', limit=2, sort='-surname') == expected_order(users, 'surname', True)
+    assert walk(client, '/api/users', 'users', limit=1, sort='age') == expected_order(users, 'age', False)
+
+    first = client.get('/api/v2/jobs?limit=3&sort=-work_size').get_json()
+    [(status, page), (status_next, next_page)] = run(
+        ('GET', '/api/v2/jobs?limit=3&sort=-work_size'),
+        ('GET', f"/api/v2/jobs?limit=3&cursor={first['next']}"),
+    )
+    assert status == 200 and [job['id'] for job in page['jobs']] == [job['id'] for job in first['jobs']]
+    second = client.get(f"/api/v2/jobs?limit=3&cursor={first['next']}").get_json()
+    assert status_next == 200 and [job['id'] for job in next_page['jobs']] == [job['id'] for job in second['jobs']]
+
+
+def test_bad_page_arguments(client, jobs):
+    cursor = client.get('/api/v2/jobs?limit=1&sort=work_size').get_json()['next']
+    for url in ('/api/v2/jobs?limit=0', '/api/v2/jobs?limit=x', '/api/v2/jobs?sort=job',
+                '/api/v2/jobs?cursor=garbage', f'/api/v2/jobs?cursor={cursor}&sort=-work_size',
+                '/api/jobs?limit=100000', '/api/users?sort=email'):
+        assert client.get(url).status_code == 400, url
+    assert client.get(f'/api/v2/jobs?cursor={cursor}&sort=work_size').status_code == 200
+
+
+def test_cursor_round_trip():
+    page = pagination.parse({'sort': '-start_date', 'limit': '5'}, pagination.JOB_SORT_KEYS)
+    assert page == pagination.PageRequest(5, 'start_date', True, None)
+    item = types.SimpleNamespace(id=7, start_date=datetime.datetime(2025, 3, 1, 12, 30))
+    cursor = pagination.encode_cursor(page, item)
+    assert pagination.decode_cursor(cursor) == ('start_date', True, ('2025-03-01T12:30:00', 7))
+    with pytest.raises(pagination.PageError):
+        pagination.decode_cursor(cursor[:-3])
@@ -0,0 +1,69 @@
+import pytest
+
+from database import db_session
+from database import passwords
+from models.users import User
+
+
+@pytest.fixture
+def cheap_pbkdf2(app):
+    passwords.configure('pbkdf2:sha256', 1000, workers=1, max_pending=4)
+    yield
+    passwords.init_app(app)
+
+
+def test_method_string_matches_werkzeug_prefix():
+    assert passwords.method_string() == 'scrypt:32768:8:1'
+    assert passwords.method_string('scrypt', 16384) == 'scrypt:16384:8:1'
+    assert passwords.method_string('pbkdf2') == 'pbkdf2:sha256:1000000'
+    assert passwords.method_string('pbkdf2:sha512', 1000) == 'pbkdf2:sha512:1000'
+    with pytest.raises(ValueError):
+        passwords.method_string('md5')
+
+
+def test_hashes_are_computed_in_the_pool(cheap_pbkdf2):
+    hashed = passwords.hash_password('secret')
+    assert hashed.startswith('pbkdf2:sha256:1000$')
+    assert passwords.check_password(hashed, 'secret') and not passwords.check_password(hashed, 'wrong')
+    assert not passwords.needs_rehash(hashed) and passwords.needs_rehash('scrypt:32768:8:1$salt$hash')
+    stats = passwords.stats()
+    assert stats['workers'] == 1 and stats['pending'] == 0 and stats['max_pending'] >= 1
+
+
+def test_old_hash_is_upgraded_on_login(client, cheap_pbkdf2):
+    session = db_session.new_session()
+    try:
+        # хеш со старой стоимостью, как у пользователей до смены настроек
+        passwords.configure('pbkdf2:sha256', 500, workers=1)
+        user = User(name='Rehash', email='rehash@mars.org')
+        user.set_password('password')
+        session.add(user)
+        session.commit()
+        passwords.configure('pbkdf2:sha256', 1000, workers=1)
+
+        assert client.post('/login', data={'email': 'rehash@mars.org', 'password': 'wrong'}).status_code == 200
+        session.refresh(user)
+        assert user.hashed_password.startswith('pbkdf2:sha256:500$'), "a failed login does not rehash"
+
+        assert client.post('/login', data={'email': 'rehash@mars.org', 'password': 'password'}).status_code == 302
+        session.refresh(user)
+        assert user.hashed_password.startswith('pbkdf2:sha256:1000$') and user.check_password('password')
+        client.get('/logout')
+    finally:
+        session.close()
+
+
+def test_full_queue_is_rejected_with_503(client, cheap_pbkdf2, monkeypatch):
+    monkeypatch.setattr(passwords, '_pending', passwords.stats()['limit'])
+    rejected = passwords.stats()['rejected']
+    response = client.post('/api/v2/users', json={'name': 'Busy', 'email': 'busy@mars.org', 'password': 'password'})
+    assert response.status_code == 503 and response.headers['Retry-After'] == '1'
+    assert passwords.stats()['rejected'] == rejected + 1
+    monkeypatch.undo()
+    assert client.get('/api/metrics').get_json()['passwords']['method'] == 'pbkdf2:sha256:1000'
+
+
+def test_pool_initializer_without_os_nice(monkeypatch):
+    # В Windows os.nice нет: процесс пула запускается без понижения приоритета
+    monkeypatch.delattr(passwords.os, 'nice')
+    passwords._lower_priority(passwords.DEFAULT_NICE)
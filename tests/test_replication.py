@@ -0,0 +1,69 @@
+from database import db_session
+
+
+def checkouts(engine):
+    return engine.pool.stats.snapshot()['checkouts']
+
+
+def get(client, replicator, path, **kwargs):
+    """Ответ на GET и база, выдавшая для него соединение: 'replica' или 'primary'."""
+    replica, primary = checkouts(replicator.replicas[0].engine), checkouts(db_session.get_engine())
+    response = client.get(path, **kwargs)
+    replica, primary = checkouts(replicator.replicas[0].engine) - replica, checkouts(db_session.get_engine()) - primary
+    assert bool(replica) != bool(primary), f"read used replica={replica}, primary={primary} connections"
+    return response, 'replica' if replica else 'primary'
+
+
+def test_reads_follow_write_generation(app, replicator):
+    client = app.test_client()
+    created = client.post('/api/v2/jobs', json={'job': 'replicated', 'team_leader_id': 1})
+    assert created.status_code == 201
+    job_id, generation = created.get_json()['id'], created.headers[db_session.GENERATION_HEADER]
+    assert int(generation) == replicator.generation
+    assert client.get_cookie(db_session.GENERATION_COOKIE).value == generation
+    client.delete_cookie(db_session.GENERATION_COOKIE)
+
+    response, served_by = get(client, replicator, f'/api/v2/jobs/{job_id}')
+    assert served_by == 'replica' and response.status_code == 404, "replica is not refreshed yet"
+    response, served_by = get(client, replicator, f'/api/v2/jobs/{job_id}',
+                              headers={db_session.GENERATION_HEADER: generation})
+    assert served_by == 'primary' and response.status_code == 200
+    client.set_cookie(db_session.GENERATION_COOKIE, generation)
+    response, served_by = get(client, replicator, f'/api/v2/jobs/{job_id}')
+    assert served_by == 'primary' and response.status_code == 200
+
+    replicator.sync_once()
+    response, served_by = get(client, replicator, f'/api/v2/jobs/{job_id}')
+    assert served_by == 'replica' and response.status_code == 200
+    assert client.delete(f'/api/v2/jobs/{job_id}').status_code == 200
+
+
+def test_use_primary_view_reads_primary(app, replicator):
+    client = app.test_client()
+    client.post('/login', data={'email': 'user1@mars.org', 'password': 'password'})
+    job_id = client.post('/api/v2/jobs', json={'job': 'use_primary', 'team_leader_id': 1}).get_json()['id']
+    replicator.sync_once()
+    client.delete_cookie(db_session.GENERATION_COOKIE)
+
+    response, served_by = get(client, replicator, f'/deletejob/{job_id}')
+    assert served_by == 'primary' and response.status_code == 302
+    client.get('/logout')
+
+
+def test_refresh_waits_for_replica_readers(replicator):
+    replica = replicator.replicas[0]
+    replicator.drain_timeout = 0.05
+    reader = replica.factory()
+    reader.connection()
+    try:
+        replicator.note_commit()
+        replicator.sync_once()
+        assert replica.generation < replicator.generation and replica.skipped == 1
+        assert replicator.pick() is replica, "a skipped replica stays in rotation"
+    finally:
+        reader.close()
+
+    replicator.sync_once()
+    assert replica.generation == replicator.generation and replica.errors == 0
+    stats = replicator.stats()['replicas'][0]
+    assert stats['skipped'] == 1 and stats['last_error'] is None
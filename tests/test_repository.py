@@ -0,0 +1,22 @@
+from flask import g
+
+from database import db_session
+from database import instrumentation
+from database import repository
+
+
+def test_second_lookup_uses_identity_map(app):
+    """Повторная выборка по ключу в той же сессии не выполняет SQL."""
+    with app.test_request_context('/'):
+        g.db_query_stats = instrumentation.QueryStats()
+        session = db_session.create_session()
+        user = repository.get_user(session, 1)
+        assert user is not None and g.db_query_stats.statements == 1
+
+        assert repository.get_user(session, 1) is user
+        assert g.db_query_stats.statements == 1, "a cached object must not issue a SELECT"
+
+        assert repository.get_user(session, 99999) is None
+        assert g.db_query_stats.statements == 2, "a miss goes to the database"
+        session.expunge(user)
+        assert repository.get_user(session, 1) is not user and g.db_query_stats.statements == 3
@@ -0,0 +1,88 @@
+import pytest
+
+from database import db_session
+from database import response_cache
+from models.category import Category
+
+
+@pytest.fixture
+def cache(app):
+    cache = response_cache.get_cache()
+    cache.clear()
+    return cache
+
+
+def test_list_is_served_from_cache_until_a_write(client, cache):
+    first = client.get('/api/v2/jobs?team_leader_id=1&limit=50')
+    assert first.headers['X-Cache'] == 'MISS'
+    # порядок аргументов не важен
+    second = client.get('/api/v2/jobs?limit=50&team_leader_id=1')
+    assert second.headers['X-Cache'] == 'HIT' and second.get_json() == first.get_json()
+    assert second.headers['X-DB-Queries'] == '0'
+    assert client.get('/api/v2/jobs?limit=50&team_leader_id=1',
+                      headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    users = client.get('/api/v2/users?all=1')
+
+    job_id = client.post('/api/v2/jobs', json={'job': 'cached', 'team_leader_id': 1}).get_json()['id']
+    third = client.get('/api/v2/jobs?team_leader_id=1&limit=50')
+    assert third.headers['X-Cache'] == 'MISS' and job_id in [job['id'] for job in third.get_json()['jobs']]
+    # запись в jobs не трогает кэш списка колонистов
+    assert client.get('/api/v2/users?all=1').headers['X-Cache'] == 'HIT'
+
+    assert client.put(f'/api/jobs/{job_id}', json={'category_ids': [2]}).status_code == 200
+    [job] = [job for job in client.get('/api/jobs?all=1&team_leader_id=1').get_json()['jobs'] if job['id'] == job_id]
+    assert [category['id'] for category in job['categories']] == [2]
+
+    assert client.put('/api/v2/users/1', json={'city_from': 'кэш'}).status_code == 200
+    changed = client.get('/api/v2/users?all=1')
+    assert changed.headers['X-Cache'] == 'MISS' and changed.get_json() != users.get_json()
+
+
+def test_category_rename_invalidates_job_lists(client, cache):
+    client.post('/api/v2/jobs', json={'job': 'renamed', 'team_leader_id': 2, 'category_ids': [1]})
+    client.get('/api/jobs?team_leader_id=2&all=1')
+    session = db_session.new_session()
+    try:
+        session.get(Category, 1).name = 'first renamed'
+        session.commit()
+        names = {category['name'] for job in client.get('/api/jobs?team_leader_id=2&all=1').get_json()['jobs']
+                 for category in job['categories']}
+        assert 'first renamed' in names
+    finally:
+        session.get(Category, 1).name = 'first'
+        session.commit()
+        session.close()
+
+
+def test_departments_page_is_cached_per_user(client, cache):
+    assert client.get('/departments').headers['X-Cache'] == 'MISS'
+    assert client.get('/departments').headers['X-Cache'] == 'HIT'
+    client.post('/login', data={'email': 'user2@mars.org', 'password': 'password'})
+    page = client.get('/departments')
+    assert page.headers['X-Cache'] == 'MISS' and 'Name2' in page.get_data(as_text=True)
+    assert client.get('/departments').headers['X-Cache'] == 'HIT'
+    client.get('/logout')
+
+
+def test_lru_eviction_ttl_and_metrics(client):
+    cache = response_cache.ResponseCache(size=2, ttl=60)
+    for key in 'abc':
+        assert cache.put(key, b'', 200, [], {'jobs'}, cache.generation({'jobs'}))
+    assert cache.get('a') is None and cache.get('c') is not None
+    stale = cache.generation({'users'})
+    cache.invalidate({'users'})
+    assert not cache.put('d', b'', 200, [], {'users'}, stale), "a response built before the commit is not stored"
+    cache.invalidate({'jobs'})
+    assert cache.get('b') is None and cache.get('c') is None
+
+    expired = response_cache.ResponseCache(size=2, ttl=0)
+    expired.put('a', b'', 200, [], {'jobs'}, expired.generation({'jobs'}))
+    assert expired.get('a') is None
+    assert cache.stats()['evictions'] == 1 and cache.stats()['invalidations'] == 2
+    assert expired.stats()['expirations'] == 1
+
+    response_cache.get_cache().clear()
+    client.get('/api/users')
+    client.get('/api/users')
+    stats = client.get('/api/metrics').get_json()['response_cache']
+    assert stats['hits'] >= 1 and stats['misses'] >= 1 and 'evictions' in stats and stats['hit_rate'] > 0
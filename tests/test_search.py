@@ -0,0 +1,77 @@
+from database import db_session, search
+from models.category import Category
+
+
+def search_ids(client, q, section='jobs', **params):
+    response = client.get('/api/v2/search', query_string=dict(params, q=q))
+    assert response.status_code == 200, response.get_json()
+    return [item['id'] for item in response.get_json()[section]['items']]
+
+
+def test_search_follows_job_writes(client):
+    response = client.post('/api/v2/jobs', json={'job': 'Калибровка марсохода', 'team_leader_id': 1,
+                                                 'category_ids': [1]})
+    job_id = response.get_json()['id']
+    assert job_id in search_ids(client, 'марсоход')
+    assert job_id in search_ids(client, 'калиб first')
+
+    response = client.get('/api/v2/search', query_string={'q': 'марсоход', 'type': 'jobs'})
+    body = response.get_json()
+    assert 'users' not in body
+    hit = next(item for item in body['jobs']['items'] if item['id'] == job_id)
+    assert '<mark>марсохода</mark>' in hit['snippet'].lower()
+
+    client.put(f'/api/v2/jobs/{job_id}', json={'job': 'Ремонт шлюза', 'category_ids': [2]})
+    assert job_id not in search_ids(client, 'марсоход')
+    assert job_id in search_ids(client, 'шлюз second')
+    assert job_id not in search_ids(client, 'шлюз first')
+
+    session = db_session.new_session()
+    try:
+        session.get(Category, 2).name = 'airlock'
+        session.commit()
+        assert job_id in search_ids(client, 'airlock')
+        session.get(Category, 2).name = 'second'
+        session.commit()
+    finally:
+        session.close()
+
+    client.delete(f'/api/v2/jobs/{job_id}')
+    assert job_id not in search_ids(client, 'шлюз')
+
+
+def test_search_users_ranking_and_pagination(client):
+    ids = []
+    for i, speciality in enumerate(['климатолог', 'пилот', 'климатолог климатолог']):
+        response = client.post('/api/v2/users', json={'name': 'Искатель', 'surname': f'Поисков{i}',
+                                                      'speciality': speciality,
+                                                      'email': f'search{i}@mars.org', 'password': 'pw'})
+        ids.append(response.get_json()['id'])
+
+    found = search_ids(client, 'климатолог искатель', 'users')
+    assert set(found) == {ids[0], ids[2]}
+    assert found[0] == ids[2]
+
+    first = search_ids(client, 'искатель', 'users', per_page=2)
+    second = search_ids(client, 'искатель', 'users', per_page=2, page=2)
+    assert len(first) == 2 and not set(first) & set(second)
+    body = client.get('/api/v2/search', query_string={'q': 'искатель', 'per_page': 2}).get_json()
+    assert body['users']['total'] == 3
+
+    client.put(f'/api/v2/users/{ids[1]}', json={'surname': 'Штурманов'})
+    assert ids[1] in search_ids(client, 'штурманов', 'users')
+
+
+def test_search_rejects_bad_queries(client):
+    assert client.get('/api/v2/search').status_code == 400
+    assert client.get('/api/v2/search?q=%22%2A%28').status_code == 400
+    assert client.get('/api/v2/search?q=x&per_page=1000').status_code == 400
+    assert client.get('/api/v2/search?q=x&type=planets').status_code == 400
+    # Операторы FTS5 в запросе - обычные слова, а не синтаксис
+    assert client.get('/api/v2/search?q=NOT%20OR%20"a').status_code == 200
+
+
+def test_match_query_and_highlight():
+    assert search.match_query(' Инж, марс! ') == '"инж"* "марс"*'
+    assert search.match_query('***') is None
+    assert search.highlight('<b>\x02x\x03</b>') == '&lt;b&gt;<mark>x</mark>&lt;/b&gt;'
@@ -0,0 +1,41 @@
+import datetime
+import json
+import os
+import subprocess
+import sys
+
+from api import serializers
+from test_async_api import run
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_list_rows_match_orm_objects(client):
+    """Строка выборки колонок и ORM-объект дают одинаковый JSON работы и колониста."""
+    job_id = client.post('/api/v2/jobs', json={'job': 'serialized', 'team_leader_id': 2, 'work_size': 7,
+                                               'category_ids': [2, 1], 'end_date': '2026-01-02T03:04:05'}).get_json()['id']
+    single = client.get(f'/api/v2/jobs/{job_id}').get_json()['job']
+    assert single['categories'] == [{'id': 1, 'name': 'first'}, {'id': 2, 'name': 'second'}]
+    assert single['end_date'] == '2026-01-02T03:04:05'
+    for url in ['/api/v2/jobs?all=1', '/api/jobs?all=1']:
+        [listed] = [job for job in client.get(url).get_json()['jobs'] if job['id'] == job_id]
+        assert listed == single
+    [(status, body)] = run(('GET', '/api/v2/jobs?all=1'))
+    assert status == 200 and [job for job in body['jobs'] if job['id'] == job_id] == [single]
+
+    user = client.get('/api/v2/users/1').get_json()['user']
+    assert client.get('/api/v2/users?all=1&fields=' + ','.join(user)).get_json()['users'][0] == user
+    assert user['modified_date'] is None or datetime.datetime.fromisoformat(user['modified_date'])
+
+
+def test_dumps_without_orjson():
+    value = {'b': datetime.datetime(2026, 1, 2, 3, 4, 5, 6), 'a': [datetime.date(2026, 1, 2), None, 'Марс']}
+    # в отдельном процессе: модуль выбирает кодировщик при импорте
+    script = ("import sys; sys.modules['orjson'] = None\n"
+              "import datetime\n"
+              "from api import serializers\n"
+              "assert serializers.orjson is None\n"
+              f"print(serializers.dumps({value!r}))")
+    fallback = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert json.loads(fallback.stdout) == json.loads(serializers.dumps(value)) == {
+        'a': ['2026-01-02', None, 'Марс'], 'b': '2026-01-02T03:04:05.000006'}
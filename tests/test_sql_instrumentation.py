@@ -0,0 +1,51 @@
+import pytest
+from flask import g
+
+from database import db_session
+from database import instrumentation
+from database import response_cache
+from models.users import User
+
+
+def test_headers_report_query_counts(client, monkeypatch):
+    """Debug headers report statements, DB time and rows for the request."""
+    monkeypatch.setattr(response_cache.get_cache(), 'size', 0)
+    response = client.get('/api/v2/users')
+    assert response.status_code == 200
+    assert int(response.headers['X-DB-Queries']) >= 1
+    assert int(response.headers['X-DB-Rows']) >= 3, "Loaded users must be counted as rows"
+    assert float(response.headers['X-DB-Time-ms']) >= 0
+    assert response.headers['X-DB-N-Plus-One'] == '0'
+
+
+def test_n_plus_one_detected(app):
+    """The same statement shape repeated above the threshold is flagged."""
+    with app.test_request_context('/'):
+        g.db_query_stats = instrumentation.QueryStats()
+        session = db_session.create_session()
+        for user_id in range(1, 4):
+            for _ in range(3):
+                session.expire_all()
+                session.query(User).filter(User.id == user_id).first()
+        session.query(User).filter(User.id.in_([1, 2])).all()
+        session.query(User).filter(User.id.in_([1, 2, 3])).all()
+
+        suspects = g.db_query_stats.n_plus_one(5)
+        assert len(suspects) == 1
+        shape, count = suspects[0]
+        assert count == 9 and 'WHERE users.id = ?' in shape
+        assert g.db_query_stats.shapes[instrumentation.statement_shape(
+            'SELECT 1 FROM users WHERE users.id IN (?, ?)')] == 0
+        assert max(count for shape, count in g.db_query_stats.shapes.items() if 'IN (?)' in shape) == 2
+
+
+def test_strict_budget_fails_route(app, client, monkeypatch):
+    """In strict mode a route over its query budget fails."""
+    monkeypatch.setitem(app.config, 'SQL_QUERY_BUDGET', 0)
+    monkeypatch.setitem(app.config, 'SQL_STRICT_BUDGET', True)
+    monkeypatch.setattr(response_cache.get_cache(), 'size', 0)
+    with pytest.raises(instrumentation.QueryBudgetExceeded):
+        client.get('/api/v2/users')
+
+    monkeypatch.setitem(app.config, 'SQL_QUERY_BUDGET', 100)
+    assert client.get('/api/v2/users').status_code == 200
@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+from api import streaming
+
+
+@pytest.mark.parametrize('url', ['/api/jobs', '/api/v2/jobs', '/api/v2/jobs?include_archived=1',
+                                 '/api/jobs?fields=id,categories&include_archived=1', '/api/users',
+                                 '/api/v2/users?fields=id,email&age_gt=20'])
+def test_stream_matches_full_list(client, url, monkeypatch):
+    monkeypatch.setattr(streaming, 'CHUNK_SIZE', 2)
+    for i in range(5):
+        client.post('/api/v2/jobs', json={'job': f'streamed {i}', 'team_leader_id': 1, 'category_ids': [1, 2]})
+    separator = '&' if '?' in url else '?'
+    expected = client.get(f'{url}{separator}all=1').get_json()
+
+    response = client.get(f'{url}{separator}stream=1', buffered=False)
+    assert response.status_code == 200 and response.is_streamed
+    assert response.mimetype == 'application/json'
+    chunks = list(response.response)
+    assert len(chunks) > 3, "rows must be written out in several chunks"
+    assert json.loads(b''.join(chunks)) == expected
+    response.close()
+
+
+def test_stream_empty_and_bad_arguments(client):
+    assert client.get('/api/jobs?stream=1&team_leader_id=999999').get_json() == {'jobs': []}
+    assert client.get('/api/v2/users?stream=1&age_lt=-1').get_json() == {'users': []}
+    assert client.get('/api/v2/jobs?stream=1&fields=nope').status_code == 400
+    # limit, sort и cursor в режиме выгрузки не применяются
+    assert 'next' not in client.get('/api/v2/jobs?stream=1&limit=1').get_json()
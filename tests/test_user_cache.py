@@ -0,0 +1,65 @@
+import pytest
+
+from database import user_cache
+
+
+@pytest.fixture
+def cache(app):
+    cache = user_cache.get_cache()
+    cache.clear()
+    return cache
+
+
+def greeting(client):
+    page = client.get('/index/cache')
+    return page, page.get_data(as_text=True)
+
+
+def test_logged_in_user_is_loaded_from_cache(client, cache):
+    invalidations = cache.stats()['invalidations']
+    client.post('/login', data={'email': 'user3@mars.org', 'password': 'password'})
+    page, text = greeting(client)
+    assert 'Привет, Name3!' in text and page.headers['X-DB-Queries'] == '1'
+    page, text = greeting(client)
+    assert 'Привет, Name3!' in text and page.headers['X-DB-Queries'] == '0'
+
+    # изменение пользователя через v1 и v2 сбрасывает его запись
+    assert client.put('/api/users/3', json={'name': 'Третий'}).status_code == 200
+    assert 'Привет, Третий!' in greeting(client)[1]
+    assert client.put('/api/v2/users/3', json={'name': 'Name3'}).status_code == 200
+    page, text = greeting(client)
+    assert 'Привет, Name3!' in text and page.headers['X-DB-Queries'] == '1'
+    # изменение другого пользователя запись не трогает
+    assert client.put('/api/v2/users/2', json={'city_from': 'кэш'}).status_code == 200
+    assert greeting(client)[0].headers['X-DB-Queries'] == '0'
+    client.get('/logout')
+
+    stats = client.get('/api/metrics').get_json()['user_cache']
+    assert stats['hits'] >= 2 and stats['invalidations'] == invalidations + 2 and 0 < stats['hit_rate'] < 1
+
+
+def test_deleted_user_is_logged_out(client, cache):
+    user_id = client.post('/api/v2/users', json={'name': 'Удаляемый', 'email': 'deleted@mars.org',
+                                                 'password': 'password'}).get_json()['id']
+    client.post('/login', data={'email': 'deleted@mars.org', 'password': 'password'})
+    assert 'Привет, Удаляемый!' in greeting(client)[1]
+    assert client.delete(f'/api/v2/users/{user_id}').status_code == 200
+    assert 'Привет' not in greeting(client)[1]
+
+
+def test_lru_eviction_ttl_and_stale_reads():
+    cache = user_cache.UserCache(size=2, ttl=60)
+    for user_id in (1, 2, 3):
+        assert cache.put(user_id, user_cache.AuthenticatedUser(user_id, 'n', None, 'e'), cache.generation())
+    assert cache.get(1) is None and cache.get(3).id == 3
+    stale = cache.generation()
+    cache.invalidate({2})
+    assert cache.get(2) is None
+    assert not cache.put(2, user_cache.AuthenticatedUser(2, 'n', None, 'e'), stale), \
+        "a user read before the commit is not stored"
+    cache.invalidate({user_cache.ALL_USERS})
+    assert cache.get(3) is None
+
+    expired = user_cache.UserCache(size=2, ttl=0)
+    expired.put(1, user_cache.AuthenticatedUser(1, 'n', None, 'e'), expired.generation())
+    assert expired.get(1) is None and expired.stats()['expirations'] == 1
@@ -0,0 +1,47 @@
+from sqlalchemy import select
+
+from database import db_session
+from models.jobs import job_collaborators_table
+
+
+def job_ids(client, user_id):
+    response = client.get(f'/api/v2/users/{user_id}/jobs')
+    assert response.status_code == 200, response.get_json()
+    return {job['id']: job for job in response.get_json()['jobs']}
+
+
+def collaborator_ids(job_id):
+    session = db_session.new_session()
+    try:
+        return set(session.scalars(select(job_collaborators_table.c.user_id).where(
+            job_collaborators_table.c.job_id == job_id)))
+    finally:
+        session.close()
+
+
+def test_user_jobs_leader_and_collaborators(client):
+    """Работа видна руководителю и каждому участнику; job_collaborators следует за строкой collaborators."""
+    response = client.post('/api/v2/jobs', json={'job': 'user jobs', 'team_leader_id': 1, 'work_size': 5,
+                                                 'collaborators': '2, 3'})
+    assert response.status_code == 201, response.get_json()
+    job_id = response.get_json()['id']
+    assert collaborator_ids(job_id) == {2, 3}
+
+    leader_jobs = job_ids(client, 1)
+    assert leader_jobs[job_id]['role'] == 'leader'
+    assert leader_jobs[job_id]['collaborators'] == '2, 3', "legacy collaborators string is returned as is"
+    assert job_ids(client, 2)[job_id]['role'] == 'collaborator'
+    assert job_id in job_ids(client, 3)
+
+    assert client.put(f'/api/v2/jobs/{job_id}', json={'collaborators': '3'}).status_code == 200
+    assert collaborator_ids(job_id) == {3}
+    assert job_id not in job_ids(client, 2), "user 2 was removed from collaborators but still sees the job"
+    assert job_id in job_ids(client, 3)
+
+    assert client.delete(f'/api/v2/jobs/{job_id}').status_code == 200
+    assert collaborator_ids(job_id) == set()
+    assert job_id not in job_ids(client, 3), "deleted job is still listed for its collaborator"
+
+
+def test_user_jobs_user_not_found(client):
+    assert client.get('/api/v2/users/99999/jobs').status_code == 404
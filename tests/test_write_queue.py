@@ -0,0 +1,105 @@
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from database import db_session, write_queue
+from models.category import Category
+
+
+def add_category(session, name):
+    if name == 'broken':
+        raise ValueError('broken unit')
+    category = Category(name=name)
+    session.add(category)
+    session.flush()
+    return category.id
+
+
+def test_writer_commits_batch_and_isolates_failures(app):
+    writer = write_queue.Writer(db_session.new_session, max_batch=10, max_delay=0.05)
+    try:
+        futures = [writer.submit(add_category, name) for name in ('queued1', 'broken', 'queued2')]
+        ok1, ok2 = futures[0].result(timeout=5), futures[2].result(timeout=5)
+        with pytest.raises(ValueError):
+            futures[1].result(timeout=5)
+    finally:
+        writer.stop()
+
+    session = db_session.new_session()
+    try:
+        names = set(session.scalars(select(Category.name).where(Category.id.in_([ok1[0], ok2[0]]))))
+        assert names == {'queued1', 'queued2'}
+    finally:
+        session.close()
+
+
+def test_run_with_retry_repeats_locked_transaction(app):
+    calls = []
+
+    def flaky(session):
+        calls.append(1)
+        if len(calls) < 3:
+            raise OperationalError('INSERT', {}, sqlite3.OperationalError('database is locked'))
+        return add_category(session, 'retried')
+
+    session = db_session.new_session()
+    try:
+        category_id = write_queue.run_with_retry(session, flaky)
+        assert len(calls) == 3
+        assert session.get(Category, category_id).name == 'retried'
+    finally:
+        session.close()
+
+
+def test_resources_through_write_queue(app, client):
+    app.config['DB_WRITE_QUEUE'] = True
+    try:
+        response = client.post('/api/v2/jobs', json={'job': 'queued job', 'team_leader_id': 1, 'category_ids': [1]})
+        assert response.status_code == 201, response.get_json()
+        job_id = response.get_json()['id']
+        assert client.put(f'/api/v2/jobs/{job_id}', json={'work_size': 9}).get_json()['job']['work_size'] == 9
+        assert client.post('/api/v2/jobs', json={'job': 'x', 'team_leader_id': 99999}).status_code == 400
+        assert client.delete(f'/api/v2/jobs/{job_id}').status_code == 200
+        assert client.get(f'/api/v2/jobs/{job_id}').status_code == 404
+
+        response = client.post('/api/v2/users', json={'name': 'Queued', 'email': 'queued@mars.org', 'password': 'pw'})
+        assert response.status_code == 201
+        assert client.post('/api/v2/users', json={'name': 'Q', 'email': 'queued@mars.org',
+                                                  'password': 'pw'}).status_code == 409
+        assert client.get('/api/metrics').get_json()['writes']['queue_enabled'] is True
+    finally:
+        app.config['DB_WRITE_QUEUE'] = False
+        write_queue.stop_writer()
+
+
+def test_v1_write_retries_while_database_is_locked(app, client, monkeypatch):
+    # Блокировку на запись держит другое соединение; без ожидания busy_timeout
+    # первая попытка получает "database is locked", а повтор после снятия - проходит
+    begin_immediate = write_queue.begin_immediate
+
+    def begin_without_waiting(session):
+        connection = session.connection()
+        timeout = connection.exec_driver_sql('PRAGMA busy_timeout').scalar()
+        connection.exec_driver_sql('PRAGMA busy_timeout = 0')
+        try:
+            begin_immediate(session)
+        finally:
+            connection.exec_driver_sql(f'PRAGMA busy_timeout = {timeout}')
+
+    monkeypatch.setattr(write_queue, 'begin_immediate', begin_without_waiting)
+    monkeypatch.setattr(write_queue, 'backoff', lambda attempt: 0.1)
+    locker = sqlite3.connect(db_session.get_engine().url.database, isolation_level=None,
+                             check_same_thread=False)
+    locker.execute('BEGIN IMMEDIATE')
+    threading.Timer(0.15, locker.rollback).start()
+    retries = write_queue.stats.snapshot()['lock_retries']
+    try:
+        response = client.post('/api/jobs', json={'job': 'locked', 'team_leader_id': 1, 'work_size': 3})
+    finally:
+        locker.close()
+    assert response.status_code == 201, response.get_json()
+    assert write_queue.stats.snapshot()['lock_retries'] > retries
+    assert client.get(f"/api/jobs/{response.get_json()['job']['id']}").get_json()['job']['job'] == 'locked'